@@ -2,7 +2,7 @@
 API Gateway untuk EduConnect
 Menerima semua request dari frontend dan meneruskan ke service terkait
 """
-from flask import Flask, request, jsonify, make_response
+from flask import Flask, Response, request, jsonify, make_response, stream_with_context
 from flask_cors import CORS
 import requests
 import os
@@ -92,6 +92,51 @@ def forward_request(service_url, path, method='GET', data=None, headers=None):
 
 # ==================== USER SERVICE ROUTES ====================
 
+# Header yang diteruskan untuk request/response yang di-stream (upload chunk, download file)
+STREAM_REQUEST_HEADERS = ('Authorization', 'Content-Type', 'Content-Length', 'Range', 'If-Range',
+                          'If-None-Match', 'If-Modified-Since')
+STREAM_RESPONSE_HEADERS = ('content-type', 'content-length', 'content-range', 'content-disposition',
+                           'accept-ranges', 'etag', 'last-modified', 'cache-control', 'expires')
+STREAM_BLOCK_SIZE = 64 * 1024
+
+def stream_request(service_url, path):
+    """Forward request tanpa membaca body/response ke memory"""
+    session = requests.Session()
+    try:
+        outgoing = requests.Request(
+            request.method,
+            f"{service_url}{path}",
+            params=request.args,
+            headers={name: value for name, value in request.headers.items() if name in STREAM_REQUEST_HEADERS},
+            data=request.stream if request.content_length else None
+        ).prepare()
+        # Body di-stream dengan Content-Length asli, bukan chunked
+        outgoing.headers.pop('Transfer-Encoding', None)
+        response = session.send(outgoing, stream=True, timeout=30)
+    except requests.exceptions.ConnectionError:
+        session.close()
+        return jsonify({
+            'error': f'Service unavailable: {service_url}',
+            'message': 'Pastikan service sedang running. Cek: python run_services.py'
+        }), 503
+    except requests.exceptions.Timeout:
+        session.close()
+        return jsonify({
+            'error': 'Request timeout',
+            'message': f'Service {service_url} tidak merespon dalam 30 detik.'
+        }), 504
+    
+    def generate():
+        try:
+            for block in response.iter_content(STREAM_BLOCK_SIZE):
+                yield block
+        finally:
+            response.close()
+            session.close()
+    
+    headers = [(name, value) for name, value in response.headers.items() if name.lower() in STREAM_RESPONSE_HEADERS]
+    return Response(stream_with_context(generate()), status=response.status_code, headers=headers)
+
 @app.route('/api/auth/register', methods=['POST'])
 def register():
     """Register user baru"""
@@ -137,6 +182,11 @@ def courses():
     else:
         return forward_request(COURSE_SERVICE, '/api/courses', 'POST', request.get_json(), request.headers)
 
+@app.route('/api/courses/facets', methods=['GET'])
+def course_facets():
+    """Get course counts per category, level, price and duration"""
+    return forward_request(COURSE_SERVICE, '/api/courses/facets', 'GET', None, request.headers)
+
 @app.route('/api/courses/<int:course_id>', methods=['GET', 'PUT', 'DELETE'])
 def course_detail(course_id):
     """Get, update, or delete course"""
@@ -147,6 +197,68 @@ def course_detail(course_id):
     else:
         return forward_request(COURSE_SERVICE, f'/api/courses/{course_id}', 'DELETE', None, request.headers)
 
+def compensate_course_clone(clone_id):
+    """Batalkan clone yang gagal di tengah jalan; return list langkah yang gagal"""
+    failed = []
+    # Content mungkin sudah ter-commit walaupun response-nya tidak sampai (timeout)
+    for service_url, path in ((PROGRESS_SERVICE, f'/api/courses/{clone_id}/content'),
+                              (COURSE_SERVICE, f'/api/courses/{clone_id}')):
+        try:
+            response = requests.delete(f"{service_url}{path}", timeout=30)
+            if not response.ok and response.status_code != 404:
+                failed.append(path)
+        except requests.exceptions.RequestException:
+            failed.append(path)
+    if failed:
+        print(f"[WARNING] Failed to compensate course clone {clone_id}: {', '.join(failed)}")
+    return failed
+
+@app.route('/api/courses/<int:course_id>/clone', methods=['POST'])
+def clone_course(course_id):
+    """Clone course with all its modules and tasks (course service, then progress service)"""
+    data = request.get_json(silent=True) or {}
+    request_headers = {'Content-Type': 'application/json'}
+    if 'Authorization' in request.headers:
+        request_headers['Authorization'] = request.headers['Authorization']
+
+    try:
+        course_response = requests.post(f"{COURSE_SERVICE}/api/courses/{course_id}/clone",
+                                        json={'title': data.get('title'), 'instructor_id': data.get('instructor_id')},
+                                        headers=request_headers, timeout=30)
+    except requests.exceptions.RequestException as e:
+        return jsonify({'error': f'Service unavailable: {COURSE_SERVICE}', 'message': str(e)}), 503
+    if not course_response.ok:
+        return make_response(course_response.json(), course_response.status_code)
+    clone = course_response.json()['course']
+
+    error = None
+    try:
+        content_response = requests.post(
+            f"{PROGRESS_SERVICE}/api/courses/{course_id}/clone-content",
+            json={'target_course_id': clone['id'], 'due_date_offset_days': data.get('due_date_offset_days', 0)},
+            headers=request_headers, timeout=60
+        )
+        if content_response.ok:
+            content = content_response.json()
+            return jsonify({
+                'message': 'Course cloned successfully',
+                'source_course_id': course_id,
+                'course': clone,
+                'modules': content['modules'],
+                'tasks': content['tasks']
+            }), 201
+        error = content_response.json().get('error', f'status {content_response.status_code}')
+    except (requests.exceptions.RequestException, ValueError) as e:
+        error = str(e)
+
+    # Progress service gagal: hapus course hasil clone supaya tidak ada course tanpa isi
+    failed = compensate_course_clone(clone['id'])
+    return jsonify({
+        'error': 'Failed to clone course content',
+        'message': error,
+        'rolled_back': not failed
+    }), 502
+
 # ==================== ENROLLMENT SERVICE ROUTES ====================
 
 @app.route('/api/enrollments', methods=['GET', 'POST'])
@@ -157,6 +269,21 @@ def enrollments():
     else:
         return forward_request(ENROLLMENT_SERVICE, '/api/enrollments', 'POST', request.get_json(), request.headers)
 
+@app.route('/api/enrollments/bulk', methods=['POST'])
+def bulk_enrollments():
+    """Enroll many users at once"""
+    return forward_request(ENROLLMENT_SERVICE, '/api/enrollments/bulk', 'POST', request.get_json(), request.headers)
+
+@app.route('/api/enrollments/counts', methods=['GET'])
+def enrollment_counts():
+    """Get enrollment counts per status for courses"""
+    return forward_request(ENROLLMENT_SERVICE, '/api/enrollments/counts', 'GET', None, request.headers)
+
+@app.route('/api/enrollments/events', methods=['GET'])
+def enrollment_events():
+    """Enrollment change feed"""
+    return forward_request(ENROLLMENT_SERVICE, '/api/enrollments/events', 'GET', None, request.headers)
+
 @app.route('/api/enrollments/<int:enrollment_id>', methods=['GET', 'PUT', 'DELETE'])
 def enrollment_detail(enrollment_id):
     """Get, update, or delete enrollment"""
@@ -190,6 +317,11 @@ def progress_detail(progress_id):
     else:
         return forward_request(PROGRESS_SERVICE, f'/api/progress/{progress_id}', 'PUT', request.get_json(), request.headers)
 
+@app.route('/api/progress/heartbeat', methods=['POST'])
+def progress_heartbeat():
+    """Record time-spent heartbeat"""
+    return forward_request(PROGRESS_SERVICE, '/api/progress/heartbeat', 'POST', request.get_json(), request.headers)
+
 @app.route('/api/progress/user/<int:user_id>/course/<int:course_id>', methods=['GET'])
 def user_course_progress(user_id, course_id):
     """Get user progress for specific course"""
@@ -242,6 +374,11 @@ def update_task_status(task_id):
     """Update user task status"""
     return forward_request(PROGRESS_SERVICE, f'/api/tasks/{task_id}/status', 'PUT', request.get_json(), request.headers)
 
+@app.route('/api/tasks/status/batch', methods=['PUT'])
+def batch_update_task_status():
+    """Update many user task statuses in one request"""
+    return forward_request(PROGRESS_SERVICE, '/api/tasks/status/batch', 'PUT', request.get_json(), request.headers)
+
 @app.route('/api/tasks/initialize', methods=['POST'])
 def initialize_tasks():
     """Initialize sample tasks for courses"""
@@ -265,6 +402,58 @@ def submission_detail(submission_id):
     else:
         return forward_request(PROGRESS_SERVICE, f'/api/submissions/{submission_id}', 'PUT', request.get_json(), request.headers)
 
+@app.route('/api/leaderboard/course/<int:course_id>', methods=['GET'])
+def course_leaderboard(course_id):
+    """Get top students of a course by earned task points"""
+    return forward_request(PROGRESS_SERVICE, f'/api/leaderboard/course/{course_id}', 'GET', None, request.headers)
+
+@app.route('/api/leaderboard/course/<int:course_id>/user/<int:user_id>', methods=['GET'])
+def course_leaderboard_rank(course_id, user_id):
+    """Get user's rank in a course leaderboard"""
+    return forward_request(PROGRESS_SERVICE, f'/api/leaderboard/course/{course_id}/user/{user_id}', 'GET', None, request.headers)
+
+@app.route('/api/deadlines/user/<int:user_id>', methods=['GET'])
+def user_deadlines(user_id):
+    """Get user's overdue and due-soon tasks"""
+    return forward_request(PROGRESS_SERVICE, f'/api/deadlines/user/{user_id}', 'GET', None, request.headers)
+
+@app.route('/api/analytics/course/<int:course_id>', methods=['GET'])
+def course_analytics(course_id):
+    """Get course-wide progress analytics (completion, time spent, task rates)"""
+    return forward_request(PROGRESS_SERVICE, f'/api/analytics/course/{course_id}', 'GET', None, request.headers)
+
+@app.route('/api/gradebook/course/<int:course_id>', methods=['GET'])
+def export_gradebook(course_id):
+    """Export course gradebook (streamed CSV/NDJSON)"""
+    return stream_request(PROGRESS_SERVICE, f'/api/gradebook/course/{course_id}')
+
+@app.route('/api/uploads', methods=['POST'])
+def create_upload():
+    """Start a resumable submission file upload"""
+    return forward_request(PROGRESS_SERVICE, '/api/uploads', 'POST', request.get_json(), request.headers)
+
+@app.route('/api/uploads/<upload_id>', methods=['GET', 'PUT'])
+def upload_chunk(upload_id):
+    """Get upload status or stream an upload chunk"""
+    if request.method == 'GET':
+        return forward_request(PROGRESS_SERVICE, f'/api/uploads/{upload_id}', 'GET', None, request.headers)
+    return stream_request(PROGRESS_SERVICE, f'/api/uploads/{upload_id}')
+
+@app.route('/api/files/<sha256>', methods=['GET'])
+def download_file(sha256):
+    """Download submission file (streamed, Range supported)"""
+    return stream_request(PROGRESS_SERVICE, f'/api/files/{sha256}')
+
+@app.route('/api/submissions/grades', methods=['PUT'])
+def bulk_grade_submissions():
+    """Grade many submissions in one request"""
+    return forward_request(PROGRESS_SERVICE, '/api/submissions/grades', 'PUT', request.get_json(), request.headers)
+
+@app.route('/api/submissions/user/<int:user_id>', methods=['GET'])
+def user_submissions(user_id):
+    """Get user's submissions for many tasks or a course"""
+    return forward_request(PROGRESS_SERVICE, f'/api/submissions/user/{user_id}', 'GET', None, request.headers)
+
 @app.route('/api/submissions/user/<int:user_id>/task/<int:task_id>', methods=['GET'])
 def user_task_submission(user_id, task_id):
     """Get user's submission for a specific task"""
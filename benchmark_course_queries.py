@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Benchmark query catalog course (sort + range filter) pada dataset besar
+Mengisi database benchmark terpisah dengan N course (default 1 juta), lalu
+menampilkan EXPLAIN dan waktu eksekusi untuk setiap access path GET /api/courses
+"""
+import argparse
+import importlib.util
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session, load_only
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from config import DATABASES
+from db_utils import connection_string, create_database
+
+CATEGORIES = ['Programming', 'Web Development', 'Data Science', 'Design', 'Business',
+              'Marketing', 'Photography', 'Music', 'Language', 'Personal Development']
+LEVELS = ['beginner', 'intermediate', 'advanced']
+
+# (nama, filters, sort, fields) - sama dengan parameter GET /api/courses
+ACCESS_PATHS = [
+    ('category + sort=price', {'category': 'Programming'}, 'price', ['id', 'price']),
+    ('category + sort=price (full row)', {'category': 'Programming'}, 'price', None),
+    ('category + price range', {'category': 'Design', 'price_min': 20, 'price_max': 40}, None, ['id', 'price']),
+    ('level + sort=-price', {'level': 'advanced'}, '-price', ['id', 'price']),
+    ('category + duration range', {'category': 'Music', 'duration_min': 5, 'duration_max': 10}, None, ['id', 'duration_hours']),
+    ('category + sort=-created_at', {'category': 'Business'}, '-created_at', ['id', 'created_at']),
+    ('category + sort=-rating', {'category': 'Data Science'}, '-rating', ['id', 'average_rating']),
+    ('price range', {'price_min': 10, 'price_max': 12}, None, ['id', 'price']),
+    ('sort=-rating', {}, '-rating', ['id', 'average_rating']),
+]
+
+def load_course_service():
+    """Import course service untuk memakai model dan query builder yang sama"""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'services', 'course_service', 'app.py')
+    spec = importlib.util.spec_from_file_location('course_service_app', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def generate_courses(count):
+    """Generate course rows secara acak tapi reproducible"""
+    rng = random.Random(42)
+    start = datetime(2020, 1, 1)
+    for i in range(count):
+        yield {
+            'title': f'Course {i}',
+            'description': 'Generated for benchmark',
+            'instructor_id': rng.randint(1, 5000),
+            'category': rng.choice(CATEGORIES),
+            'price': round(rng.uniform(0, 200), 2),
+            'duration_hours': round(rng.uniform(1, 60), 1),
+            'level': rng.choice(LEVELS),
+            'average_rating': round(rng.uniform(1, 5), 2),
+            'created_at': start + timedelta(minutes=rng.randint(0, 60 * 24 * 365 * 5)),
+        }
+
+def load_rows(engine, table, rows, batch_size):
+    print(f"Loading {rows:,} courses...")
+    started = time.perf_counter()
+    batch = []
+    with engine.begin() as conn:
+        for row in generate_courses(rows):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                conn.execute(table.insert(), batch)
+                batch = []
+        if batch:
+            conn.execute(table.insert(), batch)
+        conn.execute(text(f"ANALYZE TABLE {table.name}"))
+    print(f"[OK] Loaded in {time.perf_counter() - started:.1f}s")
+
+def build_query(service, session, filters, sort, fields):
+    Course = service.Course
+    query = session.query(Course)
+    if fields:
+        query = query.options(load_only(*[getattr(Course, field) for field in fields]))
+    query = service.apply_course_filters(query, filters)
+    # Halaman pertama dengan limit default, sama dengan GET /api/courses?limit=50
+    return service.paginate_course_query(query, sort, service.COURSE_LIST_DEFAULT_LIMIT, 0)
+
+def run_benchmark(service, engine, repeat):
+    print("\n" + "=" * 100)
+    print(f"{'Access path':<36} {'key':<28} {'type':<7} {'rows':>9} {'ms':>8}  Extra")
+    print("=" * 100)
+
+    with Session(engine) as session:
+        for name, filters, sort, fields in ACCESS_PATHS:
+            query = build_query(service, session, filters, sort, fields)
+            sql = str(query.statement.compile(dialect=engine.dialect, compile_kwargs={'literal_binds': True}))
+
+            with engine.connect() as conn:
+                plan = conn.execute(text(f"EXPLAIN {sql}")).mappings().first()
+                timings = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    conn.execute(text(sql)).fetchall()
+                    timings.append((time.perf_counter() - started) * 1000)
+
+            extra = plan['Extra'] or ''
+            label = ' [index-only]' if 'Using index' in extra and 'Using index condition' not in extra else ''
+            print(f"{name:<36} {str(plan['key']):<28} {plan['type']:<7} {plan['rows']:>9} "
+                  f"{statistics.median(timings):>8.2f}  {extra}{label}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark course catalog queries')
+    parser.add_argument('--rows', type=int, default=1_000_000, help='Jumlah course yang di-generate')
+    parser.add_argument('--batch-size', type=int, default=10_000, help='Jumlah row per multi-row INSERT')
+    parser.add_argument('--repeat', type=int, default=5, help='Berapa kali setiap query dijalankan')
+    parser.add_argument('--database', default=f"{DATABASES['course_service']}_bench",
+                        help='Database benchmark (jangan pakai database utama)')
+    parser.add_argument('--reuse', action='store_true', help='Pakai data yang sudah ada, jangan load ulang')
+    args = parser.parse_args()
+
+    service = load_course_service()
+    table = service.Course.__table__
+
+    create_database(args.database)
+    engine = create_engine(connection_string(args.database))
+
+    if not args.reuse:
+        table.drop(engine, checkfirst=True)
+        table.create(engine)
+        load_rows(engine, table, args.rows, args.batch_size)
+
+    run_benchmark(service, engine, args.repeat)
+
+if __name__ == '__main__':
+    main()
@@ -34,6 +34,35 @@ SERVICES = {
     'review': 'http://localhost:5005'
 }
 
+# Enrollment Cache Configuration
+# Kosongkan ENROLLMENT_CACHE_URL untuk cache in-process; isi redis://host:6379/0 supaya
+# beberapa replica enrollment service berbagi cache yang sama (butuh: pip install redis)
+ENROLLMENT_CACHE = {
+    'url': os.getenv('ENROLLMENT_CACHE_URL', ''),
+    'max_users': int(os.getenv('ENROLLMENT_CACHE_MAX_USERS', 10000)),
+    'ttl_seconds': int(os.getenv('ENROLLMENT_CACHE_TTL', 300))
+}
+
+# Progress Heartbeat Configuration
+# Heartbeat time-spent dikumpulkan di memory dan di-flush ke MySQL per interval atau
+# saat jumlah key mencapai batas; journal di HEARTBEAT_JOURNAL_DIR menjaga data saat crash
+HEARTBEAT = {
+    'journal_dir': os.getenv('HEARTBEAT_JOURNAL_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'heartbeat_journal'),
+    'flush_seconds': int(os.getenv('HEARTBEAT_FLUSH_SECONDS', 60)),
+    'flush_max_keys': int(os.getenv('HEARTBEAT_FLUSH_MAX_KEYS', 5000)),
+    'journal_sync_seconds': float(os.getenv('HEARTBEAT_JOURNAL_SYNC_SECONDS', 1))
+}
+
+# Submission File Storage Configuration
+# File submission disimpan content-addressed (sha256) di SUBMISSION_BLOB_DIR; upload dikirim
+# per chunk (maksimal SUBMISSION_CHUNK_MAX_BYTES per request) sehingga bisa di-resume
+SUBMISSION_STORAGE = {
+    'blob_dir': os.getenv('SUBMISSION_BLOB_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'submission_blobs'),
+    'chunk_max_bytes': int(os.getenv('SUBMISSION_CHUNK_MAX_BYTES', 8 * 1024 * 1024)),
+    'max_file_bytes': int(os.getenv('SUBMISSION_MAX_FILE_BYTES', 2 * 1024 * 1024 * 1024)),
+    'use_x_sendfile': os.getenv('SUBMISSION_USE_X_SENDFILE', 'false').lower() == 'true'
+}
+
 # API Gateway Configuration
 API_GATEWAY_PORT = int(os.getenv('API_GATEWAY_PORT', 5000))
 JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'educonnect-secret-key-change-in-production')
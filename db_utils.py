@@ -0,0 +1,92 @@
+"""
+Helper database bersama untuk semua service dan script (benchmark, dataset generator)
+"""
+from datetime import datetime
+
+import pymysql
+from flask import request
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import load_only
+
+from config import DB_CONFIG
+
+def serialize_value(value):
+    """Convert nilai kolom ke bentuk yang bisa di-JSON-kan"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+def parse_fields(model):
+    """Parse parameter ?fields=a,b,c menjadi list kolom (None = semua kolom)"""
+    raw = request.args.get('fields')
+    if not raw:
+        return None, None
+
+    fields = [field.strip() for field in raw.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in model.SERIALIZABLE_FIELDS]
+    if unknown:
+        return None, f"Unknown fields: {', '.join(unknown)}"
+
+    # id selalu disertakan supaya client tetap bisa mengenali record
+    if 'id' not in fields:
+        fields.insert(0, 'id')
+    return fields, None
+
+def with_fields(query, model, fields):
+    """Push sparse fieldset ke SQL: hanya load kolom yang diminta"""
+    if fields:
+        query = query.options(load_only(*[getattr(model, field) for field in fields]))
+    return query
+
+def is_valid_id(value):
+    """Id dari JSON harus int positif; bool adalah subclass int di Python jadi ditolak eksplisit"""
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+def upgrade_schema(db):
+    """Tambahkan kolom dan index baru ke tabel yang sudah ada (db.create_all tidak melakukannya)"""
+    inspector = inspect(db.engine)
+
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            default = ''
+            if column.default is not None and column.default.is_scalar:
+                default = f' DEFAULT {column.default.arg!r}'
+            print(f"[INFO] Adding {column.name} column to {table.name} table...")
+            with db.engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}{default}"))
+
+        existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                print(f"[INFO] Creating index {index.name} on {table.name} table...")
+                index.create(bind=db.engine)
+
+def connection_string(database):
+    """SQLAlchemy URL untuk database MySQL dari DB_CONFIG"""
+    auth = DB_CONFIG['user']
+    if DB_CONFIG['password']:
+        auth = f"{DB_CONFIG['user']}:{DB_CONFIG['password']}"
+    return f"mysql+pymysql://{auth}@{DB_CONFIG['host']}:{DB_CONFIG['port']}/{database}?charset={DB_CONFIG['charset']}"
+
+def create_database(database):
+    """CREATE DATABASE IF NOT EXISTS dengan charset utf8mb4"""
+    connect_kwargs = {
+        'host': DB_CONFIG['host'],
+        'port': DB_CONFIG['port'],
+        'user': DB_CONFIG['user'],
+        'charset': DB_CONFIG['charset']
+    }
+    if DB_CONFIG['password']:
+        connect_kwargs['password'] = DB_CONFIG['password']
+
+    connection = pymysql.connect(**connect_kwargs)
+    with connection.cursor() as cursor:
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS {database} CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
+    connection.close()
@@ -255,7 +255,7 @@ async function loadCourses() {
         const response = await fetch(`${API_GATEWAY}/api/courses`);
         if (response.ok) {
             allCourses = await response.json();
-            await enrichCoursesWithReviews();
+            enrichCoursesWithReviews();
             displayCourses(allCourses);
         } else {
             showToast('Failed to load courses', 'error');
@@ -267,18 +267,11 @@ async function loadCourses() {
     }
 }
 
-async function enrichCoursesWithReviews() {
+function enrichCoursesWithReviews() {
+    // Rating summary sudah di-embed oleh course service, tidak perlu request per course
     for (let course of allCourses) {
-        try {
-            const response = await fetch(`${API_GATEWAY}/api/reviews/course/${course.id}/stats`);
-            if (response.ok) {
-                const stats = await response.json();
-                course.averageRating = stats.average_rating;
-                course.totalReviews = stats.total_reviews;
-            }
-        } catch (error) {
-            console.error('Failed to load review stats for course:', course.id);
-        }
+        course.averageRating = course.average_rating || 0;
+        course.totalReviews = course.review_count || 0;
     }
 }
 
@@ -376,7 +369,9 @@ async function enrollInCourse(courseId) {
             },
             body: JSON.stringify({
                 user_id: currentUser.id,
-                course_id: courseId
+                course_id: courseId,
+                // Progress awal dibuat oleh enrollment service di background
+                initialize_progress: true
             })
         });
         
@@ -385,8 +380,6 @@ async function enrollInCourse(courseId) {
         if (response.ok) {
             showToast('Successfully enrolled in course!', 'success');
             loadMyCourses();
-            // Initialize progress
-            await initializeProgress(courseId, data.enrollment.id);
         } else {
             showToast(data.error || 'Enrollment failed', 'error');
         }
@@ -397,26 +390,6 @@ async function enrollInCourse(courseId) {
     }
 }
 
-async function initializeProgress(courseId, enrollmentId) {
-    try {
-        await fetch(`${API_GATEWAY}/api/progress`, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({
-                user_id: currentUser.id,
-                course_id: courseId,
-                enrollment_id: enrollmentId,
-                completion_percentage: 0,
-                status: 'in_progress'
-            })
-        });
-    } catch (error) {
-        console.error('Failed to initialize progress:', error);
-    }
-}
-
 async function loadMyCourses() {
     if (!currentUser) return;
     
@@ -532,6 +505,26 @@ async function loadProgress() {
     }
 }
 
+// Ambil semua submission user di satu course sekaligus, di-key dengan task_id
+async function fetchUserSubmissions(courseId, fields = null, options = {}) {
+    let url = `${API_GATEWAY}/api/submissions/user/${currentUser.id}?course_id=${courseId}`;
+    if (fields) {
+        url += `&fields=${fields.join(',')}`;
+    }
+    
+    try {
+        const response = await fetch(url, options);
+        return response.ok ? await response.json() : {};
+    } catch (error) {
+        if (error.name === 'AbortError') {
+            console.warn(`Timeout loading submissions for course ${courseId}`);
+        } else {
+            console.warn(`Error loading submissions for course ${courseId}:`, error);
+        }
+        return {};
+    }
+}
+
 async function displayProgress(progressData) {
     const grid = document.getElementById('progressGrid');
     grid.innerHTML = '';
@@ -546,18 +539,9 @@ async function displayProgress(progressData) {
         const completedTasks = taskList.filter(t => t.user_status === 'completed').length;
         const totalTasks = taskList.length;
         
-        // Load submissions for all tasks
-        const tasksWithSubmissions = await Promise.all(
-            taskList.map(async (task) => {
-                try {
-                    const submissionResponse = await fetch(`${API_GATEWAY}/api/submissions/user/${currentUser.id}/task/${task.id}`);
-                    const submissionData = submissionResponse.ok ? await submissionResponse.json() : null;
-                    return { ...task, submission: submissionData?.submission || null };
-                } catch (error) {
-                    return { ...task, submission: null };
-                }
-            })
-        );
+        // Load submissions for all tasks (satu request per course, tanpa teks submission)
+        const submissions = taskList.length > 0 ? await fetchUserSubmissions(course.id) : {};
+        const tasksWithSubmissions = taskList.map(task => ({ ...task, submission: submissions[task.id] || null }));
         
         const taskItems = tasksWithSubmissions.map(task => {
             const userStatus = task.user_status || 'pending';
@@ -582,7 +566,7 @@ async function displayProgress(progressData) {
                             </div>
                             ${task.submission ? `
                                 <div style="margin-top: 0.5rem; padding: 0.5rem; background: #f3f4f6; border-radius: 4px; font-size: 0.75rem;">
-                                    <strong>Submission:</strong> ${task.submission.submission_text ? task.submission.submission_text.substring(0, 100) + '...' : 'File submitted'}
+                                    <strong>Submission:</strong> ${task.submission.submission_file_name || 'Submitted'}
                                     ${task.submission.grade !== null ? `<br><strong>Grade:</strong> ${task.submission.grade}/${task.points}` : ''}
                                 </div>
                             ` : ''}
@@ -758,13 +742,15 @@ async function loadCourseProgress(courseId) {
 
 async function updateProgress(courseId, progressId) {
     if (!progressId) {
-        // Get enrollment first
-        const enrollmentsResponse = await fetch(`${API_GATEWAY}/api/enrollments?user_id=${currentUser.id}&course_id=${courseId}`);
-        const enrollments = await enrollmentsResponse.json();
-        if (enrollments.length > 0) {
-            await initializeProgress(courseId, enrollments[0].id);
+        // Progress awal dibuat server-side saat enroll, jadi cukup ambil ulang record-nya
+        const progressResponse = await fetch(`${API_GATEWAY}/api/progress/user/${currentUser.id}/course/${courseId}`);
+        const progress = progressResponse.ok ? await progressResponse.json() : null;
+        const record = progress?.progress_records?.find(p => !p.module_id) || progress?.progress_records?.[0];
+        if (!record) {
+            showToast('Progress is not ready yet. Please try again.', 'error');
+            return;
         }
-        return;
+        progressId = record.id;
     }
     
     showLoading();
@@ -882,34 +868,16 @@ async function showProgressModal(progress, tasks, modules, course) {
         }
         
         try {
-            // Load submissions with timeout
-            const tasksWithSubmissions = await Promise.all(
-                taskList.map(async (task) => {
-                    try {
-                        const controller = new AbortController();
-                        const timeoutId = setTimeout(() => controller.abort(), 5000); // 5 second timeout
-                        
-                        const submissionResponse = await fetch(
-                            `${API_GATEWAY}/api/submissions/user/${currentUser.id}/task/${task.id}`,
-                            { signal: controller.signal }
-                        );
-                        clearTimeout(timeoutId);
-                        
-                        if (submissionResponse.ok) {
-                            const submissionData = await submissionResponse.json();
-                            return { ...task, submission: submissionData?.submission || null };
-                        }
-                        return { ...task, submission: null };
-                    } catch (error) {
-                        if (error.name === 'AbortError') {
-                            console.warn(`Timeout loading submission for task ${task.id}`);
-                        } else {
-                            console.warn(`Error loading submission for task ${task.id}:`, error);
-                        }
-                        return { ...task, submission: null };
-                    }
-                })
+            // Load submissions with timeout; modal ini menampilkan teks dan feedback
+            const controller = new AbortController();
+            const timeoutId = setTimeout(() => controller.abort(), 5000); // 5 second timeout
+            const submissions = await fetchUserSubmissions(
+                course.id,
+                ['task_id', 'submission_text', 'submission_file_name', 'grade', 'feedback', 'submitted_at'],
+                { signal: controller.signal }
             );
+            clearTimeout(timeoutId);
+            const tasksWithSubmissions = taskList.map(task => ({ ...task, submission: submissions[task.id] || null }));
             
             const tasksHtml = tasksWithSubmissions.map(task => {
                 const userStatus = task.user_status || 'pending';
@@ -973,6 +941,44 @@ async function showProgressModal(progress, tasks, modules, course) {
 }
 
 // Module Functions
+// Time spent dikirim sebagai heartbeat selama modul terbuka dan tab aktif
+const MODULE_HEARTBEAT_INTERVAL_MS = 30000;
+let moduleHeartbeatTimer = null;
+
+function startModuleHeartbeat(moduleId, courseId) {
+    stopModuleHeartbeat();
+    if (!currentUser) return;
+    
+    moduleHeartbeatTimer = setInterval(() => {
+        const modal = document.getElementById('courseModal');
+        if (modal.style.display !== 'block' || !document.getElementById(`moduleView${moduleId}`)) {
+            stopModuleHeartbeat();
+            return;
+        }
+        if (document.hidden) return;
+        
+        fetch(`${API_GATEWAY}/api/progress/heartbeat`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({
+                user_id: currentUser.id,
+                course_id: courseId,
+                module_id: String(moduleId),
+                seconds: MODULE_HEARTBEAT_INTERVAL_MS / 1000
+            })
+        }).catch(error => console.error('Error sending heartbeat:', error));
+    }, MODULE_HEARTBEAT_INTERVAL_MS);
+}
+
+function stopModuleHeartbeat() {
+    if (moduleHeartbeatTimer) {
+        clearInterval(moduleHeartbeatTimer);
+        moduleHeartbeatTimer = null;
+    }
+}
+
 function openModule(moduleId, courseId) {
     // Fetch module details
     fetch(`${API_GATEWAY}/api/modules/${moduleId}`)
@@ -980,7 +986,7 @@ function openModule(moduleId, courseId) {
         .then(module => {
             const modalContent = document.getElementById('courseModalContent');
             modalContent.innerHTML = `
-                <div>
+                <div id="moduleView${moduleId}">
                     <h2>${module.title}</h2>
                     <div style="margin: 1.5rem 0; padding: 1.5rem; background: #f9fafb; border-radius: 8px;">
                         <p style="color: #374151; line-height: 1.8; font-size: 1rem;">
@@ -1001,6 +1007,7 @@ function openModule(moduleId, courseId) {
                 </div>
             `;
             showModal('courseModal');
+            startModuleHeartbeat(moduleId, courseId);
         })
         .catch(error => {
             console.error('Error loading module:', error);
@@ -1079,6 +1086,11 @@ function showSubmitTaskModal(taskId, courseId) {
                             <label>Submission Text *</label>
                             <textarea id="submissionText" rows="6" required placeholder="Enter your submission here..."></textarea>
                         </div>
+                        <div class="form-group">
+                            <label>Upload File (Optional)</label>
+                            <input type="file" id="submissionFile">
+                            <small id="submissionUploadStatus" style="color: #6b7280;"></small>
+                        </div>
                         <div class="form-group">
                             <label>File URL (Optional)</label>
                             <input type="url" id="submissionFileUrl" placeholder="https://example.com/file.pdf">
@@ -1106,6 +1118,75 @@ function showSubmitTaskModal(taskId, courseId) {
         });
 }
 
+// Upload file per chunk; chunk yang gagal dilanjutkan dari offset yang sudah diterima server
+const UPLOAD_MAX_RETRIES = 5;
+
+async function uploadSubmissionFile(file, statusElement) {
+    const createResponse = await fetch(`${API_GATEWAY}/api/uploads`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({
+            user_id: currentUser.id,
+            file_name: file.name,
+            size: file.size,
+            content_type: file.type || null
+        })
+    });
+    const created = await createResponse.json();
+    if (!createResponse.ok) {
+        throw new Error(created.error || 'Failed to start upload');
+    }
+    
+    const uploadId = created.upload.id;
+    const chunkSize = created.chunk_max_bytes;
+    let offset = 0;
+    let retries = 0;
+    
+    while (offset < file.size) {
+        try {
+            const response = await fetch(`${API_GATEWAY}/api/uploads/${uploadId}?offset=${offset}`, {
+                method: 'PUT',
+                headers: {
+                    'Content-Type': 'application/octet-stream'
+                },
+                body: file.slice(offset, offset + chunkSize)
+            });
+            const data = await response.json();
+            if (response.ok) {
+                offset = data.upload.received_bytes;
+                retries = 0;
+            } else if (response.status === 409) {
+                offset = data.received_bytes;
+            } else {
+                throw new Error(data.error || 'Upload failed');
+            }
+        } catch (error) {
+            if (++retries > UPLOAD_MAX_RETRIES) {
+                throw error;
+            }
+            // Tanya server sampai byte ke berapa yang sudah tersimpan, lalu lanjutkan
+            await new Promise(resolve => setTimeout(resolve, 1000 * retries));
+            const statusResponse = await fetch(`${API_GATEWAY}/api/uploads/${uploadId}`);
+            if (statusResponse.ok) {
+                offset = (await statusResponse.json()).received_bytes;
+            }
+        }
+        
+        if (statusElement) {
+            statusElement.textContent = `Uploading... ${Math.floor(offset / file.size * 100)}%`;
+        }
+    }
+    
+    return uploadId;
+}
+
+function submissionFileHref(url) {
+    // File yang di-upload disimpan di progress service dan diakses lewat gateway
+    return url.startsWith('/api/') ? `${API_GATEWAY}${url}` : url;
+}
+
 async function handleSubmitTask(event, taskId, courseId) {
     event.preventDefault();
     if (!currentUser) return;
@@ -1122,6 +1203,11 @@ async function handleSubmitTask(event, taskId, courseId) {
             submission_file_name: document.getElementById('submissionFileName').value || null
         };
         
+        const file = document.getElementById('submissionFile').files[0];
+        if (file) {
+            submissionData.upload_id = await uploadSubmissionFile(file, document.getElementById('submissionUploadStatus'));
+        }
+        
         const response = await fetch(`${API_GATEWAY}/api/submissions`, {
             method: 'POST',
             headers: {
@@ -1182,7 +1268,7 @@ async function viewSubmission(taskId, courseId) {
                             <strong>File:</strong>
                             <p style="margin-top: 0.5rem;">
                                 <i class="fas fa-file"></i> ${submission.submission_file_name}
-                                ${submission.submission_file_url ? `<br><a href="${submission.submission_file_url}" target="_blank" style="color: #3b82f6;">View File</a>` : ''}
+                                ${submission.submission_file_url ? `<br><a href="${submissionFileHref(submission.submission_file_url)}" target="_blank" style="color: #3b82f6;">View File</a>` : ''}
                             </p>
                         </div>
                     ` : ''}
@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+"""
+Generator dataset skala besar untuk kelima database EduConnect
+Membuat user, course, enrollment, module, task, task completion, progress, submission,
+dan review yang realistis (popularitas course dan keaktifan student tidak merata), lalu
+memuatnya dengan multi-row INSERT atau LOAD DATA LOCAL INFILE. Counter dan projection
+turunan dibangun ulang dengan fungsi rebuild milik masing-masing service.
+
+Database tujuan mengikuti DB_NAME_* di .env, jadi arahkan ke database terpisah untuk
+dataset benchmark. Contoh: python generate_dataset.py --scale large --reset
+"""
+import argparse
+import importlib.util
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import create_engine
+from werkzeug.security import generate_password_hash
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from config import DATABASES
+from db_utils import connection_string, create_database
+
+# Preset ukuran; setiap angka bisa di-override lewat argumen. completions dipilih supaya rata-rata
+# completion rate (completions / (enrollments * tasks per course)) sekitar 0.5 di semua preset
+SCALES = {
+    'small': {'users': 1_000, 'courses': 50, 'enrollments': 10_000, 'completions': 50_000},
+    'medium': {'users': 10_000, 'courses': 500, 'enrollments': 200_000, 'completions': 1_000_000},
+    'large': {'users': 100_000, 'courses': 5_000, 'enrollments': 2_000_000, 'completions': 10_000_000},
+}
+SERVICE_NAMES = ('user', 'course', 'enrollment', 'progress', 'review')
+
+CATEGORIES = ['Programming', 'Web Development', 'Data Science', 'Design', 'Business',
+              'Marketing', 'Photography', 'Music', 'Language', 'Personal Development']
+LEVELS = ['beginner', 'intermediate', 'advanced']
+TASK_TYPES = ['assignment', 'quiz', 'project', 'exam']
+PRIORITIES = ['low', 'medium', 'high']
+RATING_WEIGHTS = [0.05, 0.07, 0.13, 0.35, 0.40]  # bintang 1..5
+HISTORY_DAYS = 730
+INSTRUCTOR_RATIO = 50  # satu instructor per 50 user
+COMPLETION_RATE_MAX = 0.9
+
+def load_service(name):
+    """Import app.py service untuk memakai model dan fungsi rebuild yang sama"""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'services', f'{name}_service', 'app.py')
+    spec = importlib.util.spec_from_file_location(f'{name}_service_app', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def prepare_databases(services, engines, reset):
+    """Buat tabel yang belum ada; kosongkan semua tabel jika --reset"""
+    for name, service in services.items():
+        engine = engines[name]
+        service.db.metadata.create_all(engine)
+        if reset:
+            with engine.begin() as conn:
+                conn.exec_driver_sql("SET foreign_key_checks=0")
+                for table in reversed(service.db.metadata.sorted_tables):
+                    conn.exec_driver_sql(f"TRUNCATE TABLE `{table.name}`")
+                conn.exec_driver_sql("SET foreign_key_checks=1")
+
+    # ID di-generate berurutan mulai dari 1, jadi tabel utama harus kosong
+    for name, model in (('user', 'User'), ('course', 'Course'), ('enrollment', 'Enrollment'), ('progress', 'Task')):
+        table = getattr(services[name], model).__table__.name
+        with engines[name].connect() as conn:
+            if conn.exec_driver_sql(f"SELECT 1 FROM `{table}` LIMIT 1").first():
+                sys.exit(f"[ERROR] Table {table} sudah berisi data; jalankan dengan --reset untuk mengosongkan database")
+
+def rows_of(*columns):
+    """Gabungkan kolom (array NumPy, list, atau nilai konstan) menjadi list tuple"""
+    return list(zip(*[
+        column.tolist() if isinstance(column, np.ndarray) else column if isinstance(column, list)
+        else itertools.repeat(column)
+        for column in columns
+    ]))
+
+def bulk_load(engine, table, columns, rows, method, batch_size):
+    """Muat rows ke table dengan multi-row INSERT per batch atau satu LOAD DATA LOCAL INFILE"""
+    if not rows:
+        return 0
+    column_list = ', '.join(f'`{column}`' for column in columns)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("SET unique_checks=0, foreign_key_checks=0")
+        if method == 'load-data':
+            with tempfile.NamedTemporaryFile('w', suffix='.tsv', delete=False, encoding='utf-8', newline='') as f:
+                for row in rows:
+                    f.write('\t'.join('\\N' if value is None else str(value) for value in row) + '\n')
+            try:
+                conn.exec_driver_sql(
+                    f"LOAD DATA LOCAL INFILE '{f.name.replace(os.sep, '/')}' INTO TABLE `{table}` "
+                    f"CHARACTER SET utf8mb4 FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' ({column_list})"
+                )
+            finally:
+                os.remove(f.name)
+        else:
+            # pymysql menggabungkan executemany INSERT ... VALUES menjadi multi-row INSERT
+            sql = f"INSERT INTO `{table}` ({column_list}) VALUES ({', '.join(['%s'] * len(columns))})"
+            for start in range(0, len(rows), batch_size):
+                conn.exec_driver_sql(sql, rows[start:start + batch_size])
+        conn.exec_driver_sql("SET unique_checks=1, foreign_key_checks=1")
+    return len(rows)
+
+class DatasetGenerator:
+    """Generate data per chunk user dengan operasi vectorized NumPy"""
+
+    def __init__(self, args, services, engines):
+        self.args = args
+        self.services = services
+        self.engines = engines
+        self.rng = np.random.default_rng(args.seed)
+        self.now = datetime.utcnow().replace(microsecond=0)
+        self.start = self.now - timedelta(days=HISTORY_DAYS)
+        self.horizon = HISTORY_DAYS * 86400
+        self.counts = {}
+        self.rating_counts = np.zeros((args.courses, 5), dtype=np.int64)
+        self.next_enrollment_id = 1
+
+    def to_datetimes(self, seconds):
+        """Detik sejak self.start -> list datetime"""
+        return (np.datetime64(self.start, 's') + np.asarray(seconds, dtype=np.int64).astype('timedelta64[s]')).tolist()
+
+    def load(self, service, model, columns, rows):
+        table = getattr(self.services[service], model).__table__.name
+        loaded = bulk_load(self.engines[service], table, columns, rows, self.args.method, self.args.batch_size)
+        self.counts[table] = self.counts.get(table, 0) + loaded
+
+    def generate_users(self):
+        args = self.args
+        password_hash = generate_password_hash('student123')
+        instructors = max(1, args.users // INSTRUCTOR_RATIO)
+        for first in range(1, args.users + 1, args.chunk_users):
+            ids = np.arange(first, min(first + args.chunk_users, args.users + 1))
+            self.load('user', 'User', ('id', 'username', 'email', 'password_hash', 'full_name', 'role', 'created_at'), rows_of(
+                ids,
+                [f'user{i}' for i in ids.tolist()],
+                [f'user{i}@example.com' for i in ids.tolist()],
+                password_hash,
+                [f'Generated User {i}' for i in ids.tolist()],
+                np.where(ids <= instructors, 'instructor', 'student'),
+                self.to_datetimes(self.rng.integers(0, self.horizon // 2, ids.size))
+            ))
+
+    def generate_courses(self):
+        args, rng = self.args, self.rng
+        count = args.courses
+        ids = np.arange(1, count + 1)
+        categories = rng.choice(CATEGORIES, count)
+        # Course dibuat antara awal histori sampai 30 hari lalu
+        self.course_created = rng.integers(0, self.horizon - 30 * 86400, count)
+        created_at = self.to_datetimes(self.course_created)
+        self.load('course', 'Course', ('id', 'title', 'description', 'instructor_id', 'category', 'price',
+                                       'duration_hours', 'level', 'average_rating', 'review_count',
+                                       'created_at', 'updated_at'), rows_of(
+            ids,
+            [f'{category} Course {i}' for category, i in zip(categories.tolist(), ids.tolist())],
+            'Generated course',
+            rng.integers(1, max(1, args.users // INSTRUCTOR_RATIO) + 1, count),
+            categories,
+            np.round(rng.uniform(0, 200, count), 2),
+            np.round(rng.uniform(1, 60, count), 1),
+            rng.choice(LEVELS, count),
+            0.0,
+            0,
+            created_at,
+            created_at
+        ))
+
+        # Popularitas mengikuti power law dengan urutan acak, jadi tidak berkorelasi dengan id
+        weights = 1.0 / np.arange(1, count + 1) ** 0.8
+        self.popularity = rng.permutation(weights / weights.sum())
+
+    def generate_course_content(self):
+        args, rng = self.args, self.rng
+        course_ids = np.arange(1, args.courses + 1)
+        created = self.course_created
+
+        modules = args.modules_per_course
+        module_course = np.repeat(course_ids, modules)
+        module_order = np.tile(np.arange(1, modules + 1), args.courses)
+        module_created = self.to_datetimes(np.repeat(created, modules))
+        self.load('progress', 'Module', ('id', 'course_id', 'title', 'description', 'order_index',
+                                         'created_at', 'updated_at'), rows_of(
+            np.arange(1, module_course.size + 1),
+            module_course,
+            [f'Module {i}' for i in module_order.tolist()],
+            'Generated module',
+            module_order,
+            module_created,
+            module_created
+        ))
+
+        # Task course c memakai id (c - 1) * T + 1 .. c * T, jadi task_id bisa dihitung langsung
+        tasks = args.tasks_per_course
+        task_course = np.repeat(course_ids, tasks)
+        task_order = np.tile(np.arange(1, tasks + 1), args.courses)
+        self.task_points = rng.integers(1, 11, task_course.size) * 5
+        due_offsets = np.repeat(created, tasks) + task_order * rng.integers(5, 15, task_course.size) * 86400
+        task_created = self.to_datetimes(np.repeat(created, tasks))
+        self.load('progress', 'Task', ('id', 'course_id', 'title', 'description', 'task_type', 'due_date',
+                                       'priority', 'points', 'order_index', 'created_at', 'updated_at'), rows_of(
+            np.arange(1, task_course.size + 1),
+            task_course,
+            [f'Task {i}' for i in task_order.tolist()],
+            'Generated task',
+            rng.choice(TASK_TYPES, task_course.size),
+            self.to_datetimes(due_offsets),
+            rng.choice(PRIORITIES, task_course.size),
+            self.task_points,
+            task_order,
+            task_created,
+            task_created
+        ))
+
+    def generate_activity(self, first_user, last_user):
+        """Enrollment, task completion, progress, submission, dan review untuk satu chunk user"""
+        args, rng = self.args, self.rng
+        tasks = args.tasks_per_course
+        user_ids = np.arange(first_user, last_user + 1)
+
+        # Enrollment: jumlah per user ~ Poisson, course dipilih sesuai popularitas, duplikat dibuang
+        per_user = rng.poisson(args.enrollments / args.users, user_ids.size)
+        keys = np.repeat(user_ids, per_user) * (args.courses + 1) + rng.choice(
+            args.courses, per_user.sum(), p=self.popularity) + 1
+        keys = np.unique(keys)
+        users = keys // (args.courses + 1)
+        courses = keys % (args.courses + 1)
+        count = keys.size
+        if not count:
+            return
+        enrollment_ids = np.arange(self.next_enrollment_id, self.next_enrollment_id + count)
+        self.next_enrollment_id += count
+
+        created = self.course_created[courses - 1]
+        enrolled = created + (rng.random(count) * (self.horizon - created)).astype(np.int64)
+
+        # Keaktifan student ~ Beta dengan rata-rata = completions / (enrollments * tasks), dibatasi
+        # di 0.9 supaya tetap ada student yang belum menyelesaikan course
+        rate = min(max(args.completions / (args.enrollments * tasks), 0.01), COMPLETION_RATE_MAX)
+        diligence = rng.beta(rate * 4, (1 - rate) * 4, count)
+        draws = rng.random((count, tasks))
+        completed = draws < diligence[:, None]
+        in_progress = ~completed & (draws < diligence[:, None] + 0.1)
+        completed_tasks = completed.sum(axis=1)
+        finished = completed_tasks == tasks
+
+        status = np.where(finished, 'completed', np.where(rng.random(count) < 0.05, 'dropped', 'active'))
+        finished_at = enrolled + (rng.random(count) * (self.horizon - enrolled)).astype(np.int64)
+        enrolled_at = self.to_datetimes(enrolled)
+        completed_at = [moment if done else None for moment, done in zip(self.to_datetimes(finished_at), finished.tolist())]
+
+        self.load('enrollment', 'Enrollment', ('id', 'user_id', 'course_id', 'enrolled_at', 'status', 'completed_at'),
+                  rows_of(enrollment_ids, users, courses, enrolled_at, status, completed_at))
+        self.load('progress', 'EnrollmentProjection', ('user_id', 'course_id', 'enrollment_id', 'status', 'updated_at'),
+                  rows_of(users, courses, enrollment_ids, status, self.now))
+
+        # Task completion: satu row per (enrollment, task) yang sudah disentuh student
+        row_enrollment, row_task = np.nonzero(completed | in_progress)
+        row_completed = completed[row_enrollment, row_task]
+        task_ids = (courses[row_enrollment] - 1) * tasks + row_task + 1
+        touched = enrolled[row_enrollment] + (
+            rng.random(row_enrollment.size) * (self.horizon - enrolled[row_enrollment])).astype(np.int64)
+        touched_at = self.to_datetimes(touched)
+        self.load('progress', 'UserTaskCompletion', ('user_id', 'task_id', 'course_id', 'status', 'completed_at',
+                                                     'submitted_at', 'created_at', 'updated_at'), rows_of(
+            users[row_enrollment],
+            task_ids,
+            courses[row_enrollment],
+            np.where(row_completed, 'completed', 'in_progress'),
+            [moment if done else None for moment, done in zip(touched_at, row_completed.tolist())],
+            [moment if done else None for moment, done in zip(touched_at, row_completed.tolist())],
+            [enrolled_at[i] for i in row_enrollment.tolist()],
+            touched_at
+        ))
+
+        percentage = np.round(completed_tasks / tasks * 100, 2)
+        self.load('progress', 'Progress', ('user_id', 'course_id', 'enrollment_id', 'completion_percentage',
+                                           'time_spent_minutes', 'last_accessed', 'status', 'completed_at'), rows_of(
+            users,
+            courses,
+            enrollment_ids,
+            percentage,
+            np.round((completed_tasks + rng.random(count)) * rng.gamma(2.0, 20.0, count), 1),
+            self.to_datetimes(finished_at),
+            np.where(finished, 'completed', 'in_progress'),
+            completed_at
+        ))
+
+        # Submission untuk sebagian task completed, sebagian besar sudah dinilai
+        submitted = np.nonzero(row_completed & (rng.random(row_completed.size) < args.submission_rate))[0]
+        graded = rng.random(submitted.size) < 0.7
+        submitted_at = touched[submitted]
+        graded_at = self.to_datetimes(np.minimum(submitted_at + rng.integers(3600, 7 * 86400, submitted.size), self.horizon))
+        self.load('progress', 'Submission', ('user_id', 'task_id', 'course_id', 'submission_text', 'status', 'grade',
+                                             'submitted_at', 'graded_at', 'created_at', 'updated_at'), rows_of(
+            users[row_enrollment[submitted]],
+            task_ids[submitted],
+            courses[row_enrollment[submitted]],
+            'Generated submission',
+            np.where(graded, 'graded', 'submitted'),
+            [float(grade) if done else None for grade, done in zip(rng.integers(50, 101, submitted.size).tolist(), graded.tolist())],
+            self.to_datetimes(submitted_at),
+            [moment if done else None for moment, done in zip(graded_at, graded.tolist())],
+            self.to_datetimes(submitted_at),
+            self.to_datetimes(submitted_at)
+        ))
+
+        # Review dari student yang sudah menyelesaikan minimal setengah task
+        reviewed = np.nonzero((percentage >= 50) & (rng.random(count) < args.review_rate))[0]
+        ratings = rng.choice(5, reviewed.size, p=RATING_WEIGHTS) + 1
+        np.add.at(self.rating_counts, (courses[reviewed] - 1, ratings - 1), 1)
+        reviewed_at = self.to_datetimes(finished_at[reviewed])
+        self.load('review', 'Review', ('user_id', 'course_id', 'rating', 'comment', 'created_at', 'updated_at'), rows_of(
+            users[reviewed],
+            courses[reviewed],
+            ratings,
+            'Generated review',
+            reviewed_at,
+            reviewed_at
+        ))
+
+    def sync_course_ratings(self):
+        """Tulis rating summary course dari review yang di-generate (pengganti rating event)"""
+        counts = self.rating_counts
+        totals = counts.sum(axis=1)
+        averages = np.round(np.divide(counts @ np.arange(1, 6), totals, out=np.zeros(totals.size), where=totals > 0), 2)
+        rows = [
+            (average, total, json.dumps(dict(enumerate(row, start=1))), self.now, course_id)
+            for course_id, (average, total, row) in enumerate(zip(averages.tolist(), totals.tolist(), counts.tolist()), start=1)
+            if total
+        ]
+        table = self.services['course'].Course.__table__.name
+        with self.engines['course'].begin() as conn:
+            for start in range(0, len(rows), self.args.batch_size):
+                conn.exec_driver_sql(
+                    f"UPDATE `{table}` SET average_rating=%s, review_count=%s, rating_distribution=%s, "
+                    f"rating_synced_at=%s WHERE id=%s",
+                    rows[start:start + self.args.batch_size]
+                )
+
+    def rebuild_derived_state(self):
+        """Bangun ulang counter, score, dan offset feed dengan fungsi milik service"""
+        enrollment = self.services['enrollment']
+        with enrollment.app.app_context():
+            enrollment.rebuild_enrollment_counters()
+
+        review = self.services['review']
+        with review.app.app_context():
+            review.rebuild_course_review_stats()
+
+        progress = self.services['progress']
+        with progress.app.app_context():
+            progress.rebuild_task_counters()
+            # Projection sudah diisi langsung, jadi consumer tidak perlu bootstrap ulang
+            last_offset = self.last_enrollment_event_sequence()
+            progress.db.session.merge(progress.FeedOffset(name=progress.ENROLLMENT_FEED_NAME, last_offset=last_offset))
+            progress.db.session.commit()
+
+    def last_enrollment_event_sequence(self):
+        table = self.services['enrollment'].EnrollmentEvent.__table__.name
+        with self.engines['enrollment'].connect() as conn:
+            return conn.exec_driver_sql(f"SELECT COALESCE(MAX(sequence), 0) FROM `{table}`").scalar()
+
+    def analyze_tables(self):
+        for name, service in self.services.items():
+            with self.engines[name].begin() as conn:
+                for table in service.db.metadata.sorted_tables:
+                    conn.exec_driver_sql(f"ANALYZE TABLE `{table.name}`")
+
+    def run(self):
+        args = self.args
+        steps = [
+            ('users', self.generate_users),
+            ('courses', self.generate_courses),
+            ('modules and tasks', self.generate_course_content),
+        ]
+        for label, step in steps:
+            started = time.perf_counter()
+            step()
+            print(f"[OK] Generated {label} in {time.perf_counter() - started:.1f}s")
+
+        started = time.perf_counter()
+        for first in range(1, args.users + 1, args.chunk_users):
+            last = min(first + args.chunk_users - 1, args.users)
+            self.generate_activity(first, last)
+            print(f"  users {last:,}/{args.users:,}: {self.next_enrollment_id - 1:,} enrollments, "
+                  f"{self.counts.get('user_task_completion', 0):,} task completions")
+        print(f"[OK] Generated activity in {time.perf_counter() - started:.1f}s")
+
+        started = time.perf_counter()
+        self.sync_course_ratings()
+        self.rebuild_derived_state()
+        self.analyze_tables()
+        print(f"[OK] Rebuilt counters and statistics in {time.perf_counter() - started:.1f}s")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Generate and bulk-load a large EduConnect dataset')
+    parser.add_argument('--scale', choices=SCALES, default='small', help='Preset ukuran dataset')
+    parser.add_argument('--users', type=int, help='Jumlah user (override preset)')
+    parser.add_argument('--courses', type=int, help='Jumlah course (override preset)')
+    parser.add_argument('--enrollments', type=int, help='Perkiraan jumlah enrollment (override preset)')
+    parser.add_argument('--completions', type=int, help='Perkiraan jumlah task completed (override preset)')
+    parser.add_argument('--modules-per-course', type=int, default=5)
+    parser.add_argument('--tasks-per-course', type=int, default=10)
+    parser.add_argument('--submission-rate', type=float, default=0.5, help='Porsi task completed yang punya submission')
+    parser.add_argument('--review-rate', type=float, default=0.3, help='Porsi student aktif yang menulis review')
+    parser.add_argument('--method', choices=('insert', 'load-data'), default='insert',
+                        help='insert = multi-row INSERT, load-data = LOAD DATA LOCAL INFILE (butuh local_infile=ON di MySQL)')
+    parser.add_argument('--batch-size', type=int, default=10_000, help='Jumlah row per multi-row INSERT')
+    parser.add_argument('--chunk-users', type=int, default=2_000, help='Jumlah user yang aktivitasnya di-generate sekaligus')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--reset', action='store_true', help='Kosongkan semua tabel di kelima database terlebih dahulu')
+    args = parser.parse_args()
+
+    for key, value in SCALES[args.scale].items():
+        if getattr(args, key) is None:
+            setattr(args, key, value)
+    if min(args.users, args.courses, args.tasks_per_course) < 1:
+        parser.error('users, courses, dan tasks-per-course harus >= 1')
+    return args
+
+def main():
+    args = parse_args()
+    print("=" * 60)
+    print(f"Generating dataset: {args.users:,} users, {args.courses:,} courses, "
+          f"~{args.enrollments:,} enrollments, ~{args.completions:,} task completions")
+    print("=" * 60)
+    if args.enrollments and args.completions > args.enrollments * args.tasks_per_course * COMPLETION_RATE_MAX:
+        print(f"[WARNING] --completions melebihi {COMPLETION_RATE_MAX:.0%} dari enrollments x tasks-per-course; "
+              f"completion rate dibatasi di {COMPLETION_RATE_MAX}")
+
+    services = {name: load_service(name) for name in SERVICE_NAMES}
+    connect_args = {'local_infile': True} if args.method == 'load-data' else {}
+    engines = {}
+    for name in SERVICE_NAMES:
+        database = DATABASES[f'{name}_service']
+        create_database(database)
+        engines[name] = create_engine(connection_string(database), connect_args=connect_args)
+
+    prepare_databases(services, engines, args.reset)
+
+    started = time.perf_counter()
+    generator = DatasetGenerator(args, services, engines)
+    generator.run()
+
+    print("\n" + "=" * 60)
+    for table, count in generator.counts.items():
+        print(f"{table:<28} {count:>14,}")
+    print(f"[OK] Dataset loaded in {time.perf_counter() - started:.1f}s")
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,18 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import bindparam, case, func, insert, select
 from datetime import datetime
+import hashlib
+import json
 import os
 import sys
+import threading
 
 # Add parent directory to path for config
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from config import DB_CONFIG, DATABASES
+from db_utils import parse_fields, serialize_value, upgrade_schema, with_fields
 
 app = Flask(__name__)
 
@@ -31,6 +36,25 @@ app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
 db = SQLAlchemy(app)
 CORS(app)
 
+# Facet buckets: (label, batas atas eksklusif); bucket terakhir menampung sisanya
+PRICE_BUCKETS = [('free', 0.01), ('under_50', 50), ('50_to_100', 100), ('100_plus', None)]
+DURATION_BUCKETS = [('under_5h', 5), ('5_to_10h', 10), ('10_to_20h', 20), ('20h_plus', None)]
+
+# Facet cache: hasil agregasi per kombinasi filter, dikosongkan setiap ada write ke course.
+# facet_cache_generation dinaikkan saat invalidasi supaya hasil query yang sedang berjalan
+# (dihitung sebelum write) tidak ikut disimpan ke cache.
+FACET_CACHE_MAX_ENTRIES = 256
+facet_cache = {}
+facet_cache_generation = 0
+facet_cache_lock = threading.Lock()
+
+def invalidate_facet_cache():
+    """Kosongkan facet cache setelah course dibuat, diubah, atau dihapus"""
+    global facet_cache_generation
+    with facet_cache_lock:
+        facet_cache.clear()
+        facet_cache_generation += 1
+
 # Models
 class Course(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -42,47 +66,222 @@ class Course(db.Model):
     duration_hours = db.Column(db.Float, default=0.0)
     level = db.Column(db.String(50), default='beginner')
     image_url = db.Column(db.String(500))
+    # Rating summary denormalized, di-feed oleh event dari review service
+    average_rating = db.Column(db.Float, default=0.0)
+    review_count = db.Column(db.Integer, default=0)
+    rating_distribution = db.Column(db.JSON)
+    rating_synced_at = db.Column(db.DateTime, nullable=True)  # computed_at dari event terakhir
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
     updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'title': self.title,
-            'description': self.description,
-            'instructor_id': self.instructor_id,
-            'category': self.category,
-            'price': self.price,
-            'duration_hours': self.duration_hours,
-            'level': self.level,
-            'image_url': self.image_url,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
+    # Composite index untuk access path catalog: filter equality (category/level) lalu
+    # range filter atau sort pada price/duration/created_at/rating, plus index tunggal
+    # untuk sort/range tanpa filter. InnoDB menyimpan primary key di setiap secondary
+    # index, jadi query dengan fields=id,<kolom sort> bisa dijawab index-only.
+    __table_args__ = (
+        db.Index('ix_course_category_price', 'category', 'price'),
+        db.Index('ix_course_level_price', 'level', 'price'),
+        db.Index('ix_course_category_duration', 'category', 'duration_hours'),
+        db.Index('ix_course_category_created', 'category', 'created_at'),
+        db.Index('ix_course_category_rating', 'category', 'average_rating'),
+        db.Index('ix_course_price', 'price'),
+        db.Index('ix_course_duration', 'duration_hours'),
+        db.Index('ix_course_created', 'created_at'),
+        db.Index('ix_course_rating', 'average_rating'),
+    )
+    
+    SERIALIZABLE_FIELDS = ('id', 'title', 'description', 'instructor_id', 'category', 'price',
+                           'duration_hours', 'level', 'image_url', 'average_rating', 'review_count',
+                           'rating_distribution', 'created_at', 'updated_at')
+    
+    def to_dict(self, fields=None):
+        return {field: serialize_value(getattr(self, field)) for field in (fields or self.SERIALIZABLE_FIELDS)}
+
+class SeedState(db.Model):
+    """Hash seed manifest yang terakhir diterapkan"""
+    name = db.Column(db.String(100), primary_key=True)
+    content_hash = db.Column(db.String(64), nullable=False)
+    applied_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+
+# Routes
+# Query parameters yang dipakai untuk filter course (juga menjadi key facet cache)
+COURSE_FILTER_PARAMS = ('category', 'level', 'instructor_id')
+COURSE_RANGE_PARAMS = ('price_min', 'price_max', 'duration_min', 'duration_max')
+
+# Nilai ?sort= yang didukung (prefix '-' untuk descending)
+COURSE_SORT_COLUMNS = {
+    'price': Course.price,
+    'duration_hours': Course.duration_hours,
+    'created_at': Course.created_at,
+    'rating': Course.average_rating
+}
+
+# Pagination GET /api/courses (?limit=&offset=); tanpa keduanya semua course dikembalikan
+COURSE_LIST_DEFAULT_LIMIT = 50
+COURSE_LIST_MAX_LIMIT = 200
+
+def get_course_filters():
+    """Ambil filter course yang aktif dari query string"""
+    filters = {name: request.args.get(name) for name in COURSE_FILTER_PARAMS if request.args.get(name)}
+    
+    for name in COURSE_RANGE_PARAMS:
+        value = request.args.get(name)
+        if value is None or value == '':
+            continue
+        try:
+            filters[name] = float(value)
+        except ValueError:
+            return None, f'{name} must be a number'
+    
+    return filters, None
+
+def apply_course_filters(query, filters):
+    """Terapkan filter course ke query"""
+    if filters.get('category'):
+        query = query.filter(Course.category == filters['category'])
+    if filters.get('level'):
+        query = query.filter(Course.level == filters['level'])
+    if filters.get('instructor_id'):
+        query = query.filter(Course.instructor_id == filters['instructor_id'])
+    if 'price_min' in filters:
+        query = query.filter(Course.price >= filters['price_min'])
+    if 'price_max' in filters:
+        query = query.filter(Course.price <= filters['price_max'])
+    if 'duration_min' in filters:
+        query = query.filter(Course.duration_hours >= filters['duration_min'])
+    if 'duration_max' in filters:
+        query = query.filter(Course.duration_hours <= filters['duration_max'])
+    return query
+
+def apply_course_sort(query, sort):
+    """Terapkan ?sort= ke query, dengan id sebagai tie-breaker supaya urutan stabil"""
+    descending = sort.startswith('-')
+    column = COURSE_SORT_COLUMNS.get(sort.lstrip('-'))
+    if column is None:
+        return None
+    
+    if descending:
+        return query.order_by(column.desc(), Course.id.desc())
+    return query.order_by(column.asc(), Course.id.asc())
+
+def paginate_course_query(query, sort, limit, offset):
+    """Urutkan query (default by id) lalu batasi dengan limit/offset (limit None = tanpa batas), None jika sort tidak valid"""
+    if sort:
+        query = apply_course_sort(query, sort)
+        if query is None:
+            return None
+    else:
+        query = query.order_by(Course.id.asc())
+    if limit is None:
+        return query
+    return query.limit(limit).offset(offset)
+
+def bucket_expression(column, buckets):
+    """CASE expression yang memetakan nilai kolom ke label bucket"""
+    value = func.coalesce(column, 0)
+    whens = [(value < upper, label) for label, upper in buckets if upper is not None]
+    return case(*whens, else_=buckets[-1][0])
+
+def compute_course_facets(filters):
+    """Hitung jumlah course per category, level, price band dan duration bucket"""
+    price_bucket = bucket_expression(Course.price, PRICE_BUCKETS).label('price_bucket')
+    duration_bucket = bucket_expression(Course.duration_hours, DURATION_BUCKETS).label('duration_bucket')
+    
+    # Satu GROUP BY untuk semua dimensi, lalu di-roll up per facet di Python
+    # (jumlah kombinasi kecil, jadi tabel course cukup di-scan sekali)
+    query = db.session.query(
+        Course.category, Course.level, price_bucket, duration_bucket, func.count(Course.id)
+    )
+    query = apply_course_filters(query, filters)
+    rows = query.group_by(Course.category, Course.level, price_bucket, duration_bucket).all()
+    
+    facets = {
+        'category': {},
+        'level': {},
+        'price': {label: 0 for label, _ in PRICE_BUCKETS},
+        'duration': {label: 0 for label, _ in DURATION_BUCKETS}
+    }
+    total = 0
+    for category, level, price_label, duration_label, count in rows:
+        category = category or 'uncategorized'
+        level = level or 'unknown'
+        facets['category'][category] = facets['category'].get(category, 0) + count
+        facets['level'][level] = facets['level'].get(level, 0) + count
+        facets['price'][price_label] += count
+        facets['duration'][duration_label] += count
+        total += count
+    
+    return {'total': total, 'facets': facets}
 
 # Routes
 @app.route('/api/courses', methods=['GET'])
 def get_courses():
-    category = request.args.get('category')
-    level = request.args.get('level')
-    instructor_id = request.args.get('instructor_id')
+    fields, error = parse_fields(Course)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    filters, error = get_course_filters()
+    if error:
+        return jsonify({'error': error}), 400
     
-    query = Course.query
+    # Pagination hanya jika client memintanya; frontend memuat seluruh catalog sekaligus
+    limit = None
+    offset = 0
+    if 'limit' in request.args or 'offset' in request.args:
+        limit = request.args.get('limit', COURSE_LIST_DEFAULT_LIMIT, type=int)
+        offset = request.args.get('offset', 0, type=int)
+        if limit is None or offset is None or not 0 < limit <= COURSE_LIST_MAX_LIMIT or offset < 0:
+            return jsonify({'error': f'limit must be between 1 and {COURSE_LIST_MAX_LIMIT}, offset must be >= 0'}), 400
     
-    if category:
-        query = query.filter_by(category=category)
-    if level:
-        query = query.filter_by(level=level)
-    if instructor_id:
-        query = query.filter_by(instructor_id=instructor_id)
+    query = with_fields(Course.query, Course, fields)
+    query = apply_course_filters(query, filters)
+    query = paginate_course_query(query, request.args.get('sort'), limit, offset)
+    if query is None:
+        return jsonify({'error': f"Invalid sort. Use one of: {', '.join(COURSE_SORT_COLUMNS)}"}), 400
     
     courses = query.all()
-    return jsonify([course.to_dict() for course in courses]), 200
+    return jsonify([course.to_dict(fields) for course in courses]), 200
+
+@app.route('/api/courses/facets', methods=['GET'])
+def get_course_facets():
+    """Get course counts per category, level, price band and duration bucket"""
+    filters, error = get_course_filters()
+    if error:
+        return jsonify({'error': error}), 400
+    
+    cache_key = tuple(sorted(filters.items()))
+    
+    with facet_cache_lock:
+        cached = facet_cache.get(cache_key)
+        generation = facet_cache_generation
+    
+    if cached is None:
+        cached = compute_course_facets(filters)
+        with facet_cache_lock:
+            # Jangan simpan hasil yang sudah basi karena ada write selama query berjalan
+            if generation == facet_cache_generation:
+                if len(facet_cache) >= FACET_CACHE_MAX_ENTRIES:
+                    facet_cache.pop(next(iter(facet_cache)))
+                facet_cache[cache_key] = cached
+        from_cache = False
+    else:
+        from_cache = True
+    
+    return jsonify({
+        'filters': filters,
+        'total': cached['total'],
+        'facets': cached['facets'],
+        'cached': from_cache
+    }), 200
 
 @app.route('/api/courses/<int:course_id>', methods=['GET'])
 def get_course(course_id):
-    course = Course.query.get_or_404(course_id)
-    return jsonify(course.to_dict()), 200
+    fields, error = parse_fields(Course)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    course = with_fields(Course.query, Course, fields).get_or_404(course_id)
+    return jsonify(course.to_dict(fields)), 200
 
 @app.route('/api/courses', methods=['POST'])
 def create_course():
@@ -101,6 +300,7 @@ def create_course():
     
     db.session.add(course)
     db.session.commit()
+    invalidate_facet_cache()
     
     return jsonify({
         'message': 'Course created successfully',
@@ -122,6 +322,7 @@ def update_course(course_id):
     course.updated_at = datetime.utcnow()
     
     db.session.commit()
+    invalidate_facet_cache()
     
     return jsonify({
         'message': 'Course updated successfully',
@@ -133,75 +334,133 @@ def delete_course(course_id):
     course = Course.query.get_or_404(course_id)
     db.session.delete(course)
     db.session.commit()
+    invalidate_facet_cache()
     
     return jsonify({'message': 'Course deleted successfully'}), 200
 
+@app.route('/api/courses/<int:course_id>/clone', methods=['POST'])
+def clone_course(course_id):
+    """Salin row course sebagai course baru (INSERT ... SELECT); rating tidak ikut disalin"""
+    data = request.get_json(silent=True) or {}
+    now = datetime.utcnow()
+
+    title = bindparam('title', data['title']) if data.get('title') else func.substr(Course.title + ' (Copy)', 1, 200)
+    instructor_id = bindparam('instructor_id', data['instructor_id']) if data.get('instructor_id') else Course.instructor_id
+    result = db.session.execute(insert(Course).from_select(
+        ['title', 'description', 'instructor_id', 'category', 'price', 'duration_hours', 'level',
+         'image_url', 'average_rating', 'review_count', 'created_at', 'updated_at'],
+        select(
+            title, Course.description, instructor_id, Course.category, Course.price, Course.duration_hours,
+            Course.level, Course.image_url, bindparam('average_rating', 0.0), bindparam('review_count', 0),
+            bindparam('created_at', now), bindparam('updated_at', now)
+        ).where(Course.id == course_id)
+    ))
+    if not result.rowcount:
+        db.session.rollback()
+        return jsonify({'error': 'Course not found'}), 404
+
+    clone_id = result.lastrowid
+    db.session.commit()
+    invalidate_facet_cache()
+
+    return jsonify({
+        'message': 'Course cloned successfully',
+        'source_course_id': course_id,
+        'course': db.session.get(Course, clone_id).to_dict()
+    }), 201
+
+@app.route('/api/courses/<int:course_id>/rating-summary', methods=['PUT'])
+def update_course_rating_summary(course_id):
+    """Terima event perubahan review dari review service (internal, tidak lewat gateway)"""
+    data = request.get_json()
+    
+    try:
+        computed_at = datetime.fromisoformat(data['computed_at'])
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'error': 'computed_at is required'}), 400
+    
+    # Event membawa snapshot lengkap, jadi cukup satu UPDATE. Snapshot yang lebih lama
+    # dari yang sudah tersimpan diabaikan supaya event yang datang terlambat tidak menimpa.
+    applied = Course.query.filter(
+        Course.id == course_id,
+        db.or_(Course.rating_synced_at.is_(None), Course.rating_synced_at <= computed_at)
+    ).update({
+        Course.average_rating: data.get('average_rating', 0.0),
+        Course.review_count: data.get('total_reviews', 0),
+        Course.rating_distribution: data.get('rating_distribution'),
+        Course.rating_synced_at: computed_at,
+        Course.updated_at: Course.updated_at
+    }, synchronize_session=False)
+    db.session.commit()
+    
+    if not applied and db.session.get(Course, course_id) is None:
+        return jsonify({'error': 'Course not found'}), 404
+    
+    return jsonify({'message': 'Rating summary updated', 'applied': bool(applied)}), 200
+
 @app.route('/api/health', methods=['GET'])
 def health():
     return jsonify({'status': 'healthy', 'service': 'course_service'}), 200
 
+# Seed manifest: sample course dideklarasikan di seed_manifest.json dengan title sebagai key.
+# Course yang sudah ada dibaca sekali, lalu course yang belum ada di-insert dalam satu bulk
+# insert dan image yang masih kosong/placeholder di-update dalam satu executemany. Hash isi
+# manifest disimpan di SeedState, jadi manifest yang tidak berubah dilewati saat startup.
+SEED_MANIFEST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'seed_manifest.json')
+SEED_STATE_NAME = 'course_seed_manifest'
+
+def load_seed_manifest():
+    """Return (manifest, sha256 isi file)"""
+    with open(SEED_MANIFEST_PATH, 'rb') as f:
+        raw = f.read()
+    return json.loads(raw), hashlib.sha256(raw).hexdigest()
+
+def apply_seed_manifest():
+    """Terapkan seed manifest; return (course baru, image di-update) atau None jika manifest tidak berubah"""
+    manifest, content_hash = load_seed_manifest()
+    state = db.session.get(SeedState, SEED_STATE_NAME)
+    if state is not None and state.content_hash == content_hash:
+        return None
+    
+    courses = manifest.get('courses', [])
+    existing = {
+        title: (course_id, image_url)
+        for course_id, title, image_url in db.session.query(Course.id, Course.title, Course.image_url).filter(
+            Course.title.in_([course['title'] for course in courses])
+        )
+    }
+    new_courses = [course for course in courses if course['title'] not in existing]
+    image_updates = [
+        {'b_id': existing[course['title']][0], 'b_image_url': course['image_url']}
+        for course in courses
+        if course['title'] in existing and course.get('image_url')
+        and (not existing[course['title']][1] or 'placeholder' in existing[course['title']][1].lower())
+    ]
+    
+    if new_courses:
+        db.session.execute(insert(Course), new_courses)
+    if image_updates:
+        db.session.execute(
+            Course.__table__.update().where(Course.id == bindparam('b_id')).values(image_url=bindparam('b_image_url')),
+            image_updates
+        )
+    db.session.merge(SeedState(name=SEED_STATE_NAME, content_hash=content_hash, applied_at=datetime.utcnow()))
+    db.session.commit()
+    if new_courses or image_updates:
+        invalidate_facet_cache()
+    return len(new_courses), len(image_updates)
+
 def initialize_database():
     """Initialize database and create sample data"""
     try:
         db.create_all()
+        upgrade_schema(db)
         
-        # Course images mapping
-        course_images = {
-            'Python Programming Basics': 'https://images.unsplash.com/photo-1526379095098-d400fd0bf935?w=800&h=600&fit=crop&q=80',
-            'Advanced Web Development': 'https://images.unsplash.com/photo-1461749280684-dccba630e2f6?w=800&h=600&fit=crop&q=80',
-            'Machine Learning Fundamentals': 'https://images.unsplash.com/photo-1555949963-aa79dcee981c?w=800&h=600&fit=crop&q=80'
-        }
-        
-        # Add sample courses
-        if Course.query.count() == 0:
-            sample_courses = [
-                Course(
-                    title='Python Programming Basics',
-                    description='Learn the fundamentals of Python programming language',
-                    instructor_id=1,
-                    category='Programming',
-                    price=49.99,
-                    duration_hours=10.0,
-                    level='beginner',
-                    image_url=course_images['Python Programming Basics']
-                ),
-                Course(
-                    title='Advanced Web Development',
-                    description='Master modern web development with React and Node.js',
-                    instructor_id=1,
-                    category='Web Development',
-                    price=79.99,
-                    duration_hours=20.0,
-                    level='intermediate',
-                    image_url=course_images['Advanced Web Development']
-                ),
-                Course(
-                    title='Machine Learning Fundamentals',
-                    description='Introduction to machine learning and data science',
-                    instructor_id=1,
-                    category='Data Science',
-                    price=99.99,
-                    duration_hours=30.0,
-                    level='advanced',
-                    image_url=course_images['Machine Learning Fundamentals']
-                ),
-            ]
-            for course in sample_courses:
-                db.session.add(course)
-            db.session.commit()
-            print("[OK] Sample courses created successfully")
+        seeded = apply_seed_manifest()
+        if seeded is None:
+            print("[OK] Seed manifest unchanged, skipped")
         else:
-            print("[OK] Courses already exist")
-            # Update existing courses with placeholder images
-            updated_count = 0
-            for title, image_url in course_images.items():
-                course = Course.query.filter_by(title=title).first()
-                if course and (not course.image_url or 'placeholder' in course.image_url.lower()):
-                    course.image_url = image_url
-                    updated_count += 1
-            if updated_count > 0:
-                db.session.commit()
-                print(f"[OK] Updated {updated_count} course(s) with new images")
+            print(f"[OK] Seed manifest applied: {seeded[0]} new course(s), {seeded[1]} image(s) updated")
         return True
     except Exception as e:
         print(f"[WARNING] Error initializing database: {e}")
@@ -1,13 +1,23 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import func, insert, select, tuple_
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.exc import IntegrityError
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import json
 import os
 import sys
+import threading
+import time
+import requests
 
 # Add parent directory to path for config
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-from config import DB_CONFIG, DATABASES
+from config import DB_CONFIG, DATABASES, ENROLLMENT_CACHE, SERVICES
+from db_utils import is_valid_id, parse_fields, serialize_value, with_fields
 
 app = Flask(__name__)
 
@@ -42,24 +52,356 @@ class Enrollment(db.Model):
     
     __table_args__ = (db.UniqueConstraint('user_id', 'course_id', name='unique_user_course'),)
     
+    SERIALIZABLE_FIELDS = ('id', 'user_id', 'course_id', 'enrolled_at', 'status', 'completed_at')
+    
+    def to_dict(self, fields=None):
+        return {field: serialize_value(getattr(self, field)) for field in (fields or self.SERIALIZABLE_FIELDS)}
+
+class EnrollmentCounter(db.Model):
+    """Jumlah enrollment per (course_id, status), di-update di transaksi yang sama dengan Enrollment"""
+    course_id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(50), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+def adjust_enrollment_counters(deltas):
+    """Tambahkan delta {(course_id, status): n} ke counter dalam transaksi yang sedang berjalan"""
+    rows = [
+        {'course_id': course_id, 'status': status, 'count': delta}
+        for (course_id, status), delta in deltas.items() if delta and status is not None
+    ]
+    if not rows:
+        return
+    
+    stmt = mysql_insert(EnrollmentCounter).values(rows)
+    stmt = stmt.on_duplicate_key_update(count=EnrollmentCounter.count + stmt.inserted['count'])
+    db.session.execute(stmt)
+
+def rebuild_enrollment_counters():
+    """Bangun ulang semua counter dari tabel Enrollment (repair jika terjadi drift)"""
+    db.session.query(EnrollmentCounter).delete()
+    db.session.execute(insert(EnrollmentCounter).from_select(
+        ['course_id', 'status', 'count'],
+        select(Enrollment.course_id, Enrollment.status, func.count(Enrollment.id))
+        .where(Enrollment.status.isnot(None))
+        .group_by(Enrollment.course_id, Enrollment.status)
+    ))
+    db.session.commit()
+    return db.session.query(func.count()).select_from(EnrollmentCounter).scalar()
+
+class EnrollmentEvent(db.Model):
+    """Transactional outbox: perubahan enrollment, ditulis di transaksi yang sama dengan perubahannya"""
+    id = db.Column(db.Integer, primary_key=True)
+    # Offset di feed, diisi oleh relay sesuai urutan commit (NULL = belum dipublish)
+    sequence = db.Column(db.Integer, unique=True, nullable=True)
+    event_type = db.Column(db.String(50), nullable=False)  # enrollment.created, enrollment.updated, enrollment.deleted
+    enrollment_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    course_id = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(50))
+    occurred_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    published_at = db.Column(db.DateTime, nullable=True)
+    
     def to_dict(self):
         return {
-            'id': self.id,
+            'offset': self.sequence,
+            'event_type': self.event_type,
+            'enrollment_id': self.enrollment_id,
             'user_id': self.user_id,
             'course_id': self.course_id,
-            'enrolled_at': self.enrolled_at.isoformat() if self.enrolled_at else None,
             'status': self.status,
-            'completed_at': self.completed_at.isoformat() if self.completed_at else None
+            'occurred_at': serialize_value(self.occurred_at),
+            'published_at': serialize_value(self.published_at)
         }
 
+def record_enrollment_events(event_type, rows):
+    """Tulis event ke outbox dalam transaksi yang sedang berjalan; rows = [(id, user_id, course_id, status)]"""
+    if not rows:
+        return
+    db.session.execute(insert(EnrollmentEvent), [
+        {'event_type': event_type, 'enrollment_id': enrollment_id, 'user_id': user_id,
+         'course_id': course_id, 'status': status}
+        for enrollment_id, user_id, course_id, status in rows
+    ])
+    outbox_pending.set()
+
+# Outbox relay: memberi offset berurutan ke event yang sudah commit lalu membangunkan
+# consumer yang sedang long-poll. Offset diberikan oleh relay (bukan autoincrement id)
+# karena transaksi dengan id lebih kecil bisa commit belakangan; consumer yang
+# menyimpan offset terakhir tidak akan melewatkan event tersebut.
+OUTBOX_RELAY_INTERVAL_SECONDS = 1.0
+OUTBOX_RELAY_BATCH_SIZE = 500
+OUTBOX_FEED_MAX_LIMIT = 1000
+OUTBOX_FEED_MAX_WAIT_SECONDS = 30
+outbox_pending = threading.Event()
+outbox_published = threading.Condition()
+
+def relay_outbox_events():
+    """Publish satu batch event yang belum punya offset, return jumlah event"""
+    events = EnrollmentEvent.query.filter(EnrollmentEvent.sequence.is_(None)).order_by(
+        EnrollmentEvent.id.asc()
+    ).limit(OUTBOX_RELAY_BATCH_SIZE).all()
+    if not events:
+        return 0
+    
+    last_sequence = db.session.query(func.max(EnrollmentEvent.sequence)).scalar() or 0
+    published_at = datetime.utcnow()
+    for event in events:
+        last_sequence += 1
+        event.sequence = last_sequence
+        event.published_at = published_at
+    
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Relay di replica lain mengambil offset yang sama; coba lagi di putaran berikutnya
+        db.session.rollback()
+        return 0
+    
+    with outbox_published:
+        outbox_published.notify_all()
+    return len(events)
+
+def outbox_relay_loop():
+    while True:
+        outbox_pending.wait(OUTBOX_RELAY_INTERVAL_SECONDS)
+        outbox_pending.clear()
+        try:
+            with app.app_context():
+                while relay_outbox_events() == OUTBOX_RELAY_BATCH_SIZE:
+                    pass
+        except Exception as e:
+            print(f"[WARNING] Outbox relay error: {e}")
+
+def start_outbox_relay():
+    threading.Thread(target=outbox_relay_loop, daemon=True).start()
+
+# Progress initialization: setelah enroll, Progress row di progress service di-seed
+# secara asynchronous supaya response enroll tidak menunggu service lain.
+# Gagal -> dijadwalkan ulang dengan exponential backoff.
+PROGRESS_INIT_MAX_ATTEMPTS = 6
+progress_init_lock = threading.Lock()
+progress_init_executor = None
+
+def schedule_progress_initialization(enrollment, attempt=1):
+    """Seed Progress row untuk enrollment baru tanpa memblokir request"""
+    global progress_init_executor
+    payload = {
+        'user_id': enrollment['user_id'],
+        'course_id': enrollment['course_id'],
+        'enrollment_id': enrollment['id'],
+        'completion_percentage': 0,
+        'status': 'in_progress'
+    }
+    with progress_init_lock:
+        if progress_init_executor is None:
+            progress_init_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='progress-init')
+    progress_init_executor.submit(initialize_progress, payload, attempt)
+
+def initialize_progress(payload, attempt):
+    try:
+        # POST /api/progress idempotent untuk enrollment_id yang sama, jadi aman di-retry
+        response = requests.post(f"{SERVICES['progress']}/api/progress", json=payload, timeout=5)
+        if response.ok:
+            return
+        error = f'status {response.status_code}'
+    except requests.exceptions.RequestException as e:
+        error = str(e)
+    
+    if attempt >= PROGRESS_INIT_MAX_ATTEMPTS:
+        print(f"[WARNING] Giving up progress initialization for enrollment {payload['enrollment_id']}: {error}")
+        return
+    
+    delay = min(2 ** attempt, 60)
+    retry = threading.Timer(delay, schedule_progress_initialization, args=(
+        {'id': payload['enrollment_id'], 'user_id': payload['user_id'], 'course_id': payload['course_id']},
+        attempt + 1
+    ))
+    retry.daemon = True
+    retry.start()
+
+# Enrollment Cache - active enrollments per user
+# Setiap backend menyimpan versi per user yang dinaikkan saat invalidasi. Hasil load disimpan
+# hanya jika versinya belum berubah sejak sebelum query, supaya data lama dari load yang
+# berjalan bersamaan dengan write tidak masuk lagi ke cache.
+class LocalCacheBackend:
+    """LRU cache in-process dengan batas jumlah user dan TTL"""
+    name = 'local'
+    
+    def __init__(self, max_entries, ttl_seconds):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()
+        # Satu proses, jadi satu generation untuk semua user sudah cukup
+        self.generation = 0
+        self.lock = threading.Lock()
+    
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+    
+    def version(self, key):
+        with self.lock:
+            return self.generation
+    
+    def set(self, key, value, version):
+        with self.lock:
+            if version != self.generation:
+                return
+            self.entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+    
+    def delete(self, keys):
+        with self.lock:
+            self.generation += 1
+            for key in keys:
+                self.entries.pop(key, None)
+    
+    def size(self):
+        return len(self.entries)
+
+class RedisCacheBackend:
+    """Cache bersama di Redis supaya semua replica melihat invalidasi yang sama"""
+    name = 'redis'
+    # Versi disimpan jauh lebih lama dari TTL cache, supaya versi tidak hilang di tengah load
+    VERSION_TTL_SECONDS = 86400
+    # SETEX hanya jika versi user masih sama dengan yang dibaca sebelum query (atomic di Redis)
+    SET_IF_VERSION_SCRIPT = """
+    if (redis.call('GET', KEYS[1]) or '0') == ARGV[1] then
+        redis.call('SETEX', KEYS[2], ARGV[2], ARGV[3])
+        return 1
+    end
+    return 0
+    """
+    
+    def __init__(self, url, ttl_seconds):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.ttl_seconds = ttl_seconds
+        self.set_if_version = self.client.register_script(self.SET_IF_VERSION_SCRIPT)
+    
+    def get(self, key):
+        value = self.client.get(f'enrollments:user:{key}')
+        return json.loads(value) if value is not None else None
+    
+    def version(self, key):
+        value = self.client.get(f'enrollments:version:{key}')
+        return value.decode() if value is not None else '0'
+    
+    def set(self, key, value, version):
+        self.set_if_version(
+            keys=[f'enrollments:version:{key}', f'enrollments:user:{key}'],
+            args=[version, self.ttl_seconds, json.dumps(value)]
+        )
+    
+    def delete(self, keys):
+        if not keys:
+            return
+        # INCR versi dulu, baru DEL: load yang sedang berjalan di replica mana pun tidak bisa SET lagi
+        pipeline = self.client.pipeline()
+        for key in keys:
+            pipeline.incr(f'enrollments:version:{key}')
+            pipeline.expire(f'enrollments:version:{key}', self.VERSION_TTL_SECONDS)
+        pipeline.delete(*[f'enrollments:user:{key}' for key in keys])
+        pipeline.execute()
+    
+    def size(self):
+        return None
+
+class EnrollmentCache:
+    """Cache active enrollments per user, di-invalidate setiap enrollment user berubah"""
+    
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.lock = threading.Lock()
+    
+    def get_active_enrollments(self, user_id):
+        try:
+            cached = self.backend.get(user_id)
+            # Versi dibaca sebelum query database
+            version = self.backend.version(user_id) if cached is None else None
+        except Exception as e:
+            print(f"[WARNING] Enrollment cache unavailable: {e}")
+            cached = version = None
+        
+        if cached is not None:
+            with self.lock:
+                self.hits += 1
+            return cached
+        
+        with self.lock:
+            self.misses += 1
+        
+        enrollments = [e.to_dict() for e in Enrollment.query.filter_by(user_id=user_id, status='active').all()]
+        
+        if version is not None:
+            try:
+                self.backend.set(user_id, enrollments, version)
+            except Exception as e:
+                print(f"[WARNING] Enrollment cache unavailable: {e}")
+        return enrollments
+    
+    def invalidate(self, user_ids):
+        user_ids = list(set(user_ids))
+        with self.lock:
+            self.invalidations += len(user_ids)
+        try:
+            self.backend.delete(user_ids)
+        except Exception as e:
+            print(f"[WARNING] Enrollment cache unavailable: {e}")
+    
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': self.backend.name,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'invalidations': self.invalidations,
+                'size': self.backend.size()
+            }
+
+def create_enrollment_cache():
+    if ENROLLMENT_CACHE['url']:
+        try:
+            return EnrollmentCache(RedisCacheBackend(ENROLLMENT_CACHE['url'], ENROLLMENT_CACHE['ttl_seconds']))
+        except ImportError:
+            print("[WARNING] Package redis belum terinstall, memakai enrollment cache in-process")
+    return EnrollmentCache(LocalCacheBackend(ENROLLMENT_CACHE['max_users'], ENROLLMENT_CACHE['ttl_seconds']))
+
+enrollment_cache = create_enrollment_cache()
+
 # Routes
 @app.route('/api/enrollments', methods=['GET'])
 def get_enrollments():
     user_id = request.args.get('user_id')
     course_id = request.args.get('course_id')
     status = request.args.get('status')
+    fields, error = parse_fields(Enrollment)
+    if error:
+        return jsonify({'error': error}), 400
     
-    query = Enrollment.query
+    # Hot path (dipanggil hampir di setiap page load): active enrollments milik satu user
+    if user_id and status == 'active' and not course_id and user_id.isdigit():
+        enrollments = enrollment_cache.get_active_enrollments(int(user_id))
+        if fields:
+            enrollments = [{field: enrollment[field] for field in fields} for enrollment in enrollments]
+        return jsonify(enrollments), 200
+    
+    query = with_fields(Enrollment.query, Enrollment, fields)
     
     if user_id:
         query = query.filter_by(user_id=user_id)
@@ -69,12 +411,16 @@ def get_enrollments():
         query = query.filter_by(status=status)
     
     enrollments = query.all()
-    return jsonify([enrollment.to_dict() for enrollment in enrollments]), 200
+    return jsonify([enrollment.to_dict(fields) for enrollment in enrollments]), 200
 
 @app.route('/api/enrollments/<int:enrollment_id>', methods=['GET'])
 def get_enrollment(enrollment_id):
-    enrollment = Enrollment.query.get_or_404(enrollment_id)
-    return jsonify(enrollment.to_dict()), 200
+    fields, error = parse_fields(Enrollment)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    enrollment = with_fields(Enrollment.query, Enrollment, fields).get_or_404(enrollment_id)
+    return jsonify(enrollment.to_dict(fields)), 200
 
 @app.route('/api/enrollments', methods=['POST'])
 def create_enrollment():
@@ -94,23 +440,138 @@ def create_enrollment():
     )
     
     db.session.add(enrollment)
+    db.session.flush()
+    adjust_enrollment_counters({(enrollment.course_id, enrollment.status): 1})
+    record_enrollment_events('enrollment.created', [
+        (enrollment.id, enrollment.user_id, enrollment.course_id, enrollment.status)
+    ])
     db.session.commit()
+    enrollment_cache.invalidate([enrollment.user_id])
+    
+    # One-call enroll: seed Progress row di background, response tidak menunggu
+    if data.get('initialize_progress'):
+        schedule_progress_initialization(enrollment.to_dict())
     
     return jsonify({
         'message': 'Enrollment created successfully',
         'enrollment': enrollment.to_dict()
     }), 201
 
+# Bulk enrollment: jumlah pasangan per multi-row INSERT + commit, dan batas per request
+BULK_ENROLLMENT_CHUNK_SIZE = 1000
+BULK_ENROLLMENT_MAX_ROWS = 50000
+
+def parse_bulk_enrollment_pairs(data):
+    """Ambil list (user_id, course_id) dari body: 'enrollments' atau 'course_id' + 'user_ids'"""
+    if isinstance(data.get('enrollments'), list):
+        return [(item.get('user_id'), item.get('course_id')) if isinstance(item, dict) else (None, None)
+                for item in data['enrollments']]
+    if 'course_id' in data and isinstance(data.get('user_ids'), list):
+        return [(user_id, data['course_id']) for user_id in data['user_ids']]
+    return None
+
+def insert_enrollment_chunk(pairs, status):
+    """Insert satu chunk pasangan unik, return {(user_id, course_id): (hasil, enrollment_id)}"""
+    existing = {
+        (user_id, course_id): enrollment_id
+        for enrollment_id, user_id, course_id in db.session.query(
+            Enrollment.id, Enrollment.user_id, Enrollment.course_id
+        ).filter(tuple_(Enrollment.user_id, Enrollment.course_id).in_(pairs))
+    }
+    results = {pair: ('already_enrolled', enrollment_id) for pair, enrollment_id in existing.items()}
+    
+    new_rows = [
+        {'user_id': user_id, 'course_id': course_id, 'status': status}
+        for user_id, course_id in pairs if (user_id, course_id) not in existing
+    ]
+    if new_rows:
+        # Multi-row INSERT; IGNORE melewati pasangan yang di-insert request lain
+        # setelah SELECT di atas (unique_user_course)
+        db.session.execute(Enrollment.__table__.insert().prefix_with('IGNORE', dialect='mysql'), new_rows)
+        
+        # Row yang baru kita insert terlihat di transaksi ini, row dari transaksi lain
+        # yang ter-ignore tidak, jadi pasangan yang tidak ketemu berarti sudah terdaftar
+        new_pairs = [(row['user_id'], row['course_id']) for row in new_rows]
+        deltas = {}
+        events = []
+        for enrollment_id, user_id, course_id in db.session.query(
+            Enrollment.id, Enrollment.user_id, Enrollment.course_id
+        ).filter(tuple_(Enrollment.user_id, Enrollment.course_id).in_(new_pairs)):
+            results[(user_id, course_id)] = ('created', enrollment_id)
+            deltas[(course_id, status)] = deltas.get((course_id, status), 0) + 1
+            events.append((enrollment_id, user_id, course_id, status))
+        adjust_enrollment_counters(deltas)
+        record_enrollment_events('enrollment.created', events)
+    
+    db.session.commit()
+    enrollment_cache.invalidate([user_id for (user_id, _), (result, _) in results.items() if result == 'created'])
+    return {pair: results.get(pair, ('already_enrolled', None)) for pair in pairs}
+
+@app.route('/api/enrollments/bulk', methods=['POST'])
+def bulk_create_enrollments():
+    """Enroll banyak user sekaligus (misalnya satu cohort ke satu course)"""
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+    status = data.get('status', 'active')
+    
+    pairs = parse_bulk_enrollment_pairs(data)
+    if pairs is None:
+        return jsonify({'error': 'Provide enrollments=[{user_id, course_id}] or course_id and user_ids'}), 400
+    if len(pairs) > BULK_ENROLLMENT_MAX_ROWS:
+        return jsonify({'error': f'Maximum {BULK_ENROLLMENT_MAX_ROWS} enrollments per request'}), 400
+    
+    results = []
+    unique_pairs = []
+    seen = set()
+    for user_id, course_id in pairs:
+        result = {'user_id': user_id, 'course_id': course_id}
+        if not is_valid_id(user_id) or not is_valid_id(course_id):
+            result['status'] = 'invalid'
+        elif (user_id, course_id) in seen:
+            result['status'] = 'duplicate'
+        else:
+            seen.add((user_id, course_id))
+            unique_pairs.append((user_id, course_id))
+        results.append(result)
+    
+    chunk_results = {}
+    for start in range(0, len(unique_pairs), BULK_ENROLLMENT_CHUNK_SIZE):
+        chunk_results.update(insert_enrollment_chunk(unique_pairs[start:start + BULK_ENROLLMENT_CHUNK_SIZE], status))
+    
+    summary = {'created': 0, 'already_enrolled': 0, 'duplicate': 0, 'invalid': 0}
+    for result in results:
+        if 'status' not in result:
+            result['status'], result['enrollment_id'] = chunk_results[(result['user_id'], result['course_id'])]
+        summary[result['status']] += 1
+    
+    return jsonify({
+        'message': 'Bulk enrollment processed',
+        'summary': summary,
+        'results': results
+    }), 200
+
 @app.route('/api/enrollments/<int:enrollment_id>', methods=['PUT'])
 def update_enrollment(enrollment_id):
-    enrollment = Enrollment.query.get_or_404(enrollment_id)
+    # FOR UPDATE: status lama dipakai untuk delta counter
+    enrollment = Enrollment.query.filter_by(id=enrollment_id).with_for_update().first_or_404()
     data = request.get_json()
+    old_status = enrollment.status
     
     enrollment.status = data.get('status', enrollment.status)
     if data.get('completed_at'):
         enrollment.completed_at = datetime.fromisoformat(data.get('completed_at'))
     
+    if enrollment.status != old_status:
+        adjust_enrollment_counters({
+            (enrollment.course_id, old_status): -1,
+            (enrollment.course_id, enrollment.status): 1
+        })
+    record_enrollment_events('enrollment.updated', [
+        (enrollment.id, enrollment.user_id, enrollment.course_id, enrollment.status)
+    ])
     db.session.commit()
+    enrollment_cache.invalidate([enrollment.user_id])
     
     return jsonify({
         'message': 'Enrollment updated successfully',
@@ -119,18 +580,86 @@ def update_enrollment(enrollment_id):
 
 @app.route('/api/enrollments/<int:enrollment_id>', methods=['DELETE'])
 def delete_enrollment(enrollment_id):
-    enrollment = Enrollment.query.get_or_404(enrollment_id)
+    enrollment = Enrollment.query.filter_by(id=enrollment_id).with_for_update().first_or_404()
     db.session.delete(enrollment)
+    adjust_enrollment_counters({(enrollment.course_id, enrollment.status): -1})
+    record_enrollment_events('enrollment.deleted', [
+        (enrollment.id, enrollment.user_id, enrollment.course_id, enrollment.status)
+    ])
     db.session.commit()
+    enrollment_cache.invalidate([enrollment.user_id])
     
     return jsonify({'message': 'Enrollment deleted successfully'}), 200
 
 @app.route('/api/enrollments/user/<int:user_id>/courses', methods=['GET'])
 def get_user_enrolled_courses(user_id):
-    enrollments = Enrollment.query.filter_by(user_id=user_id, status='active').all()
-    course_ids = [enrollment.course_id for enrollment in enrollments]
+    enrollments = enrollment_cache.get_active_enrollments(user_id)
+    course_ids = [enrollment['course_id'] for enrollment in enrollments]
     return jsonify({'course_ids': course_ids}), 200
 
+@app.route('/api/enrollments/events', methods=['GET'])
+def get_enrollment_events():
+    """Change feed: event dengan offset > after, opsional long-poll dengan ?wait=<detik>"""
+    try:
+        after = int(request.args.get('after', 0))
+        limit = min(int(request.args.get('limit', 500)), OUTBOX_FEED_MAX_LIMIT)
+        wait = min(float(request.args.get('wait', 0)), OUTBOX_FEED_MAX_WAIT_SECONDS)
+    except ValueError:
+        return jsonify({'error': 'after, limit and wait must be numbers'}), 400
+    
+    def fetch_events():
+        return EnrollmentEvent.query.filter(EnrollmentEvent.sequence > after).order_by(
+            EnrollmentEvent.sequence.asc()
+        ).limit(limit).all()
+    
+    events = fetch_events()
+    if not events and wait > 0:
+        # Lepas koneksi selama menunggu; query berikutnya memakai snapshot baru
+        db.session.rollback()
+        with outbox_published:
+            outbox_published.wait(wait)
+        events = fetch_events()
+    
+    return jsonify({
+        'events': [event.to_dict() for event in events],
+        'next_offset': events[-1].sequence if events else after
+    }), 200
+
+@app.route('/api/enrollments/cache/stats', methods=['GET'])
+def get_enrollment_cache_stats():
+    """Hit/miss metrics untuk enrollment cache"""
+    return jsonify(enrollment_cache.stats()), 200
+
+@app.route('/api/enrollments/counts', methods=['GET'])
+def get_enrollment_counts():
+    """Get enrollment counts per status for one or many courses (course_id=1 atau course_ids=1,2,3)"""
+    raw = request.args.get('course_ids') or request.args.get('course_id')
+    if not raw:
+        return jsonify({'error': 'course_id or course_ids is required'}), 400
+    
+    try:
+        course_ids = sorted({int(course_id) for course_id in raw.split(',') if course_id.strip()})
+    except ValueError:
+        return jsonify({'error': 'course_ids must be a comma-separated list of integers'}), 400
+    
+    counts = {course_id: {'total': 0} for course_id in course_ids}
+    counters = EnrollmentCounter.query.filter(EnrollmentCounter.course_id.in_(course_ids)).all()
+    for counter in counters:
+        counts[counter.course_id][counter.status] = counter.count
+        counts[counter.course_id]['total'] += counter.count
+    
+    return jsonify({'counts': counts}), 200
+
+@app.route('/api/enrollments/counts/rebuild', methods=['POST'])
+def rebuild_enrollment_counts():
+    """Repair job: hitung ulang semua counter dari tabel Enrollment"""
+    try:
+        rows = rebuild_enrollment_counters()
+        return jsonify({'message': 'Enrollment counters rebuilt', 'counters': rows}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Error rebuilding counters: {str(e)}'}), 500
+
 @app.route('/api/health', methods=['GET'])
 def health():
     return jsonify({'status': 'healthy', 'service': 'enrollment_service'}), 200
@@ -144,6 +673,14 @@ if __name__ == '__main__':
         try:
             db.create_all()
             print("[OK] Database initialized")
+            
+            # Deploy pertama: isi counter dari data enrollment yang sudah ada
+            if EnrollmentCounter.query.first() is None and Enrollment.query.first() is not None:
+                rebuild_enrollment_counters()
+                print("[OK] Enrollment counters rebuilt")
+            
+            start_outbox_relay()
+            print("[OK] Outbox relay started")
         except Exception as e:
             print(f"[WARNING] Error initializing database: {e}")
             print("Service will continue running, but database operations may fail.")
@@ -1,13 +1,30 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+from sqlalchemy import and_, bindparam, func, insert, or_, select, text, tuple_
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from datetime import datetime, timedelta
+import csv
+import hashlib
+import heapq
+import io
+import json
+import numpy as np
 import os
+import queue
+import random
+import re
 import sys
+import threading
+import time
+import uuid
+from urllib.parse import quote
+import requests
 
 # Add parent directory to path for config
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-from config import DB_CONFIG, DATABASES
+from config import DB_CONFIG, DATABASES, SERVICES, HEARTBEAT, SUBMISSION_STORAGE
+from db_utils import is_valid_id, parse_fields, serialize_value, upgrade_schema, with_fields
 
 app = Flask(__name__)
 
@@ -28,6 +45,8 @@ app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
     'pool_recycle': 300,
 }
 
+app.config['USE_X_SENDFILE'] = SUBMISSION_STORAGE['use_x_sendfile']
+
 db = SQLAlchemy(app)
 CORS(app)
 
@@ -45,20 +64,12 @@ class Progress(db.Model):
     status = db.Column(db.String(50), default='in_progress', index=True)
     completed_at = db.Column(db.DateTime, nullable=True)
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'user_id': self.user_id,
-            'course_id': self.course_id,
-            'enrollment_id': self.enrollment_id,
-            'module_id': self.module_id,
-            'lesson_id': self.lesson_id,
-            'completion_percentage': self.completion_percentage,
-            'time_spent_minutes': self.time_spent_minutes,
-            'last_accessed': self.last_accessed.isoformat() if self.last_accessed else None,
-            'status': self.status,
-            'completed_at': self.completed_at.isoformat() if self.completed_at else None
-        }
+    SERIALIZABLE_FIELDS = ('id', 'user_id', 'course_id', 'enrollment_id', 'module_id', 'lesson_id',
+                           'completion_percentage', 'time_spent_minutes', 'last_accessed',
+                           'status', 'completed_at')
+    
+    def to_dict(self, fields=None):
+        return {field: serialize_value(getattr(self, field)) for field in (fields or self.SERIALIZABLE_FIELDS)}
 
 class Module(db.Model):
     """Course Modules - Learning modules for each course"""
@@ -70,16 +81,11 @@ class Module(db.Model):
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
     updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'course_id': self.course_id,
-            'title': self.title,
-            'description': self.description,
-            'order_index': self.order_index,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
+    SERIALIZABLE_FIELDS = ('id', 'course_id', 'title', 'description', 'order_index', 'created_at',
+                           'updated_at')
+    
+    def to_dict(self, fields=None):
+        return {field: serialize_value(getattr(self, field)) for field in (fields or self.SERIALIZABLE_FIELDS)}
 
 class Task(db.Model):
     """Course Tasks - Tasks provided by course, not created by students"""
@@ -88,27 +94,18 @@ class Task(db.Model):
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text)
     task_type = db.Column(db.String(50), default='assignment')  # assignment, quiz, project, exam, etc.
-    due_date = db.Column(db.DateTime, nullable=True)
+    due_date = db.Column(db.DateTime, nullable=True, index=True)
     priority = db.Column(db.String(20), default='medium')  # low, medium, high
     points = db.Column(db.Integer, default=0)
     order_index = db.Column(db.Integer, default=0)  # For ordering tasks
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
     updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'course_id': self.course_id,
-            'title': self.title,
-            'description': self.description,
-            'task_type': self.task_type,
-            'due_date': self.due_date.isoformat() if self.due_date else None,
-            'priority': self.priority,
-            'points': self.points,
-            'order_index': self.order_index,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
+    SERIALIZABLE_FIELDS = ('id', 'course_id', 'title', 'description', 'task_type', 'due_date',
+                           'priority', 'points', 'order_index', 'created_at', 'updated_at')
+    
+    def to_dict(self, fields=None):
+        return {field: serialize_value(getattr(self, field)) for field in (fields or self.SERIALIZABLE_FIELDS)}
 
 class UserTaskCompletion(db.Model):
     """Track which tasks are completed by which users"""
@@ -122,20 +119,16 @@ class UserTaskCompletion(db.Model):
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
     updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
     
-    __table_args__ = (db.UniqueConstraint('user_id', 'task_id', name='unique_user_task'),)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'task_id', name='unique_user_task'),
+        db.Index('ix_user_task_completion_course_user', 'course_id', 'user_id'),
+    )
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'user_id': self.user_id,
-            'task_id': self.task_id,
-            'course_id': self.course_id,
-            'status': self.status,
-            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
-            'submitted_at': self.submitted_at.isoformat() if self.submitted_at else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
+    SERIALIZABLE_FIELDS = ('id', 'user_id', 'task_id', 'course_id', 'status', 'completed_at',
+                           'submitted_at', 'created_at', 'updated_at')
+    
+    def to_dict(self, fields=None):
+        return {field: serialize_value(getattr(self, field)) for field in (fields or self.SERIALIZABLE_FIELDS)}
 
 class Submission(db.Model):
     """Task submissions by students"""
@@ -154,32 +147,546 @@ class Submission(db.Model):
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
     updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
     
+    __table_args__ = (
+        db.Index('ix_submission_user_task', 'user_id', 'task_id'),
+        db.Index('ix_submission_user_course', 'user_id', 'course_id'),
+    )
+    
+    SERIALIZABLE_FIELDS = ('id', 'user_id', 'task_id', 'course_id', 'submission_text',
+                           'submission_file_url', 'submission_file_name', 'status', 'grade',
+                           'feedback', 'submitted_at', 'graded_at', 'created_at', 'updated_at')
+    # Default untuk lookup banyak task: tanpa kolom teks panjang (submission_text, feedback)
+    SUMMARY_FIELDS = ('id', 'task_id', 'course_id', 'submission_file_url', 'submission_file_name',
+                      'status', 'grade', 'submitted_at', 'graded_at')
+    
+    def to_dict(self, fields=None):
+        return {field: serialize_value(getattr(self, field)) for field in (fields or self.SERIALIZABLE_FIELDS)}
+
+class FileBlob(db.Model):
+    """File di blob store lokal, di-address dengan sha256 isinya"""
+    sha256 = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+
+class UploadSession(db.Model):
+    """Upload file submission yang dikirim per chunk dan bisa di-resume"""
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    file_name = db.Column(db.String(200), nullable=False)
+    content_type = db.Column(db.String(100))
+    total_size = db.Column(db.BigInteger, nullable=False)
+    received_bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    sha256 = db.Column(db.String(64), nullable=True)
+    status = db.Column(db.String(50), default='uploading')  # uploading, completed
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
+    
+    SERIALIZABLE_FIELDS = ('id', 'user_id', 'file_name', 'content_type', 'total_size', 'received_bytes',
+                           'sha256', 'status', 'created_at', 'updated_at')
+    
+    def to_dict(self, fields=None):
+        data = {field: serialize_value(getattr(self, field)) for field in (fields or self.SERIALIZABLE_FIELDS)}
+        if self.sha256:
+            data['file_url'] = blob_url(self.sha256)
+        return data
+
+class CourseTaskTotal(db.Model):
+    """Jumlah task per course, di-update di transaksi yang sama dengan create/delete Task"""
+    course_id = db.Column(db.Integer, primary_key=True)
+    total_tasks = db.Column(db.Integer, nullable=False, default=0)
+
+class UserCourseTaskCount(db.Model):
+    """Jumlah task completed per (user, course), di-update bersama UserTaskCompletion"""
+    user_id = db.Column(db.Integer, primary_key=True)
+    course_id = db.Column(db.Integer, primary_key=True)
+    completed_tasks = db.Column(db.Integer, nullable=False, default=0)
+
+class CourseScore(db.Model):
+    """Total points dari task completed per (user, course), sumber leaderboard"""
+    user_id = db.Column(db.Integer, primary_key=True)
+    course_id = db.Column(db.Integer, primary_key=True)
+    points = db.Column(db.Integer, nullable=False, default=0)
+
+def adjust_task_totals(deltas):
+    """Tambahkan delta {course_id: n} ke CourseTaskTotal dalam transaksi yang sedang berjalan"""
+    rows = [{'course_id': course_id, 'total_tasks': delta} for course_id, delta in deltas.items() if delta]
+    if not rows:
+        return
+    stmt = mysql_insert(CourseTaskTotal).values(rows)
+    stmt = stmt.on_duplicate_key_update(total_tasks=CourseTaskTotal.total_tasks + stmt.inserted.total_tasks)
+    db.session.execute(stmt)
+
+def adjust_completed_counts(deltas):
+    """Tambahkan delta {(user_id, course_id): n} ke UserCourseTaskCount"""
+    rows = [
+        {'user_id': user_id, 'course_id': course_id, 'completed_tasks': delta}
+        for (user_id, course_id), delta in deltas.items() if delta
+    ]
+    if not rows:
+        return
+    stmt = mysql_insert(UserCourseTaskCount).values(rows)
+    stmt = stmt.on_duplicate_key_update(
+        completed_tasks=UserCourseTaskCount.completed_tasks + stmt.inserted.completed_tasks
+    )
+    db.session.execute(stmt)
+
+def adjust_course_scores(deltas):
+    """Tambahkan delta points {(user_id, course_id): n} ke CourseScore"""
+    rows = [
+        {'user_id': user_id, 'course_id': course_id, 'points': delta}
+        for (user_id, course_id), delta in deltas.items() if delta
+    ]
+    if not rows:
+        return
+    stmt = mysql_insert(CourseScore).values(rows)
+    stmt = stmt.on_duplicate_key_update(points=CourseScore.points + stmt.inserted.points)
+    db.session.execute(stmt)
+
+def completion_delta(old_status, new_status):
+    """+1 jika task menjadi completed, -1 jika tidak lagi completed, 0 jika tidak berubah"""
+    return int(new_status == 'completed') - int(old_status == 'completed')
+
+def record_completion_change(user_id, course_id, task_points, old_status, new_status):
+    """Update counter completed dan score course untuk satu perubahan status (sebelum commit)"""
+    delta = completion_delta(old_status, new_status)
+    adjust_completed_counts({(user_id, course_id): delta})
+    adjust_course_scores({(user_id, course_id): delta * (task_points or 0)})
+
+def rebuild_task_counters():
+    """Bangun ulang CourseTaskTotal, UserCourseTaskCount dan CourseScore dari tabel sumbernya"""
+    db.session.query(CourseTaskTotal).delete()
+    db.session.query(UserCourseTaskCount).delete()
+    db.session.query(CourseScore).delete()
+    db.session.execute(insert(CourseTaskTotal).from_select(
+        ['course_id', 'total_tasks'],
+        select(Task.course_id, func.count(Task.id)).group_by(Task.course_id)
+    ))
+    db.session.execute(insert(UserCourseTaskCount).from_select(
+        ['user_id', 'course_id', 'completed_tasks'],
+        select(UserTaskCompletion.user_id, UserTaskCompletion.course_id, func.count(UserTaskCompletion.id))
+        .where(UserTaskCompletion.status == 'completed')
+        .group_by(UserTaskCompletion.user_id, UserTaskCompletion.course_id)
+    ))
+    db.session.execute(insert(CourseScore).from_select(
+        ['user_id', 'course_id', 'points'],
+        select(UserTaskCompletion.user_id, UserTaskCompletion.course_id, func.coalesce(func.sum(Task.points), 0))
+        .join(Task, Task.id == UserTaskCompletion.task_id)
+        .where(UserTaskCompletion.status == 'completed')
+        .group_by(UserTaskCompletion.user_id, UserTaskCompletion.course_id)
+    ))
+    db.session.commit()
+    invalidate_leaderboards()
+
+class ProgressRecomputeJob(db.Model):
+    """Job recompute progress yang belum selesai; satu row per (user, course)"""
+    user_id = db.Column(db.Integer, primary_key=True)
+    course_id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    requested_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
+
+class HeartbeatFlush(db.Model):
+    """Batch heartbeat yang sudah diterapkan, supaya journal tidak diterapkan dua kali"""
+    batch_id = db.Column(db.String(32), primary_key=True)
+    flushed_at = db.Column(db.DateTime, default=db.func.current_timestamp(), index=True)
+
+class EnrollmentProjection(db.Model):
+    """Salinan lokal (user_id, course_id) -> enrollment_id, di-feed dari enrollment change feed"""
+    user_id = db.Column(db.Integer, primary_key=True)
+    course_id = db.Column(db.Integer, primary_key=True)
+    enrollment_id = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(50))
+    updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
+
+class SeedState(db.Model):
+    """Hash seed manifest yang terakhir diterapkan"""
+    name = db.Column(db.String(100), primary_key=True)
+    content_hash = db.Column(db.String(64), nullable=False)
+    applied_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+
+class FeedOffset(db.Model):
+    """Offset terakhir yang sudah diproses untuk setiap change feed"""
+    name = db.Column(db.String(100), primary_key=True)
+    last_offset = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
+
+class TaskDeadlineNotice(db.Model):
+    """Status deadline (due_soon / overdue) per (user, task), diisi oleh deadline scheduler"""
+    user_id = db.Column(db.Integer, primary_key=True)
+    task_id = db.Column(db.Integer, primary_key=True)
+    course_id = db.Column(db.Integer, nullable=False)
+    kind = db.Column(db.String(20), nullable=False)
+    due_date = db.Column(db.DateTime, nullable=False)
+    notified_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    
+    __table_args__ = (
+        db.Index('ix_task_deadline_notice_task', 'task_id'),
+    )
+    
     def to_dict(self):
         return {
-            'id': self.id,
             'user_id': self.user_id,
             'task_id': self.task_id,
             'course_id': self.course_id,
-            'submission_text': self.submission_text,
-            'submission_file_url': self.submission_file_url,
-            'submission_file_name': self.submission_file_name,
-            'status': self.status,
-            'grade': self.grade,
-            'feedback': self.feedback,
-            'submitted_at': self.submitted_at.isoformat() if self.submitted_at else None,
-            'graded_at': self.graded_at.isoformat() if self.graded_at else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+            'kind': self.kind,
+            'due_date': serialize_value(self.due_date),
+            'notified_at': serialize_value(self.notified_at)
         }
 
+class TaskDeadlineEmission(db.Model):
+    """Penanda event deadline (task, kind) yang sudah di-emit untuk due_date tertentu"""
+    task_id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), primary_key=True)
+    due_date = db.Column(db.DateTime, nullable=False)
+    emitted_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+
+# Enrollment projection consumer: mengikuti /api/enrollments/events (long-poll) dan
+# menerapkan event + offset di satu transaksi, jadi restart melanjutkan tanpa kehilangan
+# atau menerapkan ulang event. Write path hanya membaca tabel EnrollmentProjection.
+ENROLLMENT_FEED_NAME = 'enrollment_events'
+ENROLLMENT_FEED_BATCH_SIZE = 500
+ENROLLMENT_FEED_WAIT_SECONDS = 20
+ENROLLMENT_FEED_RETRY_SECONDS = 5
+
+def get_enrollment_id(user_id, course_id):
+    """Cari enrollment_id dari projection lokal (0 jika belum diketahui)"""
+    projection = db.session.get(EnrollmentProjection, (user_id, course_id))
+    return projection.enrollment_id if projection else 0
+
+def upsert_enrollment_projections(rows):
+    """Multi-row upsert ke projection; rows = [{user_id, course_id, enrollment_id, status}]"""
+    if not rows:
+        return
+    stmt = mysql_insert(EnrollmentProjection).values(rows)
+    stmt = stmt.on_duplicate_key_update(
+        enrollment_id=stmt.inserted.enrollment_id,
+        status=stmt.inserted.status
+    )
+    db.session.execute(stmt)
+
+def apply_enrollment_events(events, next_offset):
+    """Terapkan satu batch event ke projection dan simpan offset di transaksi yang sama"""
+    # Event sudah urut; cukup state terakhir per (user_id, course_id)
+    latest = {}
+    for event in events:
+        latest[(event['user_id'], event['course_id'])] = event
+    
+    upsert_enrollment_projections([
+        {'user_id': user_id, 'course_id': course_id,
+         'enrollment_id': event['enrollment_id'], 'status': event['status']}
+        for (user_id, course_id), event in latest.items() if event['event_type'] != 'enrollment.deleted'
+    ])
+    # Student yang baru aktif juga perlu notice untuk deadline yang sudah di-emit sebelumnya
+    backfill_deadline_notices([
+        (user_id, course_id) for (user_id, course_id), event in latest.items()
+        if event['event_type'] != 'enrollment.deleted' and event['status'] == 'active'
+    ], datetime.utcnow())
+    
+    deleted = [(user_id, course_id) for (user_id, course_id), event in latest.items()
+               if event['event_type'] == 'enrollment.deleted']
+    if deleted:
+        EnrollmentProjection.query.filter(
+            tuple_(EnrollmentProjection.user_id, EnrollmentProjection.course_id).in_(deleted)
+        ).delete(synchronize_session=False)
+    
+    feed_offset = db.session.get(FeedOffset, ENROLLMENT_FEED_NAME)
+    feed_offset.last_offset = next_offset
+    db.session.commit()
+
+def bootstrap_enrollment_projection():
+    """Isi projection dari snapshot enrollment saat pertama kali dijalankan"""
+    response = requests.get(
+        f"{SERVICES['enrollment']}/api/enrollments",
+        params={'fields': 'user_id,course_id,status'},
+        timeout=60
+    )
+    response.raise_for_status()
+    
+    rows = [
+        {'user_id': e['user_id'], 'course_id': e['course_id'], 'enrollment_id': e['id'], 'status': e['status']}
+        for e in response.json()
+    ]
+    for start in range(0, len(rows), ENROLLMENT_FEED_BATCH_SIZE):
+        upsert_enrollment_projections(rows[start:start + ENROLLMENT_FEED_BATCH_SIZE])
+    
+    # Feed tetap dibaca dari offset 0: event yang terjadi selama snapshot diambil
+    # diterapkan ulang dan state akhirnya tetap sama dengan enrollment service
+    db.session.add(FeedOffset(name=ENROLLMENT_FEED_NAME, last_offset=0))
+    db.session.commit()
+    print(f"[OK] Enrollment projection bootstrapped with {len(rows)} enrollments")
+
+def consume_enrollment_feed():
+    """Ambil dan terapkan satu batch dari enrollment change feed, return jumlah event"""
+    feed_offset = db.session.get(FeedOffset, ENROLLMENT_FEED_NAME)
+    if feed_offset is None:
+        bootstrap_enrollment_projection()
+        feed_offset = db.session.get(FeedOffset, ENROLLMENT_FEED_NAME)
+    after = feed_offset.last_offset
+    db.session.rollback()  # jangan tahan koneksi selama long-poll
+    
+    response = requests.get(
+        f"{SERVICES['enrollment']}/api/enrollments/events",
+        params={'after': after, 'limit': ENROLLMENT_FEED_BATCH_SIZE, 'wait': ENROLLMENT_FEED_WAIT_SECONDS},
+        timeout=ENROLLMENT_FEED_WAIT_SECONDS + 10
+    )
+    response.raise_for_status()
+    feed = response.json()
+    
+    if feed['events']:
+        apply_enrollment_events(feed['events'], feed['next_offset'])
+    return len(feed['events'])
+
+def enrollment_feed_loop():
+    while True:
+        try:
+            with app.app_context():
+                consume_enrollment_feed()
+        except Exception as e:
+            print(f"[WARNING] Enrollment feed consumer error: {e}")
+            time.sleep(ENROLLMENT_FEED_RETRY_SECONDS)
+
+def start_enrollment_feed_consumer():
+    threading.Thread(target=enrollment_feed_loop, daemon=True).start()
+
+# Heartbeat write-behind: POST /api/progress/heartbeat hanya menambah accumulator di memory
+# dan menulis satu baris ke journal. Flush me-rotate journal menjadi <batch_id>.flushing,
+# menerapkannya dalam satu transaksi bersama row HeartbeatFlush, lalu menghapus file-nya.
+# Setelah crash, file yang batch_id-nya sudah ada di database dilewati, sisanya diterapkan.
+# Journal di-fsync secara group commit setiap HEARTBEAT_JOURNAL_SYNC_SECONDS di luar
+# heartbeat_lock; heartbeat yang belum ter-sync hanya hilang jika OS/mesin mati, bukan proses.
+HEARTBEAT_JOURNAL_DIR = HEARTBEAT['journal_dir']
+HEARTBEAT_JOURNAL_PATH = os.path.join(HEARTBEAT_JOURNAL_DIR, 'heartbeat.journal')
+HEARTBEAT_FLUSH_SECONDS = HEARTBEAT['flush_seconds']
+HEARTBEAT_FLUSH_MAX_KEYS = HEARTBEAT['flush_max_keys']
+HEARTBEAT_JOURNAL_SYNC_SECONDS = HEARTBEAT['journal_sync_seconds']
+HEARTBEAT_FLUSH_CHUNK_SIZE = 1000
+HEARTBEAT_FLUSH_RETENTION_DAYS = 7
+HEARTBEAT_MAX_SECONDS = 300
+heartbeat_totals = {}  # (user_id, course_id, module_id) -> [seconds, last_seen]
+heartbeat_lock = threading.Lock()
+heartbeat_flush_lock = threading.Lock()
+heartbeat_flush_requested = threading.Event()
+heartbeat_journal = None
+heartbeat_journal_dirty = False
+heartbeat_flusher_thread = None
+
+def record_heartbeat(user_id, course_id, module_id, seconds, seen_at):
+    """Tambahkan heartbeat ke accumulator dan journal"""
+    global heartbeat_journal, heartbeat_journal_dirty, heartbeat_flusher_thread
+    line = json.dumps({'user_id': user_id, 'course_id': course_id, 'module_id': module_id,
+                       'seconds': seconds, 'seen_at': seen_at.isoformat()})
+    key = (user_id, course_id, module_id)
+    with heartbeat_lock:
+        if heartbeat_flusher_thread is None:
+            heartbeat_flusher_thread = threading.Thread(target=heartbeat_flush_loop, daemon=True)
+            heartbeat_flusher_thread.start()
+            threading.Thread(target=heartbeat_sync_loop, daemon=True).start()
+        if heartbeat_journal is None:
+            os.makedirs(HEARTBEAT_JOURNAL_DIR, exist_ok=True)
+            # Journal yang tertinggal dari proses sebelumnya tidak ada di accumulator
+            recover_heartbeat_journal()
+            heartbeat_journal = open(HEARTBEAT_JOURNAL_PATH, 'a', encoding='utf-8')
+        heartbeat_journal.write(line + '\n')
+        heartbeat_journal.flush()
+        heartbeat_journal_dirty = True
+        
+        total = heartbeat_totals.get(key)
+        if total:
+            total[0] += seconds
+            total[1] = max(total[1], seen_at)
+        else:
+            heartbeat_totals[key] = [seconds, seen_at]
+        pending_keys = len(heartbeat_totals)
+    
+    if pending_keys >= HEARTBEAT_FLUSH_MAX_KEYS:
+        heartbeat_flush_requested.set()
+
+def sync_heartbeat_journal():
+    """fsync journal aktif tanpa menahan heartbeat_lock selama disk sync"""
+    global heartbeat_journal_dirty
+    with heartbeat_lock:
+        if heartbeat_journal is None or not heartbeat_journal_dirty:
+            return
+        heartbeat_journal_dirty = False
+        # dup: journal bisa di-rotate (close) selagi fsync berjalan
+        fd = os.dup(heartbeat_journal.fileno())
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def heartbeat_sync_loop():
+    while True:
+        time.sleep(HEARTBEAT_JOURNAL_SYNC_SECONDS)
+        try:
+            sync_heartbeat_journal()
+        except Exception as e:
+            print(f"[WARNING] Failed to sync heartbeat journal: {e}")
+
+def heartbeat_batch_path(batch_id):
+    return os.path.join(HEARTBEAT_JOURNAL_DIR, f'{batch_id}.flushing')
+
+def new_heartbeat_batch_id():
+    # Diawali timestamp supaya batch diterapkan sesuai urutan waktu
+    return f'{int(time.time() * 1000):013d}-{uuid.uuid4().hex[:8]}'
+
+def rotate_heartbeat_journal():
+    """Pindahkan accumulator dan journal aktif ke batch baru, return (batch_id, totals)"""
+    global heartbeat_journal, heartbeat_journal_dirty, heartbeat_totals
+    with heartbeat_lock:
+        if not heartbeat_totals:
+            return None, {}
+        totals = heartbeat_totals
+        heartbeat_totals = {}
+        batch_id = new_heartbeat_batch_id()
+        heartbeat_journal.flush()
+        os.fsync(heartbeat_journal.fileno())
+        heartbeat_journal.close()
+        heartbeat_journal = None
+        heartbeat_journal_dirty = False
+        os.replace(HEARTBEAT_JOURNAL_PATH, heartbeat_batch_path(batch_id))
+    return batch_id, totals
+
+def recover_heartbeat_journal():
+    """Jadikan journal aktif dari proses sebelumnya (crash) sebagai batch yang tertunda"""
+    if os.path.exists(HEARTBEAT_JOURNAL_PATH):
+        os.replace(HEARTBEAT_JOURNAL_PATH, heartbeat_batch_path(new_heartbeat_batch_id()))
+
+def read_heartbeat_batch(path):
+    """Agregasi ulang file batch menjadi totals, baris terakhir yang terpotong dilewati"""
+    totals = {}
+    with open(path, encoding='utf-8') as batch_file:
+        for line in batch_file:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            key = (entry['user_id'], entry['course_id'], entry['module_id'])
+            seen_at = datetime.fromisoformat(entry['seen_at'])
+            total = totals.setdefault(key, [0.0, seen_at])
+            total[0] += entry['seconds']
+            total[1] = max(total[1], seen_at)
+    return totals
+
+def apply_heartbeat_chunk(items):
+    """Tambahkan time spent ke progress record level course (module_id NULL) dalam transaksi berjalan"""
+    # Time spent per module digabung ke row level course; row per module dengan completion 0
+    # akan menurunkan overall_completion di get_user_course_progress
+    course_totals = {}
+    for (user_id, course_id, _), (seconds, last_seen) in items:
+        total = course_totals.setdefault((user_id, course_id), [0.0, last_seen])
+        total[0] += seconds
+        total[1] = max(total[1], last_seen)
+    pairs = list(course_totals)
+    
+    progress_ids = {}
+    for progress_id, user_id, course_id in db.session.query(
+        Progress.id, Progress.user_id, Progress.course_id
+    ).filter(
+        tuple_(Progress.user_id, Progress.course_id).in_(pairs),
+        Progress.module_id.is_(None), Progress.lesson_id.is_(None)
+    ).order_by(Progress.id):
+        progress_ids.setdefault((user_id, course_id), progress_id)
+    
+    missing = [pair for pair in pairs if pair not in progress_ids]
+    completions = {}
+    if missing:
+        # Row baru mengikuti completion dari counter, sama seperti update_progress_from_tasks
+        totals = dict(db.session.query(CourseTaskTotal.course_id, CourseTaskTotal.total_tasks).filter(
+            CourseTaskTotal.course_id.in_({course_id for _, course_id in missing})
+        ))
+        for user_id, course_id, completed_tasks in db.session.query(
+            UserCourseTaskCount.user_id, UserCourseTaskCount.course_id, UserCourseTaskCount.completed_tasks
+        ).filter(tuple_(UserCourseTaskCount.user_id, UserCourseTaskCount.course_id).in_(missing)):
+            if totals.get(course_id, 0) > 0:
+                completions[(user_id, course_id)] = min((completed_tasks / totals[course_id]) * 100, 100.0)
+    
+    updates = []
+    new_rows = []
+    for (user_id, course_id), (seconds, last_seen) in course_totals.items():
+        progress_id = progress_ids.get((user_id, course_id))
+        if progress_id:
+            updates.append({'b_id': progress_id, 'b_minutes': seconds / 60, 'b_last_accessed': last_seen})
+        else:
+            completion_percentage = completions.get((user_id, course_id), 0.0)
+            new_rows.append({
+                'user_id': user_id,
+                'course_id': course_id,
+                'enrollment_id': get_enrollment_id(user_id, course_id),
+                'module_id': None,
+                'completion_percentage': completion_percentage,
+                'time_spent_minutes': seconds / 60,
+                'last_accessed': last_seen,
+                'status': 'completed' if completion_percentage >= 100 else 'in_progress',
+                'completed_at': last_seen if completion_percentage >= 100 else None
+            })
+    
+    if updates:
+        # executemany: satu statement untuk semua row di chunk ini
+        db.session.execute(
+            Progress.__table__.update().where(Progress.id == bindparam('b_id')).values(
+                time_spent_minutes=func.coalesce(Progress.time_spent_minutes, 0) + bindparam('b_minutes'),
+                last_accessed=bindparam('b_last_accessed')
+            ),
+            updates
+        )
+    if new_rows:
+        db.session.execute(Progress.__table__.insert(), new_rows)
+
+def apply_heartbeat_batch(batch_id, totals):
+    """Terapkan satu batch dan catat batch_id di transaksi yang sama"""
+    if db.session.get(HeartbeatFlush, batch_id) is not None:
+        return  # sudah diterapkan sebelum crash, tinggal hapus file-nya
+    
+    items = list(totals.items())
+    for start in range(0, len(items), HEARTBEAT_FLUSH_CHUNK_SIZE):
+        apply_heartbeat_chunk(items[start:start + HEARTBEAT_FLUSH_CHUNK_SIZE])
+    
+    db.session.add(HeartbeatFlush(batch_id=batch_id))
+    HeartbeatFlush.query.filter(
+        HeartbeatFlush.flushed_at < datetime.utcnow() - timedelta(days=HEARTBEAT_FLUSH_RETENTION_DAYS)
+    ).delete(synchronize_session=False)
+    db.session.commit()
+
+def flush_heartbeats():
+    """Flush accumulator dan semua batch yang masih tertunda ke database, return jumlah batch"""
+    with heartbeat_flush_lock:
+        batch_id, totals = rotate_heartbeat_journal()
+        if not os.path.isdir(HEARTBEAT_JOURNAL_DIR):
+            return 0
+        
+        batch_ids = sorted(name[:-len('.flushing')] for name in os.listdir(HEARTBEAT_JOURNAL_DIR)
+                           if name.endswith('.flushing'))
+        for pending_id in batch_ids:
+            path = heartbeat_batch_path(pending_id)
+            try:
+                apply_heartbeat_batch(pending_id, totals if pending_id == batch_id else read_heartbeat_batch(path))
+            except Exception:
+                db.session.rollback()
+                raise
+            os.remove(path)
+        return len(batch_ids)
+
+def heartbeat_flush_loop():
+    while True:
+        heartbeat_flush_requested.wait(HEARTBEAT_FLUSH_SECONDS)
+        heartbeat_flush_requested.clear()
+        try:
+            with app.app_context():
+                flush_heartbeats()
+        except Exception as e:
+            print(f"[WARNING] Failed to flush heartbeats: {e}")
+
 # Routes
 @app.route('/api/progress', methods=['GET'])
 def get_progress():
     user_id = request.args.get('user_id')
     course_id = request.args.get('course_id')
     enrollment_id = request.args.get('enrollment_id')
+    fields, error = parse_fields(Progress)
+    if error:
+        return jsonify({'error': error}), 400
     
-    query = Progress.query
+    query = with_fields(Progress.query, Progress, fields)
     
     if user_id:
         query = query.filter_by(user_id=user_id)
@@ -189,17 +696,36 @@ def get_progress():
         query = query.filter_by(enrollment_id=enrollment_id)
     
     progress_records = query.all()
-    return jsonify([progress.to_dict() for progress in progress_records]), 200
+    return jsonify([progress.to_dict(fields) for progress in progress_records]), 200
 
 @app.route('/api/progress/<int:progress_id>', methods=['GET'])
 def get_progress_record(progress_id):
-    progress = Progress.query.get_or_404(progress_id)
-    return jsonify(progress.to_dict()), 200
+    fields, error = parse_fields(Progress)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    progress = with_fields(Progress.query, Progress, fields).get_or_404(progress_id)
+    return jsonify(progress.to_dict(fields)), 200
 
 @app.route('/api/progress', methods=['POST'])
 def create_progress():
     data = request.get_json()
     
+    # Idempotent untuk progress awal sebuah enrollment (dipanggil ulang oleh retry enroll)
+    if data.get('enrollment_id') and not data.get('module_id') and not data.get('lesson_id'):
+        existing = Progress.query.filter_by(
+            user_id=data.get('user_id'),
+            course_id=data.get('course_id'),
+            enrollment_id=data.get('enrollment_id'),
+            module_id=None,
+            lesson_id=None
+        ).first()
+        if existing:
+            return jsonify({
+                'message': 'Progress already exists',
+                'progress': existing.to_dict()
+            }), 200
+    
     progress = Progress(
         user_id=data.get('user_id'),
         course_id=data.get('course_id'),
@@ -219,6 +745,24 @@ def create_progress():
         'progress': progress.to_dict()
     }), 201
 
+@app.route('/api/progress/heartbeat', methods=['POST'])
+def progress_heartbeat():
+    """Terima heartbeat time spent dari client; ditulis ke database secara batch"""
+    data = request.get_json() or {}
+    user_id = data.get('user_id')
+    course_id = data.get('course_id')
+    module_id = data.get('module_id')
+    seconds = data.get('seconds', 30)
+    
+    if not is_valid_id(user_id) or not is_valid_id(course_id):
+        return jsonify({'error': 'user_id and course_id are required'}), 400
+    if isinstance(seconds, bool) or not isinstance(seconds, (int, float)) or not 0 < seconds <= HEARTBEAT_MAX_SECONDS:
+        return jsonify({'error': f'seconds must be between 0 and {HEARTBEAT_MAX_SECONDS}'}), 400
+    
+    record_heartbeat(user_id, course_id, str(module_id) if module_id is not None else None,
+                     float(seconds), datetime.utcnow())
+    return jsonify({'message': 'Heartbeat recorded'}), 202
+
 @app.route('/api/progress/<int:progress_id>', methods=['PUT'])
 def update_progress(progress_id):
     progress = Progress.query.get_or_404(progress_id)
@@ -276,39 +820,53 @@ def get_user_course_progress(user_id, course_id):
 def get_modules():
     """Get course modules"""
     course_id = request.args.get('course_id')
+    fields, error = parse_fields(Module)
+    if error:
+        return jsonify({'error': error}), 400
     
-    query = Module.query
+    query = with_fields(Module.query, Module, fields)
     
     if course_id:
         query = query.filter_by(course_id=course_id)
     
     modules = query.order_by(Module.order_index.asc()).all()
-    return jsonify([module.to_dict() for module in modules]), 200
+    return jsonify([module.to_dict(fields) for module in modules]), 200
 
 @app.route('/api/modules/<int:module_id>', methods=['GET'])
 def get_module(module_id):
     """Get module by ID"""
-    module = Module.query.get_or_404(module_id)
-    return jsonify(module.to_dict()), 200
+    fields, error = parse_fields(Module)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    module = with_fields(Module.query, Module, fields).get_or_404(module_id)
+    return jsonify(module.to_dict(fields)), 200
 
 # Task Routes - Course Tasks (provided by course)
 @app.route('/api/tasks', methods=['GET'])
 def get_tasks():
     """Get course tasks (not user-specific)"""
     course_id = request.args.get('course_id')
+    fields, error = parse_fields(Task)
+    if error:
+        return jsonify({'error': error}), 400
     
-    query = Task.query
+    query = with_fields(Task.query, Task, fields)
     
     if course_id:
         query = query.filter_by(course_id=course_id)
     
     tasks = query.order_by(Task.order_index.asc(), Task.due_date.asc()).all()
-    return jsonify([task.to_dict() for task in tasks]), 200
+    return jsonify([task.to_dict(fields) for task in tasks]), 200
 
 @app.route('/api/tasks/<int:task_id>', methods=['GET'])
 def get_task(task_id):
-    task = Task.query.get_or_404(task_id)
-    return jsonify(task.to_dict()), 200
+    fields, error = parse_fields(Task)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    task = with_fields(Task.query, Task, fields).get_or_404(task_id)
+    return jsonify(task.to_dict(fields)), 200
 
 @app.route('/api/tasks', methods=['POST'])
 def create_task():
@@ -327,7 +885,10 @@ def create_task():
     )
     
     db.session.add(task)
+    adjust_task_totals({task.course_id: 1})
     db.session.commit()
+    if task.due_date:
+        request_deadline_rescan()
     
     return jsonify({
         'message': 'Task created successfully',
@@ -340,6 +901,8 @@ def update_task(task_id):
     task = Task.query.get_or_404(task_id)
     data = request.get_json()
     
+    old_points = task.points or 0
+    
     task.title = data.get('title', task.title)
     task.description = data.get('description', task.description)
     task.task_type = data.get('task_type', task.task_type)
@@ -348,10 +911,32 @@ def update_task(task_id):
     task.order_index = data.get('order_index', task.order_index)
     task.updated_at = datetime.utcnow()
     
+    due_date_changed = False
     if data.get('due_date'):
-        task.due_date = datetime.fromisoformat(data.get('due_date'))
+        due_date = datetime.fromisoformat(data.get('due_date'))
+        due_date_changed = due_date != task.due_date
+        task.due_date = due_date
+    
+    # Notice lama dihitung dari due_date sebelumnya; scheduler menulis ulang setelah rescan
+    if due_date_changed:
+        TaskDeadlineNotice.query.filter_by(task_id=task.id).delete(synchronize_session=False)
+    
+    # Perubahan points menggeser score semua user yang sudah menyelesaikan task ini
+    points_delta = (task.points or 0) - old_points
+    if points_delta:
+        stmt = mysql_insert(CourseScore).from_select(
+            ['user_id', 'course_id', 'points'],
+            select(UserTaskCompletion.user_id, UserTaskCompletion.course_id, bindparam('points_delta', points_delta))
+            .where(UserTaskCompletion.task_id == task.id, UserTaskCompletion.status == 'completed')
+        )
+        stmt = stmt.on_duplicate_key_update(points=CourseScore.points + stmt.inserted.points)
+        db.session.execute(stmt)
     
     db.session.commit()
+    if points_delta:
+        invalidate_leaderboard(task.course_id)
+    if due_date_changed:
+        request_deadline_rescan()
     
     return jsonify({
         'message': 'Task updated successfully',
@@ -361,11 +946,100 @@ def update_task(task_id):
 @app.route('/api/tasks/<int:task_id>', methods=['DELETE'])
 def delete_task(task_id):
     task = Task.query.get_or_404(task_id)
+    
+    # Completion task ini ikut dihapus; counter user yang sudah completed dikurangi di transaksi yang sama
+    completed_users = [user_id for user_id, status in db.session.query(
+        UserTaskCompletion.user_id, UserTaskCompletion.status
+    ).filter(UserTaskCompletion.task_id == task.id).with_for_update() if status == 'completed']
+    UserTaskCompletion.query.filter_by(task_id=task.id).delete(synchronize_session=False)
+    adjust_completed_counts({(user_id, task.course_id): -1 for user_id in completed_users})
+    adjust_course_scores({(user_id, task.course_id): -(task.points or 0) for user_id in completed_users})
+    request_progress_recomputes([(user_id, task.course_id) for user_id in completed_users])
+    
     db.session.delete(task)
+    adjust_task_totals({task.course_id: -1})
+    TaskDeadlineNotice.query.filter_by(task_id=task.id).delete(synchronize_session=False)
+    TaskDeadlineEmission.query.filter_by(task_id=task.id).delete(synchronize_session=False)
     db.session.commit()
     
+    if completed_users:
+        invalidate_leaderboard(task.course_id)
+    for user_id in completed_users:
+        enqueue_progress_recompute(user_id, task.course_id)
+    
     return jsonify({'message': 'Task deleted successfully'}), 200
 
+@app.route('/api/tasks/counters/rebuild', methods=['POST'])
+def rebuild_task_counters_endpoint():
+    """Repair job: hitung ulang counter task dan completion dari tabel sumbernya"""
+    try:
+        rebuild_task_counters()
+        return jsonify({'message': 'Task counters rebuilt'}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Error rebuilding task counters: {str(e)}'}), 500
+
+@app.route('/api/courses/<int:course_id>/clone-content', methods=['POST'])
+def clone_course_content(course_id):
+    """Salin semua module dan task course ke course lain (INSERT ... SELECT dalam satu transaksi)"""
+    data = request.get_json(silent=True) or {}
+    target_course_id = data.get('target_course_id')
+    offset_days = data.get('due_date_offset_days', 0)
+    if not is_valid_id(target_course_id) or target_course_id == course_id:
+        return jsonify({'error': 'target_course_id must be an integer different from the source course'}), 400
+    if isinstance(offset_days, bool) or not isinstance(offset_days, (int, float)):
+        return jsonify({'error': 'due_date_offset_days must be a number'}), 400
+
+    # Jangan menyalin dua kali (misalnya retry setelah timeout)
+    if Module.query.filter_by(course_id=target_course_id).first() or Task.query.filter_by(course_id=target_course_id).first():
+        return jsonify({'error': 'Target course already has modules or tasks'}), 409
+
+    now = datetime.utcnow()
+    target = bindparam('target_course_id', target_course_id)
+    created_at = bindparam('created_at', now)
+
+    modules = db.session.execute(insert(Module).from_select(
+        ['course_id', 'title', 'description', 'order_index', 'created_at', 'updated_at'],
+        select(target, Module.title, Module.description, Module.order_index, created_at, created_at)
+        .where(Module.course_id == course_id)
+    )).rowcount
+
+    offset_seconds = int(offset_days * 86400)
+    due_date = func.timestampadd(text('SECOND'), offset_seconds, Task.due_date) if offset_seconds else Task.due_date
+    tasks = db.session.execute(insert(Task).from_select(
+        ['course_id', 'title', 'description', 'task_type', 'due_date', 'priority', 'points', 'order_index',
+         'created_at', 'updated_at'],
+        select(target, Task.title, Task.description, Task.task_type, due_date, Task.priority, Task.points,
+               Task.order_index, created_at, created_at)
+        .where(Task.course_id == course_id)
+    )).rowcount
+    adjust_task_totals({target_course_id: tasks})
+
+    db.session.commit()
+    if tasks:
+        request_deadline_rescan()
+
+    return jsonify({
+        'message': 'Course content cloned successfully',
+        'source_course_id': course_id,
+        'target_course_id': target_course_id,
+        'modules': modules,
+        'tasks': tasks
+    }), 201
+
+@app.route('/api/courses/<int:course_id>/content', methods=['DELETE'])
+def delete_course_content(course_id):
+    """Hapus semua module dan task course yang belum punya aktivitas student (kompensasi clone)"""
+    if UserTaskCompletion.query.filter_by(course_id=course_id).first() or Submission.query.filter_by(course_id=course_id).first():
+        return jsonify({'error': 'Course content already has student activity'}), 409
+
+    tasks = Task.query.filter_by(course_id=course_id).delete(synchronize_session=False)
+    modules = Module.query.filter_by(course_id=course_id).delete(synchronize_session=False)
+    adjust_task_totals({course_id: -tasks})
+    db.session.commit()
+
+    return jsonify({'message': 'Course content deleted', 'modules': modules, 'tasks': tasks}), 200
+
 @app.route('/api/tasks/user/<int:user_id>/course/<int:course_id>', methods=['GET'])
 def get_user_course_tasks(user_id, course_id):
     """Get course tasks with user completion status"""
@@ -416,10 +1090,11 @@ def complete_task(task_id):
     
     task = Task.query.get_or_404(task_id)
     
-    # Check if completion already exists
+    # Check if completion already exists (FOR UPDATE: status lama dipakai untuk delta counter)
     completion = UserTaskCompletion.query.filter_by(
         user_id=user_id, task_id=task_id
-    ).first()
+    ).with_for_update().first()
+    old_status = completion.status if completion else None
     
     if completion:
         completion.status = 'completed'
@@ -435,10 +1110,12 @@ def complete_task(task_id):
         )
         db.session.add(completion)
     
+    record_completion_change(user_id, completion.course_id, task.points, old_status, 'completed')
+    request_progress_recompute(user_id, task.course_id)
     db.session.commit()
     
     # Update progress based on completed tasks
-    update_progress_from_tasks(user_id, task.course_id)
+    enqueue_progress_recompute(user_id, task.course_id)
     
     return jsonify({
         'message': 'Task marked as completed',
@@ -460,9 +1137,11 @@ def update_task_status(task_id):
     
     task = Task.query.get_or_404(task_id)
     
+    # FOR UPDATE seperti batch path, supaya old_status tidak berubah sebelum commit
     completion = UserTaskCompletion.query.filter_by(
         user_id=user_id, task_id=task_id
-    ).first()
+    ).with_for_update().first()
+    old_status = completion.status if completion else None
     
     if completion:
         completion.status = status
@@ -481,69 +1160,171 @@ def update_task_status(task_id):
         )
         db.session.add(completion)
     
+    record_completion_change(user_id, completion.course_id, task.points, old_status, status)
+    # Update progress based on completed tasks (juga saat task batal completed)
+    recompute = status == 'completed' or old_status == 'completed'
+    if recompute:
+        request_progress_recompute(user_id, task.course_id)
     db.session.commit()
     
-    # Update progress based on completed tasks
-    if status == 'completed':
-        update_progress_from_tasks(user_id, task.course_id)
+    if recompute:
+        enqueue_progress_recompute(user_id, task.course_id)
     
     return jsonify({
         'message': 'Task status updated',
         'completion': completion.to_dict()
     }), 200
 
+BATCH_TASK_STATUS_CHUNK_SIZE = 1000
+BATCH_TASK_STATUS_MAX_ROWS = 50000
+TASK_STATUSES = ('pending', 'in_progress', 'completed')
+
+def apply_task_status_chunk(changes, task_info, now):
+    """Upsert satu chunk {(user_id, task_id): status}, return (hasil per pasangan, (user, course) yang berubah)"""
+    # FOR UPDATE supaya status lama yang dipakai untuk delta counter tidak berubah sebelum commit
+    old_statuses = {
+        (user_id, task_id): status
+        for user_id, task_id, status in db.session.query(
+            UserTaskCompletion.user_id, UserTaskCompletion.task_id, UserTaskCompletion.status
+        ).filter(tuple_(UserTaskCompletion.user_id, UserTaskCompletion.task_id).in_(list(changes))).with_for_update()
+    }
+    
+    results = {}
+    rows = []
+    deltas = {}
+    score_deltas = {}
+    for (user_id, task_id), status in changes.items():
+        old_status = old_statuses.get((user_id, task_id))
+        if old_status == status:
+            results[(user_id, task_id)] = 'unchanged'
+            continue
+        results[(user_id, task_id)] = 'updated' if (user_id, task_id) in old_statuses else 'created'
+        
+        course_id, points = task_info[task_id]
+        rows.append({
+            'user_id': user_id,
+            'task_id': task_id,
+            'course_id': course_id,
+            'status': status,
+            'completed_at': now if status == 'completed' else None,
+            'updated_at': now
+        })
+        delta = completion_delta(old_status, status)
+        if delta:
+            deltas[(user_id, course_id)] = deltas.get((user_id, course_id), 0) + delta
+            score_deltas[(user_id, course_id)] = score_deltas.get((user_id, course_id), 0) + delta * (points or 0)
+    
+    if rows:
+        stmt = mysql_insert(UserTaskCompletion).values(rows)
+        stmt = stmt.on_duplicate_key_update(
+            status=stmt.inserted.status,
+            completed_at=stmt.inserted.completed_at,
+            updated_at=stmt.inserted.updated_at
+        )
+        db.session.execute(stmt)
+    adjust_completed_counts(deltas)
+    adjust_course_scores(score_deltas)
+    return results, set(deltas)
+
+@app.route('/api/tasks/status/batch', methods=['PUT'])
+def batch_update_task_status():
+    """Update banyak status task sekaligus dalam satu transaksi"""
+    data = request.get_json() or {}
+    updates = data.get('updates')
+    if not isinstance(updates, list):
+        return jsonify({'error': 'Provide updates=[{user_id, task_id, status}]'}), 400
+    if len(updates) > BATCH_TASK_STATUS_MAX_ROWS:
+        return jsonify({'error': f'Maximum {BATCH_TASK_STATUS_MAX_ROWS} updates per request'}), 400
+    
+    results = []
+    changes = {}
+    for item in updates:
+        item = item if isinstance(item, dict) else {}
+        user_id, task_id, status = item.get('user_id'), item.get('task_id'), item.get('status')
+        result = {'user_id': user_id, 'task_id': task_id, 'status': status}
+        if not is_valid_id(user_id) or not is_valid_id(task_id) or status not in TASK_STATUSES:
+            result['result'] = 'invalid'
+        elif (user_id, task_id) in changes:
+            result['result'] = 'duplicate'
+        else:
+            changes[(user_id, task_id)] = status
+        results.append(result)
+    
+    task_ids = list({task_id for _, task_id in changes})
+    task_info = {}
+    for start in range(0, len(task_ids), BATCH_TASK_STATUS_CHUNK_SIZE):
+        task_info.update(
+            (task_id, (course_id, points))
+            for task_id, course_id, points in db.session.query(Task.id, Task.course_id, Task.points).filter(
+                Task.id.in_(task_ids[start:start + BATCH_TASK_STATUS_CHUNK_SIZE])
+            )
+        )
+    
+    pairs = [pair for pair in changes if pair[1] in task_info]
+    now = datetime.utcnow()
+    chunk_results = {}
+    changed = set()
+    for start in range(0, len(pairs), BATCH_TASK_STATUS_CHUNK_SIZE):
+        chunk = {pair: changes[pair] for pair in pairs[start:start + BATCH_TASK_STATUS_CHUNK_SIZE]}
+        chunk_result, chunk_changed = apply_task_status_chunk(chunk, task_info, now)
+        chunk_results.update(chunk_result)
+        changed.update(chunk_changed)
+    
+    # Satu recompute per (user, course) yang punya task berubah dari/ke completed
+    affected = sorted(changed)
+    request_progress_recomputes(affected)
+    db.session.commit()
+    for user_id, course_id in affected:
+        enqueue_progress_recompute(user_id, course_id)
+    
+    summary = {'created': 0, 'updated': 0, 'unchanged': 0, 'task_not_found': 0, 'duplicate': 0, 'invalid': 0}
+    for result in results:
+        if 'result' not in result:
+            result['result'] = chunk_results.get((result['user_id'], result['task_id']), 'task_not_found')
+        summary[result['result']] += 1
+    
+    return jsonify({
+        'message': 'Task statuses updated',
+        'summary': summary,
+        'progress_recomputes': len(affected),
+        'results': results
+    }), 200
+
 def update_progress_from_tasks(user_id, course_id):
     """Update progress percentage based on completed tasks"""
-    # Get all tasks for course
-    total_tasks = Task.query.filter_by(course_id=course_id).count()
+    # Counter di-maintain incremental, jadi cukup dua primary-key read
+    task_total = db.session.get(CourseTaskTotal, course_id)
+    total_tasks = task_total.total_tasks if task_total else 0
     
-    if total_tasks == 0:
+    if total_tasks <= 0:
         return
     
-    # Get completed tasks
-    completed_tasks = UserTaskCompletion.query.filter_by(
-        user_id=user_id,
-        course_id=course_id,
-        status='completed'
-    ).count()
+    completed_count = db.session.get(UserCourseTaskCount, (user_id, course_id))
+    completed_tasks = completed_count.completed_tasks if completed_count else 0
     
     # Calculate completion percentage
-    completion_percentage = (completed_tasks / total_tasks) * 100
-    
-    # Get or create progress record
-    progress_records = Progress.query.filter_by(
+    completion_percentage = min((completed_tasks / total_tasks) * 100, 100.0)
+    
+    # Get enrollment_id from local projection (tanpa HTTP call ke enrollment service)
+    enrollment_id = get_enrollment_id(user_id, course_id)
+    
+    now = datetime.utcnow()
+    values = {
+        Progress.completion_percentage: completion_percentage,
+        Progress.status: 'completed' if completion_percentage >= 100 else 'in_progress',
+        Progress.last_accessed: now
+    }
+    if completion_percentage >= 100:
+        values[Progress.completed_at] = now
+    if enrollment_id > 0:
+        values[Progress.enrollment_id] = enrollment_id
+    
+    # Satu UPDATE untuk semua progress record user di course ini
+    updated = Progress.query.filter_by(
         user_id=user_id, course_id=course_id
-    ).all()
+    ).update(values, synchronize_session=False)
     
-    # Get enrollment_id if exists
-    enrollment_id = 0
-    try:
-        import requests
-        from config import SERVICES
-        enrollment_response = requests.get(
-            f"{SERVICES['enrollment']}/api/enrollments",
-            params={'user_id': user_id, 'course_id': course_id},
-            timeout=5
-        )
-        if enrollment_response.ok:
-            enrollments = enrollment_response.json()
-            if enrollments:
-                enrollment_id = enrollments[0].get('id', 0)
-    except:
-        pass
-    
-    if progress_records:
-        for progress in progress_records:
-            progress.completion_percentage = completion_percentage
-            if enrollment_id > 0:
-                progress.enrollment_id = enrollment_id
-            if completion_percentage >= 100:
-                progress.status = 'completed'
-                progress.completed_at = datetime.utcnow()
-            else:
-                progress.status = 'in_progress'
-            progress.last_accessed = datetime.utcnow()
-    else:
+    if not updated:
         progress = Progress(
             user_id=user_id,
             course_id=course_id,
@@ -555,6 +1336,479 @@ def update_progress_from_tasks(user_id, course_id):
     
     db.session.commit()
 
+# Progress recompute worker: request hanya mencatat ProgressRecomputeJob di transaksinya
+# sendiri lalu langsung merespons. Job di-partisi per (user, course) ke satu worker, jadi
+# recompute untuk key yang sama selalu berurutan; job yang sudah antri di-coalesce.
+PROGRESS_RECOMPUTE_WORKERS = 4
+PROGRESS_RECOMPUTE_RETRY_SECONDS = 5
+progress_recompute_queues = []
+progress_recompute_pending = set()
+progress_recompute_lock = threading.Lock()
+
+def request_progress_recompute(user_id, course_id):
+    """Catat job recompute di transaksi yang sedang berjalan (panggil sebelum commit)"""
+    request_progress_recomputes([(user_id, course_id)])
+
+def request_progress_recomputes(keys):
+    """Versi multi-row dari request_progress_recompute; keys = [(user_id, course_id)]"""
+    rows = [{'user_id': int(user_id), 'course_id': int(course_id), 'version': 1} for user_id, course_id in keys]
+    if not rows:
+        return
+    stmt = mysql_insert(ProgressRecomputeJob).values(rows)
+    stmt = stmt.on_duplicate_key_update(version=ProgressRecomputeJob.version + 1)
+    db.session.execute(stmt)
+
+def enqueue_progress_recompute(user_id, course_id):
+    """Serahkan job ke worker pool setelah commit"""
+    key = (int(user_id), int(course_id))
+    with progress_recompute_lock:
+        if not progress_recompute_queues:
+            start_progress_recompute_workers()
+        if key in progress_recompute_pending:
+            return
+        progress_recompute_pending.add(key)
+    progress_recompute_queues[hash(key) % PROGRESS_RECOMPUTE_WORKERS].put(key)
+
+def start_progress_recompute_workers():
+    """Start worker pool (dipanggil dengan progress_recompute_lock)"""
+    for _ in range(PROGRESS_RECOMPUTE_WORKERS):
+        jobs = queue.Queue()
+        progress_recompute_queues.append(jobs)
+        threading.Thread(target=progress_recompute_loop, args=(jobs,), daemon=True).start()
+
+def run_progress_recompute(user_id, course_id):
+    job = db.session.get(ProgressRecomputeJob, (user_id, course_id))
+    if job is None:
+        return
+    version = job.version
+    
+    update_progress_from_tasks(user_id, course_id)
+    refresh_leaderboard_scores(course_id, [user_id])
+    
+    # Request baru selama recompute menaikkan version, jadi job-nya tidak ikut terhapus
+    ProgressRecomputeJob.query.filter_by(
+        user_id=user_id, course_id=course_id, version=version
+    ).delete(synchronize_session=False)
+    db.session.commit()
+
+def progress_recompute_loop(jobs):
+    while True:
+        user_id, course_id = jobs.get()
+        with progress_recompute_lock:
+            progress_recompute_pending.discard((user_id, course_id))
+        try:
+            with app.app_context():
+                run_progress_recompute(user_id, course_id)
+        except Exception as e:
+            print(f"[WARNING] Failed to recompute progress for user {user_id} course {course_id}: {e}")
+            threading.Timer(PROGRESS_RECOMPUTE_RETRY_SECONDS, enqueue_progress_recompute,
+                            args=(user_id, course_id)).start()
+
+def resume_progress_recompute_jobs():
+    """Antrikan ulang job yang belum selesai sebelum service berhenti"""
+    jobs = db.session.query(ProgressRecomputeJob.user_id, ProgressRecomputeJob.course_id).all()
+    for user_id, course_id in jobs:
+        enqueue_progress_recompute(user_id, course_id)
+    return len(jobs)
+
+# Leaderboard: CourseScore di-update incremental bersama UserTaskCompletion; ranking disimpan
+# di memory per course dalam order-statistic tree (treap dengan ukuran subtree), jadi top-k dan
+# rank satu user O(log n). Leaderboard dimuat dari CourseScore saat pertama kali diminta dan
+# di-refresh oleh progress recompute worker setelah score berubah.
+LEADERBOARD_MAX_LIMIT = 100
+
+class _TreapNode:
+    __slots__ = ('key', 'priority', 'size', 'left', 'right')
+    
+    def __init__(self, key):
+        self.key = key
+        self.priority = random.random()
+        self.size = 1
+        self.left = None
+        self.right = None
+
+def _treap_size(node):
+    return node.size if node else 0
+
+def _treap_update(node):
+    node.size = 1 + _treap_size(node.left) + _treap_size(node.right)
+    return node
+
+def _treap_split(node, key):
+    """Pisahkan menjadi (key < key, key >= key)"""
+    if node is None:
+        return None, None
+    if node.key < key:
+        left, right = _treap_split(node.right, key)
+        node.right = left
+        return _treap_update(node), right
+    left, right = _treap_split(node.left, key)
+    node.left = right
+    return left, _treap_update(node)
+
+def _treap_merge(left, right):
+    if left is None or right is None:
+        return left or right
+    if left.priority > right.priority:
+        left.right = _treap_merge(left.right, right)
+        return _treap_update(left)
+    right.left = _treap_merge(left, right.left)
+    return _treap_update(right)
+
+def _treap_remove(node, key):
+    if node is None:
+        return None
+    if node.key == key:
+        return _treap_merge(node.left, node.right)
+    if key < node.key:
+        node.left = _treap_remove(node.left, key)
+    else:
+        node.right = _treap_remove(node.right, key)
+    return _treap_update(node)
+
+class OrderStatisticTree:
+    """Sorted set dengan insert, remove, rank dan select by index dalam O(log n)"""
+    
+    def __init__(self):
+        self.root = None
+    
+    def __len__(self):
+        return _treap_size(self.root)
+    
+    def insert(self, key):
+        left, right = _treap_split(self.root, key)
+        self.root = _treap_merge(_treap_merge(left, _TreapNode(key)), right)
+    
+    def remove(self, key):
+        self.root = _treap_remove(self.root, key)
+    
+    def count_less(self, key):
+        """Jumlah key yang lebih kecil dari key"""
+        count = 0
+        node = self.root
+        while node:
+            if node.key < key:
+                count += _treap_size(node.left) + 1
+                node = node.right
+            else:
+                node = node.left
+        return count
+    
+    def select(self, index):
+        """Key ke-index (0-based) dalam urutan sorted"""
+        node = self.root
+        while node:
+            left_size = _treap_size(node.left)
+            if index < left_size:
+                node = node.left
+            elif index == left_size:
+                return node.key
+            else:
+                index -= left_size + 1
+                node = node.right
+        raise IndexError(index)
+
+class CourseLeaderboard:
+    """Ranking satu course; key (-points, user_id) supaya points tertinggi di depan"""
+    
+    def __init__(self):
+        self.points = {}
+        self.tree = OrderStatisticTree()
+    
+    def set(self, user_id, points):
+        old_points = self.points.get(user_id)
+        if old_points == points:
+            return
+        if old_points is not None:
+            self.tree.remove((-old_points, user_id))
+        self.points[user_id] = points
+        self.tree.insert((-points, user_id))
+    
+    def rank(self, user_id):
+        """Rank 1-based; user dengan points sama mendapat rank yang sama"""
+        points = self.points.get(user_id)
+        if points is None:
+            return None
+        return self.tree.count_less((-points, 0)) + 1
+    
+    def top(self, limit, offset=0):
+        entries = []
+        for index in range(offset, min(offset + limit, len(self.tree))):
+            negative_points, user_id = self.tree.select(index)
+            points = -negative_points
+            if entries and entries[-1]['points'] == points:
+                rank = entries[-1]['rank']
+            else:
+                rank = self.tree.count_less((negative_points, 0)) + 1
+            entries.append({'rank': rank, 'user_id': user_id, 'points': points})
+        return entries
+
+leaderboards = {}  # course_id -> CourseLeaderboard
+leaderboard_lock = threading.Lock()
+
+def load_leaderboard(course_id):
+    """Ambil leaderboard course, dimuat dari CourseScore jika belum ada (panggil dengan leaderboard_lock)"""
+    leaderboard = leaderboards.get(course_id)
+    if leaderboard is None:
+        leaderboard = CourseLeaderboard()
+        for user_id, points in db.session.query(CourseScore.user_id, CourseScore.points).filter_by(course_id=course_id):
+            leaderboard.set(user_id, points)
+        leaderboards[course_id] = leaderboard
+    return leaderboard
+
+def refresh_leaderboard_scores(course_id, user_ids):
+    """Salin score terbaru dari database ke leaderboard yang sudah dimuat"""
+    with leaderboard_lock:
+        leaderboard = leaderboards.get(course_id)
+        if leaderboard is None:
+            return
+        # Dibaca di dalam lock supaya refresh yang lebih baru tidak tertimpa yang lebih lama
+        for user_id, points in db.session.query(CourseScore.user_id, CourseScore.points).filter(
+            CourseScore.course_id == course_id, CourseScore.user_id.in_(user_ids)
+        ):
+            leaderboard.set(user_id, points)
+
+def invalidate_leaderboards():
+    with leaderboard_lock:
+        leaderboards.clear()
+
+def invalidate_leaderboard(course_id):
+    """Buang leaderboard satu course; dimuat ulang dari CourseScore saat dibaca berikutnya"""
+    with leaderboard_lock:
+        leaderboards.pop(course_id, None)
+
+@app.route('/api/leaderboard/course/<int:course_id>', methods=['GET'])
+def get_course_leaderboard(course_id):
+    """Top-k student berdasarkan points dari task completed"""
+    limit = request.args.get('limit', 10, type=int)
+    offset = request.args.get('offset', 0, type=int)
+    if not 0 < limit <= LEADERBOARD_MAX_LIMIT or offset < 0:
+        return jsonify({'error': f'limit must be between 1 and {LEADERBOARD_MAX_LIMIT}, offset must be >= 0'}), 400
+    
+    with leaderboard_lock:
+        leaderboard = load_leaderboard(course_id)
+        entries = leaderboard.top(limit, offset)
+        total = len(leaderboard.tree)
+    
+    return jsonify({'course_id': course_id, 'total_students': total, 'entries': entries}), 200
+
+@app.route('/api/leaderboard/course/<int:course_id>/user/<int:user_id>', methods=['GET'])
+def get_user_rank(course_id, user_id):
+    """Rank dan points satu user di leaderboard course"""
+    with leaderboard_lock:
+        leaderboard = load_leaderboard(course_id)
+        rank = leaderboard.rank(user_id)
+        points = leaderboard.points.get(user_id, 0)
+        total = len(leaderboard.tree)
+    
+    return jsonify({
+        'course_id': course_id,
+        'user_id': user_id,
+        'rank': rank,
+        'points': points,
+        'total_students': total
+    }), 200
+
+# Deadline scheduler: min-heap di memory berisi event (fire_at, kind, task_id, due_date) untuk
+# task yang due_date-nya di sekitar sekarang, dibangun ulang dari range scan index task.due_date.
+# Saat event jatuh tempo, TaskDeadlineNotice untuk semua student aktif yang belum menyelesaikan
+# task ditulis dengan satu INSERT ... SELECT per task, jadi query overdue per user cukup membaca
+# tabel itu. Event yang sudah di-emit dicatat di TaskDeadlineEmission (per task, kind dan
+# due_date) di transaksi yang sama, jadi rescan/restart tidak memicu ulang event tersebut.
+DEADLINE_DUE_SOON_HOURS = 24
+DEADLINE_HORIZON_HOURS = 48
+DEADLINE_CATCHUP_DAYS = 7
+DEADLINE_RESCAN_SECONDS = 15 * 60
+DEADLINE_RETRY_SECONDS = 30
+DEADLINE_EMIT_BATCH_TASKS = 50
+DEADLINE_KINDS = ('due_soon', 'overdue')
+deadline_heap = []
+deadline_lock = threading.Lock()
+deadline_rescan_requested = threading.Event()
+
+def request_deadline_rescan():
+    """Minta scheduler membangun ulang heap (setelah due_date task berubah)"""
+    deadline_rescan_requested.set()
+
+def rebuild_deadline_heap(now):
+    """Isi ulang heap dari task dengan due_date di [now - catchup, now + horizon)"""
+    tasks = db.session.query(Task.id, Task.due_date).filter(
+        Task.due_date >= now - timedelta(days=DEADLINE_CATCHUP_DAYS),
+        Task.due_date < now + timedelta(hours=DEADLINE_HORIZON_HOURS)
+    ).all()
+    emitted = emitted_deadline_events([task_id for task_id, _ in tasks])
+
+    events = []
+    for task_id, due_date in tasks:
+        if due_date > now:
+            events.append((due_date - timedelta(hours=DEADLINE_DUE_SOON_HOURS), 'due_soon', task_id, due_date))
+        events.append((due_date, 'overdue', task_id, due_date))
+    events = [event for event in events if (event[2], event[1], event[3]) not in emitted]
+    heapq.heapify(events)
+
+    with deadline_lock:
+        deadline_heap[:] = events
+    return len(tasks)
+
+def emitted_deadline_events(task_ids):
+    """Set (task_id, kind, due_date) yang sudah di-emit"""
+    if not task_ids:
+        return set()
+    return set(db.session.query(
+        TaskDeadlineEmission.task_id, TaskDeadlineEmission.kind, TaskDeadlineEmission.due_date
+    ).filter(TaskDeadlineEmission.task_id.in_(task_ids)).all())
+
+def pop_due_deadlines(now):
+    due = []
+    with deadline_lock:
+        while deadline_heap and deadline_heap[0][0] <= now:
+            due.append(heapq.heappop(deadline_heap))
+    return due
+
+def emit_deadline_notices(events, now):
+    """Tulis TaskDeadlineNotice untuk event yang jatuh tempo, commit per batch task"""
+    # Event dari heap bisa basi kalau task diubah/dihapus sebelum rescan
+    tasks = {
+        task_id: (due_date, course_id)
+        for task_id, due_date, course_id in db.session.query(Task.id, Task.due_date, Task.course_id).filter(
+            Task.id.in_({task_id for _, _, task_id, _ in events})
+        )
+    }
+    emitted = emitted_deadline_events(list(tasks))
+    events = [event for event in events if event[2] in tasks and tasks[event[2]][0] == event[3]
+              and (event[2], event[1], event[3]) not in emitted]
+
+    for start in range(0, len(events), DEADLINE_EMIT_BATCH_TASKS):
+        batch = events[start:start + DEADLINE_EMIT_BATCH_TASKS]
+        for _, kind, task_id, due_date in batch:
+            stmt = mysql_insert(TaskDeadlineNotice).from_select(
+                ['user_id', 'task_id', 'course_id', 'kind', 'due_date', 'notified_at'],
+                select(
+                    EnrollmentProjection.user_id,
+                    bindparam('task_id', task_id),
+                    EnrollmentProjection.course_id,
+                    bindparam('kind', kind),
+                    bindparam('due_date', due_date),
+                    bindparam('notified_at', now)
+                ).outerjoin(
+                    UserTaskCompletion, and_(UserTaskCompletion.user_id == EnrollmentProjection.user_id,
+                                             UserTaskCompletion.task_id == task_id)
+                ).where(
+                    EnrollmentProjection.course_id == tasks[task_id][1],
+                    EnrollmentProjection.status == 'active',
+                    or_(UserTaskCompletion.status.is_(None), UserTaskCompletion.status != 'completed')
+                )
+            )
+            if kind == 'overdue':
+                stmt = stmt.on_duplicate_key_update(kind=stmt.inserted.kind, notified_at=stmt.inserted.notified_at)
+            else:
+                # Jangan turunkan notice yang sudah overdue
+                stmt = stmt.on_duplicate_key_update(kind=TaskDeadlineNotice.kind)
+            db.session.execute(stmt)
+        
+        # Penanda emit di transaksi yang sama dengan notice-nya
+        stmt = mysql_insert(TaskDeadlineEmission).values([
+            {'task_id': task_id, 'kind': kind, 'due_date': due_date, 'emitted_at': now}
+            for _, kind, task_id, due_date in batch
+        ])
+        stmt = stmt.on_duplicate_key_update(due_date=stmt.inserted.due_date, emitted_at=stmt.inserted.emitted_at)
+        db.session.execute(stmt)
+        db.session.commit()
+    return len(events)
+
+def backfill_deadline_notices(pairs, now):
+    """Tulis notice untuk event yang sudah di-emit ke (user, course) yang baru aktif (transaksi berjalan)"""
+    if not pairs:
+        return
+    # overdue dulu: untuk task yang punya kedua event, notice overdue yang tersimpan
+    for kind in ('overdue', 'due_soon'):
+        stmt = mysql_insert(TaskDeadlineNotice).from_select(
+            ['user_id', 'task_id', 'course_id', 'kind', 'due_date', 'notified_at'],
+            select(
+                EnrollmentProjection.user_id,
+                Task.id,
+                Task.course_id,
+                TaskDeadlineEmission.kind,
+                Task.due_date,
+                bindparam('notified_at', now)
+            ).join(
+                Task, Task.course_id == EnrollmentProjection.course_id
+            ).join(
+                TaskDeadlineEmission, and_(TaskDeadlineEmission.task_id == Task.id,
+                                           TaskDeadlineEmission.due_date == Task.due_date,
+                                           TaskDeadlineEmission.kind == kind)
+            ).outerjoin(
+                UserTaskCompletion, and_(UserTaskCompletion.user_id == EnrollmentProjection.user_id,
+                                         UserTaskCompletion.task_id == Task.id)
+            ).where(
+                tuple_(EnrollmentProjection.user_id, EnrollmentProjection.course_id).in_(pairs),
+                EnrollmentProjection.status == 'active',
+                or_(UserTaskCompletion.status.is_(None), UserTaskCompletion.status != 'completed')
+            )
+        )
+        # Notice yang sudah ada tidak diubah
+        db.session.execute(stmt.on_duplicate_key_update(kind=TaskDeadlineNotice.kind))
+
+def deadline_scheduler_loop():
+    next_rescan = 0
+    while True:
+        wait = DEADLINE_RETRY_SECONDS
+        try:
+            with app.app_context():
+                now = datetime.utcnow()
+                if deadline_rescan_requested.is_set() or time.monotonic() >= next_rescan:
+                    deadline_rescan_requested.clear()
+                    rebuild_deadline_heap(now)
+                    next_rescan = time.monotonic() + DEADLINE_RESCAN_SECONDS
+
+                due = pop_due_deadlines(now)
+                if due:
+                    emit_deadline_notices(due, now)
+
+                wait = max(next_rescan - time.monotonic(), 0)
+                with deadline_lock:
+                    if deadline_heap:
+                        wait = min(wait, (deadline_heap[0][0] - datetime.utcnow()).total_seconds())
+                wait = max(wait, 1)
+        except Exception as e:
+            print(f"[WARNING] Deadline scheduler error: {e}")
+        deadline_rescan_requested.wait(wait)
+
+def start_deadline_scheduler():
+    threading.Thread(target=deadline_scheduler_loop, daemon=True).start()
+
+@app.route('/api/deadlines/user/<int:user_id>', methods=['GET'])
+def get_user_deadlines(user_id):
+    """Task overdue dan due soon milik user yang belum completed"""
+    kind = request.args.get('kind')
+    course_id = request.args.get('course_id', type=int)
+    if kind is not None and kind not in DEADLINE_KINDS:
+        return jsonify({'error': f"kind must be one of: {', '.join(DEADLINE_KINDS)}"}), 400
+
+    query = db.session.query(TaskDeadlineNotice, Task.title).join(
+        Task, Task.id == TaskDeadlineNotice.task_id
+    ).outerjoin(
+        UserTaskCompletion, and_(UserTaskCompletion.user_id == TaskDeadlineNotice.user_id,
+                                 UserTaskCompletion.task_id == TaskDeadlineNotice.task_id)
+    ).filter(
+        TaskDeadlineNotice.user_id == user_id,
+        or_(UserTaskCompletion.status.is_(None), UserTaskCompletion.status != 'completed')
+    )
+    if kind:
+        query = query.filter(TaskDeadlineNotice.kind == kind)
+    if course_id:
+        query = query.filter(TaskDeadlineNotice.course_id == course_id)
+
+    deadlines = {deadline_kind: [] for deadline_kind in DEADLINE_KINDS}
+    for notice, title in query.order_by(TaskDeadlineNotice.due_date):
+        deadlines[notice.kind].append({**notice.to_dict(), 'title': title})
+
+    return jsonify({
+        'user_id': user_id,
+        'overdue': deadlines['overdue'],
+        'due_soon': deadlines['due_soon']
+    }), 200
+
 # Submission Routes
 @app.route('/api/submissions', methods=['GET'])
 def get_submissions():
@@ -563,8 +1817,11 @@ def get_submissions():
     task_id = request.args.get('task_id')
     course_id = request.args.get('course_id')
     status = request.args.get('status')
+    fields, error = parse_fields(Submission)
+    if error:
+        return jsonify({'error': error}), 400
     
-    query = Submission.query
+    query = with_fields(Submission.query, Submission, fields)
     
     if user_id:
         query = query.filter_by(user_id=user_id)
@@ -576,13 +1833,17 @@ def get_submissions():
         query = query.filter_by(status=status)
     
     submissions = query.order_by(Submission.submitted_at.desc()).all()
-    return jsonify([submission.to_dict() for submission in submissions]), 200
+    return jsonify([submission.to_dict(fields) for submission in submissions]), 200
 
 @app.route('/api/submissions/<int:submission_id>', methods=['GET'])
 def get_submission(submission_id):
     """Get submission by ID"""
-    submission = Submission.query.get_or_404(submission_id)
-    return jsonify(submission.to_dict()), 200
+    fields, error = parse_fields(Submission)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    submission = with_fields(Submission.query, Submission, fields).get_or_404(submission_id)
+    return jsonify(submission.to_dict(fields)), 200
 
 @app.route('/api/submissions', methods=['POST'])
 def create_submission():
@@ -608,13 +1869,22 @@ def create_submission():
         status='submitted'
     )
     
+    # File yang di-upload lewat /api/uploads
+    if data.get('upload_id'):
+        upload = db.session.get(UploadSession, data.get('upload_id'))
+        if not upload or upload.status != 'completed' or upload.user_id != data.get('user_id'):
+            return jsonify({'error': 'upload_id must refer to a completed upload by this user'}), 400
+        submission.submission_file_url = f"{blob_url(upload.sha256)}?name={quote(upload.file_name)}"
+        submission.submission_file_name = upload.file_name
+    
     db.session.add(submission)
     
-    # Update task completion status
+    # Update task completion status (FOR UPDATE: status lama dipakai untuk delta counter)
     completion = UserTaskCompletion.query.filter_by(
         user_id=data.get('user_id'),
         task_id=data.get('task_id')
-    ).first()
+    ).with_for_update().first()
+    old_status = completion.status if completion else None
     
     if completion:
         completion.status = 'completed'
@@ -631,10 +1901,14 @@ def create_submission():
         )
         db.session.add(completion)
     
+    task = db.session.get(Task, completion.task_id)
+    record_completion_change(completion.user_id, completion.course_id, task.points if task else 0,
+                             old_status, 'completed')
+    request_progress_recompute(completion.user_id, completion.course_id)
     db.session.commit()
     
     # Update progress
-    update_progress_from_tasks(data.get('user_id'), data.get('course_id'))
+    enqueue_progress_recompute(completion.user_id, completion.course_id)
     
     return jsonify({
         'message': 'Submission created successfully',
@@ -666,10 +1940,89 @@ def update_submission(submission_id):
         'submission': submission.to_dict()
     }), 200
 
+BULK_GRADE_CHUNK_SIZE = 1000
+BULK_GRADE_MAX_ROWS = 10000
+
+@app.route('/api/submissions/grades', methods=['PUT'])
+def bulk_grade_submissions():
+    """Nilai banyak submission sekaligus dalam satu transaksi"""
+    data = request.get_json() or {}
+    grades = data.get('grades')
+    if not isinstance(grades, list):
+        return jsonify({'error': 'Provide grades=[{submission_id, grade, feedback}]'}), 400
+    if len(grades) > BULK_GRADE_MAX_ROWS:
+        return jsonify({'error': f'Maximum {BULK_GRADE_MAX_ROWS} grades per request'}), 400
+    
+    results = []
+    entries = {}
+    for item in grades:
+        item = item if isinstance(item, dict) else {}
+        submission_id, grade, feedback = item.get('submission_id'), item.get('grade'), item.get('feedback')
+        result = {'submission_id': submission_id}
+        if (not is_valid_id(submission_id)
+                or isinstance(grade, bool) or not isinstance(grade, (int, float))
+                or (feedback is not None and not isinstance(feedback, str))):
+            result['result'] = 'invalid'
+        elif submission_id in entries:
+            result['result'] = 'duplicate'
+        else:
+            entries[submission_id] = (grade, feedback)
+        results.append(result)
+    
+    ids = list(entries)
+    existing = set()
+    for start in range(0, len(ids), BULK_GRADE_CHUNK_SIZE):
+        existing.update(submission_id for (submission_id,) in db.session.query(Submission.id).filter(
+            Submission.id.in_(ids[start:start + BULK_GRADE_CHUNK_SIZE])
+        ))
+    
+    # graded_at dan status sama untuk seluruh batch; feedback hanya ditimpa jika dikirim
+    now = datetime.utcnow()
+    with_feedback = []
+    without_feedback = []
+    for submission_id in ids:
+        if submission_id not in existing:
+            continue
+        grade, feedback = entries[submission_id]
+        params = {'b_id': submission_id, 'b_grade': grade}
+        if feedback is not None:
+            params['b_feedback'] = feedback
+            with_feedback.append(params)
+        else:
+            without_feedback.append(params)
+    
+    table = Submission.__table__
+    values = {'grade': bindparam('b_grade'), 'status': 'graded', 'graded_at': now, 'updated_at': now}
+    if with_feedback:
+        db.session.execute(
+            table.update().where(table.c.id == bindparam('b_id')).values(feedback=bindparam('b_feedback'), **values),
+            with_feedback
+        )
+    if without_feedback:
+        db.session.execute(table.update().where(table.c.id == bindparam('b_id')).values(**values), without_feedback)
+    db.session.commit()
+    
+    summary = {'graded': 0, 'not_found': 0, 'duplicate': 0, 'invalid': 0}
+    for result in results:
+        if 'result' not in result:
+            result['result'] = 'graded' if result['submission_id'] in existing else 'not_found'
+        summary[result['result']] += 1
+    
+    return jsonify({
+        'message': 'Grades applied',
+        'summary': summary,
+        'graded_at': serialize_value(now),
+        'results': results
+    }), 200
+
 @app.route('/api/submissions/user/<int:user_id>/task/<int:task_id>', methods=['GET'])
 def get_user_task_submission(user_id, task_id):
     """Get user's submission for a specific task"""
-    submission = Submission.query.filter_by(
+    fields, error = parse_fields(Submission)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    submission = with_fields(Submission.query, Submission, fields).filter_by(
         user_id=user_id,
         task_id=task_id
     ).first()
@@ -677,7 +2030,443 @@ def get_user_task_submission(user_id, task_id):
     if not submission:
         return jsonify({'message': 'No submission found', 'submission': None}), 200
     
-    return jsonify(submission.to_dict()), 200
+    return jsonify(submission.to_dict(fields)), 200
+
+@app.route('/api/submissions/user/<int:user_id>', methods=['GET'])
+def get_user_submissions(user_id):
+    """Get user's submissions for ?task_ids=1,2,3 or a whole ?course_id, keyed by task_id"""
+    task_ids = request.args.get('task_ids')
+    course_id = request.args.get('course_id', type=int)
+    fields, error = parse_fields(Submission)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    fields = list(fields or Submission.SUMMARY_FIELDS)
+    if 'task_id' not in fields:
+        fields.append('task_id')
+    
+    query = with_fields(Submission.query, Submission, fields).filter_by(user_id=user_id)
+    if task_ids:
+        try:
+            task_id_list = [int(task_id) for task_id in task_ids.split(',') if task_id.strip()]
+        except ValueError:
+            return jsonify({'error': 'task_ids must be a comma-separated list of integers'}), 400
+        query = query.filter(Submission.task_id.in_(task_id_list))
+    elif course_id:
+        query = query.filter_by(course_id=course_id)
+    else:
+        return jsonify({'error': 'task_ids or course_id is required'}), 400
+    
+    # Kalau ada lebih dari satu submission untuk task yang sama, pakai yang terbaru
+    submissions = {}
+    for submission in query.order_by(Submission.id):
+        submissions[str(submission.task_id)] = submission.to_dict(fields)
+    return jsonify(submissions), 200
+
+# Submission file storage: upload dikirim per chunk (PUT body mentah) dan di-stream langsung
+# ke file .part sambil di-hash, jadi memory per request tetap kecil. Setelah lengkap, file
+# dipindah ke blobs/<sha256[:2]>/<sha256[2:4]>/<sha256>; isi yang sama hanya disimpan sekali.
+SUBMISSION_BLOB_DIR = SUBMISSION_STORAGE['blob_dir']
+SUBMISSION_UPLOAD_DIR = os.path.join(SUBMISSION_BLOB_DIR, 'uploads')
+SUBMISSION_CHUNK_MAX_BYTES = SUBMISSION_STORAGE['chunk_max_bytes']
+SUBMISSION_MAX_FILE_BYTES = SUBMISSION_STORAGE['max_file_bytes']
+UPLOAD_STREAM_BLOCK_SIZE = 64 * 1024
+SHA256_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+upload_hashers = {}  # upload_id -> hashlib object untuk byte yang sudah diterima
+upload_locks = {}
+upload_locks_guard = threading.Lock()
+
+def blob_url(sha256):
+    return f'/api/files/{sha256}'
+
+def blob_path(sha256):
+    return os.path.join(SUBMISSION_BLOB_DIR, sha256[:2], sha256[2:4], sha256)
+
+def upload_part_path(upload_id):
+    return os.path.join(SUBMISSION_UPLOAD_DIR, f'{upload_id}.part')
+
+def get_upload_lock(upload_id):
+    with upload_locks_guard:
+        return upload_locks.setdefault(upload_id, threading.Lock())
+
+def get_upload_hasher(upload):
+    """Hasher untuk byte yang sudah diterima; dibangun ulang dari file .part setelah restart"""
+    hasher = upload_hashers.get(upload.id)
+    if hasher is None:
+        hasher = hashlib.sha256()
+        remaining = upload.received_bytes
+        with open(upload_part_path(upload.id), 'rb') as part:
+            while remaining > 0:
+                block = part.read(min(UPLOAD_STREAM_BLOCK_SIZE, remaining))
+                if not block:
+                    break
+                hasher.update(block)
+                remaining -= len(block)
+        upload_hashers[upload.id] = hasher
+    return hasher
+
+def finalize_upload(upload, hasher):
+    """Tandai upload completed dan catat blob-nya di transaksi berjalan; file dipindah setelah commit"""
+    sha256 = hasher.hexdigest()
+    # Upload dengan isi yang sama bisa finalize bersamaan, jadi insert blob harus idempotent
+    stmt = mysql_insert(FileBlob).values(sha256=sha256, size=upload.total_size)
+    stmt = stmt.on_duplicate_key_update(size=stmt.inserted.size)
+    db.session.execute(stmt)
+    upload.sha256 = sha256
+    upload.status = 'completed'
+
+def store_upload_blob(upload):
+    """Pindahkan file .part upload yang sudah completed ke blob store (atau buang jika isinya sudah ada)"""
+    # Aman diulang: jika proses mati setelah commit, request berikutnya menyelesaikan pemindahan
+    part_path = upload_part_path(upload.id)
+    if os.path.exists(part_path):
+        path = blob_path(upload.sha256)
+        if os.path.exists(path):
+            os.remove(part_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(part_path, path)
+    upload_hashers.pop(upload.id, None)
+    with upload_locks_guard:
+        upload_locks.pop(upload.id, None)
+
+@app.route('/api/uploads', methods=['POST'])
+def create_upload():
+    """Mulai upload file submission, return upload_id untuk PUT chunk"""
+    data = request.get_json() or {}
+    user_id = data.get('user_id')
+    file_name = data.get('file_name')
+    size = data.get('size')
+    
+    if not is_valid_id(user_id) or not file_name or not isinstance(size, int) or isinstance(size, bool):
+        return jsonify({'error': 'user_id, file_name and size are required'}), 400
+    if size <= 0 or size > SUBMISSION_MAX_FILE_BYTES:
+        return jsonify({'error': f'size must be between 1 and {SUBMISSION_MAX_FILE_BYTES} bytes'}), 400
+    
+    upload = UploadSession(
+        id=uuid.uuid4().hex,
+        user_id=user_id,
+        file_name=os.path.basename(file_name)[:200],
+        content_type=data.get('content_type'),
+        total_size=size,
+        received_bytes=0
+    )
+    os.makedirs(SUBMISSION_UPLOAD_DIR, exist_ok=True)
+    open(upload_part_path(upload.id), 'wb').close()
+    upload_hashers[upload.id] = hashlib.sha256()
+    
+    db.session.add(upload)
+    db.session.commit()
+    
+    return jsonify({
+        'message': 'Upload created',
+        'upload': upload.to_dict(),
+        'chunk_max_bytes': SUBMISSION_CHUNK_MAX_BYTES
+    }), 201
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+def get_upload(upload_id):
+    """Status upload; received_bytes adalah offset untuk melanjutkan upload"""
+    upload = db.get_or_404(UploadSession, upload_id)
+    return jsonify(upload.to_dict()), 200
+
+@app.route('/api/uploads/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    """Terima satu chunk (body mentah) mulai dari ?offset=<received_bytes>"""
+    offset = request.args.get('offset', type=int)
+    length = request.content_length
+    if offset is None or length is None:
+        return jsonify({'error': 'offset and Content-Length are required'}), 400
+    if length > SUBMISSION_CHUNK_MAX_BYTES:
+        return jsonify({'error': f'Chunk must be at most {SUBMISSION_CHUNK_MAX_BYTES} bytes'}), 413
+    
+    with get_upload_lock(upload_id):
+        upload = db.get_or_404(UploadSession, upload_id)
+        if upload.status == 'completed':
+            store_upload_blob(upload)
+            return jsonify({'message': 'Upload already completed', 'upload': upload.to_dict()}), 200
+        if offset != upload.received_bytes:
+            return jsonify({'error': 'Offset mismatch', 'received_bytes': upload.received_bytes}), 409
+        if offset + length > upload.total_size:
+            return jsonify({'error': 'Chunk exceeds declared file size'}), 400
+        
+        hasher = get_upload_hasher(upload)
+        written = 0
+        try:
+            with open(upload_part_path(upload.id), 'r+b') as part:
+                part.seek(offset)
+                part.truncate()
+                while True:
+                    block = request.stream.read(UPLOAD_STREAM_BLOCK_SIZE)
+                    if not block:
+                        break
+                    part.write(block)
+                    hasher.update(block)
+                    written += len(block)
+        finally:
+            # Byte yang sudah tertulis tetap dihitung, jadi koneksi putus bisa di-resume dari sini
+            try:
+                upload.received_bytes = offset + written
+                if upload.received_bytes == upload.total_size:
+                    finalize_upload(upload, hasher)
+                db.session.commit()
+            except Exception:
+                # Hasher tidak lagi sesuai dengan received_bytes di database
+                db.session.rollback()
+                upload_hashers.pop(upload_id, None)
+                raise
+        
+        # File system baru disentuh setelah status completed tersimpan di database
+        if upload.status == 'completed':
+            store_upload_blob(upload)
+    
+    return jsonify({
+        'message': 'Upload completed' if upload.status == 'completed' else 'Chunk received',
+        'upload': upload.to_dict()
+    }), 200
+
+@app.route('/api/files/<sha256>', methods=['GET'])
+def download_file(sha256):
+    """Download file dari blob store (mendukung Range dan conditional request)"""
+    if not SHA256_PATTERN.match(sha256):
+        return jsonify({'error': 'Invalid file id'}), 404
+    path = blob_path(sha256)
+    if not os.path.exists(path):
+        return jsonify({'error': 'File not found'}), 404
+    
+    # send_file memakai file wrapper dari server WSGI (sendfile) dan X-Sendfile jika diaktifkan
+    return send_file(
+        path,
+        as_attachment=True,
+        download_name=request.args.get('name') or sha256,
+        conditional=True,
+        etag=sha256,
+        max_age=365 * 24 * 3600
+    )
+
+# Gradebook export: satu join UserTaskCompletion x Task x Submission dibaca lewat server-side
+# cursor, diurutkan per student, dan setiap student ditulis sebagai satu baris begitu row-nya
+# habis. Memory hanya sebesar satu baris student, berapa pun jumlah submission-nya.
+GRADEBOOK_FORMATS = ('csv', 'ndjson')
+GRADEBOOK_YIELD_PER = 1000
+GRADEBOOK_TASK_COLUMNS = ('grade', 'status', 'completed_at', 'submitted_at', 'graded_at')
+
+def iter_gradebook_students(course_id):
+    """Yield (user_id, {task_id: cell}) per student, urut user_id"""
+    stmt = select(
+        UserTaskCompletion.user_id,
+        UserTaskCompletion.task_id,
+        UserTaskCompletion.status,
+        UserTaskCompletion.completed_at,
+        Submission.id,
+        Submission.grade,
+        Submission.submitted_at,
+        Submission.graded_at
+    ).join(
+        Task, Task.id == UserTaskCompletion.task_id
+    ).outerjoin(
+        Submission, and_(Submission.user_id == UserTaskCompletion.user_id,
+                         Submission.task_id == UserTaskCompletion.task_id)
+    ).where(
+        UserTaskCompletion.course_id == course_id, Task.course_id == course_id
+    ).order_by(UserTaskCompletion.user_id).execution_options(stream_results=True, yield_per=GRADEBOOK_YIELD_PER)
+    
+    current_user_id = None
+    cells = {}
+    latest = {}
+    for user_id, task_id, status, completed_at, submission_id, grade, submitted_at, graded_at in db.session.execute(stmt):
+        if user_id != current_user_id:
+            if current_user_id is not None:
+                yield current_user_id, cells
+            current_user_id = user_id
+            cells = {}
+            latest = {}
+        # Satu task bisa punya beberapa submission: pakai yang terbaru (submitted_at, lalu id)
+        submission_key = (submitted_at or datetime.min, submission_id or 0)
+        if task_id in latest and submission_key <= latest[task_id]:
+            continue
+        latest[task_id] = submission_key
+        cells[task_id] = {
+            'grade': grade,
+            'status': status,
+            'completed_at': serialize_value(completed_at),
+            'submitted_at': serialize_value(submitted_at),
+            'graded_at': serialize_value(graded_at)
+        }
+    if current_user_id is not None:
+        yield current_user_id, cells
+
+def total_grade(cells):
+    return sum(cell['grade'] for cell in cells.values() if cell['grade'] is not None)
+
+def generate_gradebook_csv(course_id, tasks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    
+    def flush():
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+    
+    header = ['user_id']
+    for task in tasks:
+        header.extend(f'{task.title} ({column})' for column in GRADEBOOK_TASK_COLUMNS)
+    header.append('total_grade')
+    writer.writerow(header)
+    yield flush()
+    
+    for user_id, cells in iter_gradebook_students(course_id):
+        row = [user_id]
+        for task in tasks:
+            cell = cells.get(task.id)
+            row.extend(cell[column] if cell else None for column in GRADEBOOK_TASK_COLUMNS)
+        row.append(total_grade(cells))
+        writer.writerow(row)
+        yield flush()
+
+def generate_gradebook_ndjson(course_id):
+    for user_id, cells in iter_gradebook_students(course_id):
+        yield json.dumps({
+            'user_id': user_id,
+            'tasks': {str(task_id): cell for task_id, cell in cells.items()},
+            'total_grade': total_grade(cells)
+        }) + '\n'
+
+@app.route('/api/gradebook/course/<int:course_id>', methods=['GET'])
+def export_gradebook(course_id):
+    """Export gradebook course (students x tasks) sebagai CSV atau NDJSON yang di-stream"""
+    export_format = request.args.get('format', 'csv')
+    if export_format not in GRADEBOOK_FORMATS:
+        return jsonify({'error': f"format must be one of: {', '.join(GRADEBOOK_FORMATS)}"}), 400
+    
+    filename = f'gradebook-course-{course_id}.{export_format}'
+    headers = {'Content-Disposition': f'attachment; filename={filename}'}
+    if export_format == 'csv':
+        # Daftar task per course kecil, dipakai untuk kolom CSV
+        tasks = with_fields(Task.query, Task, ['id', 'title']).filter_by(course_id=course_id).order_by(
+            Task.order_index, Task.id
+        ).all()
+        return Response(stream_with_context(generate_gradebook_csv(course_id, tasks)),
+                        mimetype='text/csv', headers=headers)
+    return Response(stream_with_context(generate_gradebook_ndjson(course_id)),
+                    mimetype='application/x-ndjson', headers=headers)
+
+# Course analytics: kolom yang dibutuhkan dibaca sekali per tabel langsung ke array NumPy,
+# lalu histogram, percentile, dan completion rate per task dihitung vectorized (tanpa loop
+# per student). Hasil di-cache per (course, bins) selama ANALYTICS_CACHE_TTL_SECONDS.
+ANALYTICS_CACHE_TTL_SECONDS = 60
+ANALYTICS_CACHE_MAX_ENTRIES = 256
+ANALYTICS_DEFAULT_BINS = 10
+ANALYTICS_MAX_BINS = 100
+ANALYTICS_PERCENTILES = (25, 50, 75, 90, 95)
+analytics_cache = {}
+analytics_cache_lock = threading.Lock()
+
+def describe_distribution(values):
+    """Ringkasan statistik satu array; None kalau kosong"""
+    if not values.size:
+        return None
+    percentiles = np.percentile(values, ANALYTICS_PERCENTILES)
+    return {
+        'mean': round(float(values.mean()), 2),
+        'median': round(float(np.median(values)), 2),
+        'min': round(float(values.min()), 2),
+        'max': round(float(values.max()), 2),
+        'percentiles': {f'p{p}': round(float(v), 2) for p, v in zip(ANALYTICS_PERCENTILES, percentiles)}
+    }
+
+def histogram_dict(values, bins, value_range=None):
+    counts, edges = np.histogram(values, bins=bins, range=value_range)
+    return {'edges': [round(float(edge), 2) for edge in edges], 'counts': counts.tolist()}
+
+def compute_course_analytics(course_id, bins):
+    # Satu query per tabel: per student completion (max) dan time spent (total semua record)
+    rows = db.session.execute(
+        select(
+            func.max(func.coalesce(Progress.completion_percentage, 0)),
+            func.sum(func.coalesce(Progress.time_spent_minutes, 0))
+        ).where(Progress.course_id == course_id).group_by(Progress.user_id)
+    ).all()
+    per_student = np.array(rows, dtype=np.float64).reshape(-1, 2)
+    completion = per_student[:, 0]
+    time_spent = per_student[:, 1]
+
+    completed_task_ids = np.fromiter(
+        db.session.execute(
+            select(UserTaskCompletion.task_id).where(
+                UserTaskCompletion.course_id == course_id, UserTaskCompletion.status == 'completed'
+            )
+        ).scalars(),
+        dtype=np.int64
+    )
+
+    tasks = with_fields(Task.query, Task, ['id', 'title', 'points']).filter_by(course_id=course_id).order_by(
+        Task.order_index, Task.id
+    ).all()
+    task_ids = np.array([task.id for task in tasks], dtype=np.int64)
+
+    # Hitung completion per task: posisi task_id di task_ids (sorted) lalu bincount
+    task_completed = np.zeros(task_ids.size, dtype=np.int64)
+    if task_ids.size and completed_task_ids.size:
+        order = np.argsort(task_ids)
+        positions = np.searchsorted(task_ids, completed_task_ids, sorter=order)
+        positions = np.minimum(positions, task_ids.size - 1)
+        known = task_ids[order[positions]] == completed_task_ids
+        task_completed[order] = np.bincount(positions[known], minlength=task_ids.size)
+
+    students = int(completion.size)
+    rates = task_completed / students if students else np.zeros(task_ids.size)
+
+    return {
+        'course_id': course_id,
+        'students': students,
+        'completed_students': int(np.count_nonzero(completion >= 100)),
+        'completion_percentage': {
+            'summary': describe_distribution(completion),
+            'histogram': histogram_dict(completion, bins, (0, 100))
+        },
+        'time_spent_minutes': {
+            'summary': describe_distribution(time_spent),
+            'histogram': histogram_dict(time_spent, bins) if students else None
+        },
+        'tasks': [
+            {
+                'task_id': task.id,
+                'title': task.title,
+                'points': task.points,
+                'completed': int(completed),
+                'completion_rate': round(float(rate), 4)
+            }
+            for task, completed, rate in zip(tasks, task_completed, rates)
+        ],
+        'generated_at': datetime.utcnow().isoformat()
+    }
+
+@app.route('/api/analytics/course/<int:course_id>', methods=['GET'])
+def get_course_analytics(course_id):
+    """Distribusi completion, time spent, dan completion rate per task untuk satu course"""
+    bins = request.args.get('bins', ANALYTICS_DEFAULT_BINS, type=int)
+    if not 0 < bins <= ANALYTICS_MAX_BINS:
+        return jsonify({'error': f'bins must be between 1 and {ANALYTICS_MAX_BINS}'}), 400
+
+    cache_key = (course_id, bins)
+    now = time.monotonic()
+    with analytics_cache_lock:
+        cached = analytics_cache.get(cache_key)
+
+    if cached is not None and cached[0] > now:
+        return jsonify({**cached[1], 'cached': True}), 200
+
+    result = compute_course_analytics(course_id, bins)
+    with analytics_cache_lock:
+        for key in [key for key, (expires_at, _) in analytics_cache.items() if expires_at <= now]:
+            del analytics_cache[key]
+        if len(analytics_cache) >= ANALYTICS_CACHE_MAX_ENTRIES:
+            analytics_cache.pop(next(iter(analytics_cache)))
+        analytics_cache[cache_key] = (now + ANALYTICS_CACHE_TTL_SECONDS, result)
+
+    return jsonify({**result, 'cached': False}), 200
 
 @app.route('/api/health', methods=['GET'])
 def health():
@@ -687,121 +2476,61 @@ def health():
 def initialize_tasks_endpoint():
     """Endpoint to manually initialize sample tasks"""
     try:
-        initialize_sample_tasks()
+        # force: diff ulang walaupun manifest tidak berubah, untuk memulihkan row yang terhapus
+        new_modules, new_tasks = apply_seed_manifest(force=True)
         task_count = Task.query.count()
         return jsonify({
             'message': 'Sample tasks initialized successfully',
+            'new_modules': new_modules,
+            'new_tasks': new_tasks,
             'total_tasks': task_count
         }), 200
     except Exception as e:
+        db.session.rollback()
         return jsonify({
             'error': f'Error initializing tasks: {str(e)}'
         }), 500
 
-def initialize_sample_modules():
-    """Create sample modules for existing courses"""
-    try:
-        # Sample modules for each course
-        course_modules = {
-            1: [  # Python Programming Basics
-                {'title': 'Pengenalan Python', 'description': 'Pelajari dasar-dasar bahasa pemrograman Python, termasuk instalasi, sintaks dasar, dan cara menjalankan program Python pertama Anda.', 'order_index': 1},
-                {'title': 'Variabel dan Tipe Data', 'description': 'Pahami berbagai tipe data dalam Python seperti integer, float, string, list, dan dictionary serta cara menggunakannya.', 'order_index': 2},
-                {'title': 'Struktur Kontrol', 'description': 'Pelajari penggunaan if-else, loop (for dan while), dan cara mengontrol alur program dengan struktur kontrol.', 'order_index': 3},
-                {'title': 'Fungsi dan Modul', 'description': 'Belajar membuat fungsi, menggunakan parameter, return value, dan cara mengorganisir kode dengan modul.', 'order_index': 4},
-                {'title': 'Object-Oriented Programming', 'description': 'Pahami konsep OOP dalam Python termasuk class, object, inheritance, dan polymorphism.', 'order_index': 5}
-            ],
-            2: [  # Advanced Web Development
-                {'title': 'HTML & CSS Fundamentals', 'description': 'Pelajari dasar-dasar HTML5 dan CSS3 untuk membuat struktur dan styling halaman web yang responsif.', 'order_index': 1},
-                {'title': 'JavaScript Essentials', 'description': 'Pahami JavaScript modern termasuk ES6+, DOM manipulation, event handling, dan asynchronous programming.', 'order_index': 2},
-                {'title': 'React Basics', 'description': 'Pelajari React framework termasuk komponen, props, state, hooks, dan cara membangun aplikasi React modern.', 'order_index': 3},
-                {'title': 'Node.js & Express', 'description': 'Belajar membangun backend dengan Node.js dan Express, termasuk routing, middleware, dan API development.', 'order_index': 4},
-                {'title': 'Full Stack Integration', 'description': 'Integrasikan frontend React dengan backend Node.js untuk membuat aplikasi full stack yang lengkap.', 'order_index': 5}
-            ],
-            3: [  # Machine Learning Fundamentals
-                {'title': 'Pengenalan Data Science', 'description': 'Pelajari dasar-dasar data science, analisis data dengan pandas, dan visualisasi data menggunakan matplotlib dan seaborn.', 'order_index': 1},
-                {'title': 'Data Preprocessing', 'description': 'Pahami teknik preprocessing data termasuk handling missing values, normalisasi, encoding, dan feature engineering.', 'order_index': 2},
-                {'title': 'Konsep Machine Learning', 'description': 'Pelajari konsep supervised vs unsupervised learning, overfitting, underfitting, dan teknik evaluasi model.', 'order_index': 3},
-                {'title': 'Algoritma Machine Learning', 'description': 'Pahami berbagai algoritma ML seperti linear regression, decision tree, random forest, dan neural networks.', 'order_index': 4},
-                {'title': 'Model Evaluation & Deployment', 'description': 'Pelajari cara mengevaluasi model ML, hyperparameter tuning, dan cara deploy model ke production.', 'order_index': 5}
-            ]
-        }
-        
-        for course_id, modules in course_modules.items():
-            for module_data in modules:
-                # Check if module already exists
-                existing = Module.query.filter_by(
-                    course_id=course_id,
-                    title=module_data['title']
-                ).first()
-                
-                if not existing:
-                    module = Module(
-                        course_id=course_id,
-                        title=module_data['title'],
-                        description=module_data['description'],
-                        order_index=module_data['order_index']
-                    )
-                    db.session.add(module)
-        
-        db.session.commit()
-        print("[OK] Sample modules created for courses")
-    except Exception as e:
-        print(f"[WARNING] Error creating sample modules: {e}")
-        db.session.rollback()
+# Seed manifest: sample modules dan tasks dideklarasikan di seed_manifest.json. Manifest
+# diterapkan dengan membaca key (course_id, title) yang sudah ada sekali per tabel, lalu hanya
+# row yang belum ada yang di-insert dalam satu bulk insert. Hash isi manifest disimpan di
+# SeedState, jadi manifest yang tidak berubah dilewati seluruhnya saat startup.
+SEED_MANIFEST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'seed_manifest.json')
+SEED_STATE_NAME = 'progress_seed_manifest'
 
-def initialize_sample_tasks():
-    """Create sample tasks for existing courses"""
-    try:
-        # Sample tasks for each course
-        course_tasks = {
-            1: [  # Python Programming Basics
-                {'title': 'Introduction to Python Syntax', 'description': 'Write a Python program that prints "Hello, World!" and demonstrates basic variable usage.', 'task_type': 'assignment', 'priority': 'low', 'points': 10, 'order_index': 1},
-                {'title': 'Variables and Data Types', 'description': 'Create a program that uses different data types (int, float, string, list) and print their types.', 'task_type': 'assignment', 'priority': 'low', 'points': 15, 'order_index': 2},
-                {'title': 'Control Structures Quiz', 'description': 'Complete a quiz on if-else statements, loops, and control flow in Python.', 'task_type': 'quiz', 'priority': 'medium', 'points': 20, 'order_index': 3},
-                {'title': 'Functions and Modules', 'description': 'Create a module with at least 3 functions and demonstrate their usage in a main program.', 'task_type': 'assignment', 'priority': 'medium', 'points': 25, 'order_index': 4},
-                {'title': 'Final Project: Calculator', 'description': 'Build a simple calculator program that can perform basic arithmetic operations.', 'task_type': 'project', 'priority': 'high', 'points': 30, 'order_index': 5}
-            ],
-            2: [  # Advanced Web Development
-                {'title': 'HTML/CSS Basics', 'description': 'Create a responsive webpage using HTML5 and CSS3 with a navigation bar and footer.', 'task_type': 'assignment', 'priority': 'low', 'points': 15, 'order_index': 1},
-                {'title': 'JavaScript Fundamentals', 'description': 'Write JavaScript code to handle DOM manipulation and event listeners.', 'task_type': 'assignment', 'priority': 'medium', 'points': 20, 'order_index': 2},
-                {'title': 'React Components Quiz', 'description': 'Complete a quiz on React components, props, and state management.', 'task_type': 'quiz', 'priority': 'medium', 'points': 25, 'order_index': 3},
-                {'title': 'Node.js API Development', 'description': 'Build a RESTful API using Node.js and Express with CRUD operations.', 'task_type': 'project', 'priority': 'high', 'points': 35, 'order_index': 4},
-                {'title': 'Full Stack Application', 'description': 'Create a complete full-stack application with React frontend and Node.js backend.', 'task_type': 'project', 'priority': 'high', 'points': 50, 'order_index': 5}
-            ],
-            3: [  # Machine Learning Fundamentals
-                {'title': 'Introduction to Data Science', 'description': 'Analyze a dataset using pandas and create visualizations with matplotlib.', 'task_type': 'assignment', 'priority': 'low', 'points': 20, 'order_index': 1},
-                {'title': 'Data Preprocessing', 'description': 'Clean and preprocess a dataset: handle missing values, normalize data, and feature engineering.', 'task_type': 'assignment', 'priority': 'medium', 'points': 25, 'order_index': 2},
-                {'title': 'Machine Learning Concepts Quiz', 'description': 'Complete a quiz on supervised vs unsupervised learning, overfitting, and model evaluation.', 'task_type': 'quiz', 'priority': 'medium', 'points': 30, 'order_index': 3},
-                {'title': 'Linear Regression Model', 'description': 'Implement a linear regression model from scratch and evaluate its performance.', 'task_type': 'project', 'priority': 'high', 'points': 40, 'order_index': 4},
-                {'title': 'Final ML Project', 'description': 'Build a complete machine learning pipeline: data collection, preprocessing, model training, and evaluation.', 'task_type': 'project', 'priority': 'high', 'points': 50, 'order_index': 5}
-            ]
-        }
-        
-        for course_id, tasks in course_tasks.items():
-            for task_data in tasks:
-                # Check if task already exists
-                existing = Task.query.filter_by(
-                    course_id=course_id,
-                    title=task_data['title']
-                ).first()
-                
-                if not existing:
-                    task = Task(
-                        course_id=course_id,
-                        title=task_data['title'],
-                        description=task_data['description'],
-                        task_type=task_data['task_type'],
-                        priority=task_data['priority'],
-                        points=task_data['points'],
-                        order_index=task_data['order_index']
-                    )
-                    db.session.add(task)
-        
-        db.session.commit()
-        print("[OK] Sample tasks created for courses")
-    except Exception as e:
-        print(f"[WARNING] Error creating sample tasks: {e}")
-        db.session.rollback()
+def load_seed_manifest():
+    """Return (manifest, sha256 isi file)"""
+    with open(SEED_MANIFEST_PATH, 'rb') as f:
+        raw = f.read()
+    return json.loads(raw), hashlib.sha256(raw).hexdigest()
+
+def missing_seed_rows(model, rows):
+    """Row manifest yang (course_id, title)-nya belum ada di tabel model"""
+    course_ids = {row['course_id'] for row in rows}
+    existing = set(db.session.query(model.course_id, model.title).filter(model.course_id.in_(course_ids)).all())
+    return [row for row in rows if (row['course_id'], row['title']) not in existing]
+
+def apply_seed_manifest(force=False):
+    """Terapkan seed manifest; return (modules baru, tasks baru) atau None jika manifest tidak berubah"""
+    manifest, content_hash = load_seed_manifest()
+    state = db.session.get(SeedState, SEED_STATE_NAME)
+    if state is not None and state.content_hash == content_hash and not force:
+        return None
+    
+    new_modules = missing_seed_rows(Module, manifest.get('modules', []))
+    new_tasks = missing_seed_rows(Task, manifest.get('tasks', []))
+    if new_modules:
+        db.session.execute(insert(Module), new_modules)
+    if new_tasks:
+        db.session.execute(insert(Task), new_tasks)
+        added_tasks = {}
+        for row in new_tasks:
+            added_tasks[row['course_id']] = added_tasks.get(row['course_id'], 0) + 1
+        adjust_task_totals(added_tasks)
+    
+    db.session.merge(SeedState(name=SEED_STATE_NAME, content_hash=content_hash, applied_at=datetime.utcnow()))
+    db.session.commit()
+    return len(new_modules), len(new_tasks)
 
 if __name__ == '__main__':
     print("=" * 60)
@@ -811,9 +2540,33 @@ if __name__ == '__main__':
     with app.app_context():
         try:
             db.create_all()
+            upgrade_schema(db)
             print("[OK] Database initialized")
-            initialize_sample_modules()
-            initialize_sample_tasks()
+            # Counter diisi dari data lama saat pertama kali deploy
+            if Task.query.first() is not None and (
+                CourseTaskTotal.query.first() is None
+                or (CourseScore.query.first() is None
+                    and UserTaskCompletion.query.filter_by(status='completed').first() is not None)
+            ):
+                rebuild_task_counters()
+                print("[OK] Task counters rebuilt")
+            try:
+                seeded = apply_seed_manifest()
+                if seeded is None:
+                    print("[OK] Seed manifest unchanged, skipped")
+                else:
+                    print(f"[OK] Seed manifest applied: {seeded[0]} new modules, {seeded[1]} new tasks")
+            except Exception as e:
+                db.session.rollback()
+                print(f"[WARNING] Error applying seed manifest: {e}")
+            start_enrollment_feed_consumer()
+            print("[OK] Enrollment feed consumer started")
+            resumed = resume_progress_recompute_jobs()
+            print(f"[OK] Resumed {resumed} pending progress recompute jobs")
+            recover_heartbeat_journal()
+            print(f"[OK] Flushed {flush_heartbeats()} pending heartbeat batches")
+            start_deadline_scheduler()
+            print("[OK] Deadline scheduler started")
         except Exception as e:
             print(f"[WARNING] Error initializing database: {e}")
             print("Service will continue running, but database operations may fail.")
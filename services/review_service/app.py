@@ -1,13 +1,20 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import case, func, insert, select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
 from datetime import datetime
 import os
+import queue
 import sys
+import threading
+import time
+import requests
 
 # Add parent directory to path for config
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-from config import DB_CONFIG, DATABASES
+from config import DB_CONFIG, DATABASES, SERVICES
+from db_utils import parse_fields, serialize_value, with_fields
 
 app = Flask(__name__)
 
@@ -43,24 +50,141 @@ class Review(db.Model):
     
     __table_args__ = (db.UniqueConstraint('user_id', 'course_id', name='unique_user_course_review'),)
     
-    def to_dict(self):
+    SERIALIZABLE_FIELDS = ('id', 'user_id', 'course_id', 'rating', 'comment', 'created_at',
+                           'updated_at')
+    
+    def to_dict(self, fields=None):
+        return {field: serialize_value(getattr(self, field)) for field in (fields or self.SERIALIZABLE_FIELDS)}
+
+RATING_STARS = (1, 2, 3, 4, 5)
+
+def is_valid_rating(rating):
+    """Hanya integer 1..5; True dan 5.0 lolos 'in RATING_STARS' jadi tipe dicek eksplisit"""
+    return isinstance(rating, int) and not isinstance(rating, bool) and rating in RATING_STARS
+
+class CourseReviewStats(db.Model):
+    """Agregat review per course (count, sum, jumlah per bintang), di-update di transaksi yang sama dengan Review"""
+    course_id = db.Column(db.Integer, primary_key=True)
+    review_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
+    rating_1 = db.Column(db.Integer, nullable=False, default=0)
+    rating_2 = db.Column(db.Integer, nullable=False, default=0)
+    rating_3 = db.Column(db.Integer, nullable=False, default=0)
+    rating_4 = db.Column(db.Integer, nullable=False, default=0)
+    rating_5 = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
+
+def adjust_course_review_stats(course_id, removed_rating=None, added_rating=None):
+    """Terapkan perubahan satu review ke CourseReviewStats dalam transaksi yang sedang berjalan"""
+    deltas = {'review_count': 0, 'rating_sum': 0, **{f'rating_{star}': 0 for star in RATING_STARS}}
+    for rating, sign in ((removed_rating, -1), (added_rating, 1)):
+        if rating is None:
+            continue
+        rating = int(rating)
+        deltas['review_count'] += sign
+        deltas['rating_sum'] += sign * rating
+        deltas[f'rating_{rating}'] += sign
+    
+    stmt = mysql_insert(CourseReviewStats).values(course_id=course_id, **deltas)
+    stmt = stmt.on_duplicate_key_update(**{
+        column: getattr(CourseReviewStats, column) + stmt.inserted[column] for column in deltas
+    })
+    db.session.execute(stmt)
+
+def rebuild_course_review_stats():
+    """Bangun ulang semua agregat dari tabel Review (repair jika terjadi drift)"""
+    db.session.query(CourseReviewStats).delete()
+    db.session.execute(insert(CourseReviewStats).from_select(
+        ['course_id', 'review_count', 'rating_sum'] + [f'rating_{star}' for star in RATING_STARS],
+        select(
+            Review.course_id,
+            func.count(Review.id),
+            func.sum(Review.rating),
+            *[func.sum(case((Review.rating == star, 1), else_=0)) for star in RATING_STARS]
+        ).group_by(Review.course_id)
+    ))
+    db.session.commit()
+    return db.session.query(func.count()).select_from(CourseReviewStats).scalar()
+
+def compute_course_review_stats(course_id):
+    """Rata-rata dan distribusi rating untuk satu course, dibaca dari CourseReviewStats"""
+    stats = db.session.get(CourseReviewStats, course_id)
+    
+    if stats is None or stats.review_count <= 0:
         return {
-            'id': self.id,
-            'user_id': self.user_id,
-            'course_id': self.course_id,
-            'rating': self.rating,
-            'comment': self.comment,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+            'course_id': course_id,
+            'average_rating': 0.0,
+            'total_reviews': 0,
+            'rating_distribution': {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
         }
+    
+    return {
+        'course_id': course_id,
+        'average_rating': round(stats.rating_sum / stats.review_count, 2),
+        'total_reviews': stats.review_count,
+        'rating_distribution': {star: getattr(stats, f'rating_{star}') for star in RATING_STARS}
+    }
+
+# Rating events: setiap perubahan review mengirim snapshot rating summary ke course service.
+# Dikirim oleh satu background thread supaya request review tidak menunggu HTTP call;
+# course_id yang sama di-coalesce dan snapshot dihitung saat dikirim, jadi selalu yang terbaru.
+RATING_EVENT_MAX_ATTEMPTS = 5
+rating_event_queue = queue.Queue()
+rating_event_pending = set()
+rating_event_lock = threading.Lock()
+rating_publisher_thread = None
+
+def publish_rating_event(course_id):
+    """Jadwalkan pengiriman rating summary course ke course service"""
+    global rating_publisher_thread
+    with rating_event_lock:
+        if rating_publisher_thread is None:
+            rating_publisher_thread = threading.Thread(target=rating_publisher_loop, daemon=True)
+            rating_publisher_thread.start()
+        if course_id in rating_event_pending:
+            return
+        rating_event_pending.add(course_id)
+    rating_event_queue.put(course_id)
+
+def send_rating_event(course_id):
+    with app.app_context():
+        stats = compute_course_review_stats(course_id)
+    stats['computed_at'] = datetime.utcnow().isoformat()
+    
+    response = requests.put(
+        f"{SERVICES['course']}/api/courses/{course_id}/rating-summary",
+        json=stats,
+        timeout=5
+    )
+    # 404 berarti course sudah dihapus, tidak perlu di-retry
+    return response.ok or response.status_code == 404
+
+def rating_publisher_loop():
+    while True:
+        course_id = rating_event_queue.get()
+        with rating_event_lock:
+            rating_event_pending.discard(course_id)
+        
+        for attempt in range(1, RATING_EVENT_MAX_ATTEMPTS + 1):
+            try:
+                if send_rating_event(course_id):
+                    break
+            except Exception as e:
+                print(f"[WARNING] Failed to publish rating event for course {course_id}: {e}")
+            time.sleep(min(2 ** attempt, 30))
+        else:
+            print(f"[WARNING] Dropped rating event for course {course_id} after {RATING_EVENT_MAX_ATTEMPTS} attempts")
 
 # Routes
 @app.route('/api/reviews', methods=['GET'])
 def get_reviews():
     course_id = request.args.get('course_id')
     user_id = request.args.get('user_id')
+    fields, error = parse_fields(Review)
+    if error:
+        return jsonify({'error': error}), 400
     
-    query = Review.query
+    query = with_fields(Review.query, Review, fields)
     
     if course_id:
         query = query.filter_by(course_id=course_id)
@@ -68,12 +192,16 @@ def get_reviews():
         query = query.filter_by(user_id=user_id)
     
     reviews = query.all()
-    return jsonify([review.to_dict() for review in reviews]), 200
+    return jsonify([review.to_dict(fields) for review in reviews]), 200
 
 @app.route('/api/reviews/<int:review_id>', methods=['GET'])
 def get_review(review_id):
-    review = Review.query.get_or_404(review_id)
-    return jsonify(review.to_dict()), 200
+    fields, error = parse_fields(Review)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    review = with_fields(Review.query, Review, fields).get_or_404(review_id)
+    return jsonify(review.to_dict(fields)), 200
 
 @app.route('/api/reviews', methods=['POST'])
 def create_review():
@@ -82,7 +210,7 @@ def create_review():
     course_id = data.get('course_id')
     rating = data.get('rating')
     
-    if not rating or rating < 1 or rating > 5:
+    if not is_valid_rating(rating):
         return jsonify({'error': 'Rating must be between 1 and 5'}), 400
     
     # Check if review already exists
@@ -98,7 +226,9 @@ def create_review():
     )
     
     db.session.add(review)
+    adjust_course_review_stats(course_id, added_rating=rating)
     db.session.commit()
+    publish_rating_event(review.course_id)
     
     return jsonify({
         'message': 'Review created successfully',
@@ -107,12 +237,15 @@ def create_review():
 
 @app.route('/api/reviews/<int:review_id>', methods=['PUT'])
 def update_review(review_id):
-    review = Review.query.get_or_404(review_id)
+    # Lock row supaya rating lama yang dikurangi dari agregat tidak basi
+    review = Review.query.filter_by(id=review_id).with_for_update().first_or_404()
     data = request.get_json()
     
     if 'rating' in data:
-        if data['rating'] < 1 or data['rating'] > 5:
+        if not is_valid_rating(data['rating']):
             return jsonify({'error': 'Rating must be between 1 and 5'}), 400
+        if data['rating'] != review.rating:
+            adjust_course_review_stats(review.course_id, removed_rating=review.rating, added_rating=data['rating'])
         review.rating = data['rating']
     
     if 'comment' in data:
@@ -120,6 +253,7 @@ def update_review(review_id):
     
     review.updated_at = datetime.utcnow()
     db.session.commit()
+    publish_rating_event(review.course_id)
     
     return jsonify({
         'message': 'Review updated successfully',
@@ -128,37 +262,40 @@ def update_review(review_id):
 
 @app.route('/api/reviews/<int:review_id>', methods=['DELETE'])
 def delete_review(review_id):
-    review = Review.query.get_or_404(review_id)
+    review = Review.query.filter_by(id=review_id).with_for_update().first_or_404()
+    course_id = review.course_id
     db.session.delete(review)
+    adjust_course_review_stats(course_id, removed_rating=review.rating)
     db.session.commit()
+    publish_rating_event(course_id)
     
     return jsonify({'message': 'Review deleted successfully'}), 200
 
 @app.route('/api/reviews/course/<int:course_id>/stats', methods=['GET'])
 def get_course_review_stats(course_id):
-    reviews = Review.query.filter_by(course_id=course_id).all()
-    
-    if not reviews:
-        return jsonify({
-            'course_id': course_id,
-            'average_rating': 0.0,
-            'total_reviews': 0,
-            'rating_distribution': {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
-        }), 200
-    
-    total_rating = sum(review.rating for review in reviews)
-    average_rating = total_rating / len(reviews)
-    
-    rating_distribution = {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
-    for review in reviews:
-        rating_distribution[review.rating] += 1
+    return jsonify(compute_course_review_stats(course_id)), 200
+
+@app.route('/api/reviews/stats/publish', methods=['POST'])
+def republish_rating_events():
+    """Kirim ulang rating summary semua course ke course service (repair setelah downtime)"""
+    course_ids = [row[0] for row in db.session.query(CourseReviewStats.course_id).all()]
+    for course_id in course_ids:
+        publish_rating_event(course_id)
     
     return jsonify({
-        'course_id': course_id,
-        'average_rating': round(average_rating, 2),
-        'total_reviews': len(reviews),
-        'rating_distribution': rating_distribution
-    }), 200
+        'message': 'Rating events scheduled',
+        'courses': len(course_ids)
+    }), 202
+
+@app.route('/api/reviews/stats/rebuild', methods=['POST'])
+def rebuild_course_review_stats_endpoint():
+    """Repair job: hitung ulang agregat review semua course dari tabel Review"""
+    try:
+        courses = rebuild_course_review_stats()
+        return jsonify({'message': 'Review stats rebuilt', 'courses': courses}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Error rebuilding review stats: {str(e)}'}), 500
 
 @app.route('/api/health', methods=['GET'])
 def health():
@@ -173,6 +310,9 @@ if __name__ == '__main__':
         try:
             db.create_all()
             print("[OK] Database initialized")
+            # Agregat diisi dari review lama saat pertama kali deploy
+            if CourseReviewStats.query.first() is None and Review.query.first() is not None:
+                print(f"[OK] Review stats rebuilt for {rebuild_course_review_stats()} courses")
         except Exception as e:
             print(f"[WARNING] Error initializing database: {e}")
             print("Service will continue running, but database operations may fail.")
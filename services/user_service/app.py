@@ -10,6 +10,7 @@ import sys
 # Add parent directory to path for config
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from config import DB_CONFIG, DATABASES
+from db_utils import parse_fields, serialize_value, with_fields
 
 app = Flask(__name__)
 
@@ -47,15 +48,10 @@ class User(db.Model):
     role = db.Column(db.String(50), default='student')
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'username': self.username,
-            'email': self.email,
-            'full_name': self.full_name,
-            'role': self.role,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+    SERIALIZABLE_FIELDS = ('id', 'username', 'email', 'full_name', 'role', 'created_at')
+    
+    def to_dict(self, fields=None):
+        return {field: serialize_value(getattr(self, field)) for field in (fields or self.SERIALIZABLE_FIELDS)}
 
 # Routes
 @app.route('/api/register', methods=['POST'])
@@ -112,21 +108,33 @@ def login():
 @app.route('/api/users/<int:user_id>', methods=['GET'])
 @jwt_required()
 def get_user(user_id):
-    user = User.query.get_or_404(user_id)
-    return jsonify(user.to_dict()), 200
+    fields, error = parse_fields(User)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    user = with_fields(User.query, User, fields).get_or_404(user_id)
+    return jsonify(user.to_dict(fields)), 200
 
 @app.route('/api/users/me', methods=['GET'])
 @jwt_required()
 def get_current_user():
     user_id = get_jwt_identity()
-    user = User.query.get_or_404(user_id)
-    return jsonify(user.to_dict()), 200
+    fields, error = parse_fields(User)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    user = with_fields(User.query, User, fields).get_or_404(user_id)
+    return jsonify(user.to_dict(fields)), 200
 
 @app.route('/api/users', methods=['GET'])
 @jwt_required()
 def get_users():
-    users = User.query.all()
-    return jsonify([user.to_dict() for user in users]), 200
+    fields, error = parse_fields(User)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    users = with_fields(User.query, User, fields).all()
+    return jsonify([user.to_dict(fields) for user in users]), 200
 
 @app.route('/api/users/<int:user_id>', methods=['PUT'])
 @jwt_required()